@@ -0,0 +1,122 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from db import get_db, run_db
+from models import Appointment, Doctor
+from auth.utils import admin_required
+from auth.hashing import hashing_pool
+from appointments.queries import appointment_listing_query, row_to_dict
+from appointments.events import event_log, list_events, replay
+from cache import TTLCache
+from datetime import date, datetime, timedelta
+from typing import Optional
+import os
+
+STATS_TTL_SECONDS = float(os.getenv("ADMIN_STATS_TTL_SECONDS", 30))
+
+# Cleared by booking, cancellation and doctor changes
+stats_cache = TTLCache(ttl_seconds=STATS_TTL_SECONDS, max_entries=64)
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+def compute_stats(db: Session, days: int):
+    """Dashboard counters, all computed with GROUP BY in the database"""
+    today = date.today()
+    window_start = today - timedelta(days=days)
+    window_end = today + timedelta(days=days)
+
+    by_status = dict(
+        db.query(Appointment.status, func.count(Appointment.id))
+        .group_by(Appointment.status)
+        .all()
+    )
+
+    by_doctor = (
+        db.query(Doctor.id, Doctor.name, Doctor.specialty, func.count(Appointment.id))
+        .outerjoin(Appointment, Appointment.doctor_id == Doctor.id)
+        .group_by(Doctor.id, Doctor.name, Doctor.specialty)
+        .order_by(Doctor.id)
+        .all()
+    )
+
+    by_day = (
+        db.query(Appointment.date, func.count(Appointment.id))
+        .filter(Appointment.date >= window_start, Appointment.date <= window_end)
+        .group_by(Appointment.date)
+        .order_by(Appointment.date)
+        .all()
+    )
+    day_counts = {d.isoformat(): count for d, count in by_day}
+
+    recent = (
+        appointment_listing_query(db)
+        .order_by(Appointment.date.desc(), Appointment.time.desc(), Appointment.id.desc())
+        .limit(5)
+        .all()
+    )
+
+    return {
+        "total_doctors": len(by_doctor),
+        "total_appointments": sum(by_status.values()),
+        "today_appointments": day_counts.get(today.isoformat(), 0),
+        "by_status": by_status,
+        "by_doctor": [
+            {"id": doctor_id, "name": name, "specialty": specialty, "appointments": count}
+            for doctor_id, name, specialty, count in by_doctor
+        ],
+        "by_day": [{"date": d, "appointments": count} for d, count in day_counts.items()],
+        "recent": [row_to_dict(row) for row in recent],
+    }
+
+
+@router.get("/stats")
+async def get_stats(
+    days: int = Query(30, ge=0, le=366),
+    current_user = Depends(admin_required),
+    db = Depends(get_db)
+):
+    """Dashboard statistics - admin (cached for ADMIN_STATS_TTL_SECONDS)"""
+    stats = stats_cache.get(days)
+    if stats is None:
+        stats = await run_db(db, compute_stats, days)
+        stats_cache.set(days, stats)
+    return stats
+
+
+
+@router.get("/hashing")
+async def get_hashing_stats(current_user = Depends(admin_required)):
+    """Password hashing pool queue depth and timings - admin"""
+    return hashing_pool.stats()
+
+
+@router.get("/events")
+async def get_events(
+    after_id: int = Query(0, ge=0),
+    appointment_id: Optional[int] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    current_user = Depends(admin_required),
+    db = Depends(get_db)
+):
+    """Appointment event log in order - admin; pass next_after_id back as after_id"""
+    # Write buffered events first so the page includes recent changes
+    await event_log.flush()
+    events = await run_db(db, list_events, after_id, limit, appointment_id)
+    return {
+        "events": events,
+        "next_after_id": events[-1]["id"] if len(events) == limit else None,
+        "log": event_log.stats(),
+    }
+
+
+@router.get("/events/replay")
+async def replay_events(
+    appointment_id: Optional[int] = None,
+    until: Optional[datetime] = None,
+    current_user = Depends(admin_required),
+    db = Depends(get_db)
+):
+    """Rebuild appointment state from the event log (up to `until`) and compare it with the table - admin"""
+    await event_log.flush()
+    return await run_db(db, replay, appointment_id=appointment_id, until=until)
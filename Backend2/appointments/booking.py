@@ -0,0 +1,57 @@
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+from db import run_db
+from models import Appointment
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Retries only cover transient failures (locked database, serialization
+# failure, deadlock). A uniqueness conflict is final: the slot is taken.
+BOOKING_MAX_RETRIES = int(os.getenv("BOOKING_MAX_RETRIES", 3))
+BOOKING_RETRY_BACKOFF_SECONDS = float(os.getenv("BOOKING_RETRY_BACKOFF_SECONDS", 0.01))
+
+
+class SlotAlreadyBooked(Exception):
+    """Raised when the active-slot unique index rejects a booking"""
+
+
+def insert_appointment_once(db: Session, doctor_id: int, patient_id: int, date, time_of_day) -> Appointment:
+    appointment = Appointment(
+        doctor_id=doctor_id,
+        patient_id=patient_id,
+        date=date,
+        time=time_of_day,
+        status="PENDING"
+    )
+    db.add(appointment)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise SlotAlreadyBooked()
+    except OperationalError:
+        db.rollback()
+        raise
+    db.refresh(appointment)
+    return appointment
+
+
+async def insert_appointment(db, doctor_id: int, patient_id: int, date, time_of_day) -> Appointment:
+    """
+    Book a slot with a plain INSERT and let uq_appointments_active_slot decide.
+
+    There is no SELECT-then-INSERT window, so concurrent requests for the same
+    slot cannot both succeed, and requests for different slots never wait on
+    each other's existence checks.
+    """
+    for attempt in range(BOOKING_MAX_RETRIES + 1):
+        try:
+            return await run_db(db, insert_appointment_once, doctor_id, patient_id, date, time_of_day)
+        except OperationalError as e:
+            if attempt == BOOKING_MAX_RETRIES:
+                raise
+            logger.warning("Booking attempt %d failed transiently: %s", attempt + 1, e.orig)
+            await asyncio.sleep(BOOKING_RETRY_BACKOFF_SECONDS * (2 ** attempt))
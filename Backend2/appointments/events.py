@@ -0,0 +1,228 @@
+"""
+Write-behind appointment event log.
+
+Request handlers call event_log.record(...), which only appends to an
+in-memory buffer. A background task writes the buffer to appointment_events
+in batches every EVENT_FLUSH_INTERVAL_SECONDS, or sooner once
+EVENT_BATCH_SIZE events are waiting, and once more on shutdown.
+
+Events still in the buffer are lost if the process crashes; the
+appointments table stays the source of truth and replay() reports any
+appointment whose replayed status disagrees with it.
+"""
+from collections import deque
+from datetime import datetime
+import asyncio
+import logging
+import os
+import threading
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from models import Appointment, AppointmentEvent
+
+logger = logging.getLogger(__name__)
+
+EVENT_FLUSH_INTERVAL_SECONDS = float(os.getenv("EVENT_FLUSH_INTERVAL_SECONDS", 0.5))
+EVENT_BATCH_SIZE = int(os.getenv("EVENT_BATCH_SIZE", 500))
+# Beyond this many unwritten events (database down) the oldest are dropped
+EVENT_BUFFER_MAX = int(os.getenv("EVENT_BUFFER_MAX", 100000))
+
+CREATED = "CREATED"
+CANCELLED = "CANCELLED"
+STATUS_CHANGED = "STATUS_CHANGED"
+
+
+class EventLog:
+    def __init__(self, engine=None):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._buffer = deque()
+        self._wakeup = None
+        self._task = None
+        self._flush_lock = None
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+
+    # ---------- request path ----------
+    def record(self, event_type: str, appointment, actor_id=None):
+        """Queue an event for appointment (after its change was committed)"""
+        event = {
+            "appointment_id": appointment.id,
+            "event_type": event_type,
+            "status": appointment.status,
+            "doctor_id": appointment.doctor_id,
+            "patient_id": appointment.patient_id,
+            "date": appointment.date,
+            "time": appointment.time,
+            "actor_id": actor_id,
+            "occurred_at": datetime.utcnow(),
+        }
+        with self._lock:
+            if len(self._buffer) >= EVENT_BUFFER_MAX:
+                self._buffer.popleft()
+                self.dropped += 1
+            self._buffer.append(event)
+            pending = len(self._buffer)
+        self._ensure_started()
+        if pending >= EVENT_BATCH_SIZE and self._wakeup is not None:
+            self._wakeup.set()
+
+    # ---------- background writer ----------
+    def _ensure_started(self):
+        """Start the writer on the running loop if it is not running there yet"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = loop.create_task(self._run())
+
+    def start(self):
+        self._ensure_started()
+
+    async def stop(self):
+        """Stop the writer and write whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=EVENT_FLUSH_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Write every buffered event; returns how many were written"""
+        self._ensure_started()
+        async with self._flush_lock or asyncio.Lock():
+            written = 0
+            while True:
+                with self._lock:
+                    batch = [self._buffer.popleft() for _ in range(min(EVENT_BATCH_SIZE, len(self._buffer)))]
+                if not batch:
+                    return written
+                try:
+                    await run_in_threadpool(self._write, batch)
+                except Exception as e:
+                    # Put the batch back in order and retry on the next tick
+                    with self._lock:
+                        self._buffer.extendleft(reversed(batch))
+                        self.failed_flushes += 1
+                    logger.warning("Appointment event flush failed (%d pending): %s", len(self._buffer), e)
+                    return written
+                written += len(batch)
+                self.written += len(batch)
+
+    def _write(self, batch):
+        with self.engine.begin() as conn:
+            conn.execute(insert(AppointmentEvent), batch)
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._buffer)
+        return {
+            "pending": pending,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes,
+            "running": self._task is not None and not self._task.done(),
+        }
+
+
+def _event_log():
+    from db import engine
+    return EventLog(engine)
+
+
+event_log = _event_log()
+
+
+# ========================================
+# Reading and replay
+# ========================================
+def event_to_dict(e):
+    return {
+        "id": e.id,
+        "appointment_id": e.appointment_id,
+        "event_type": e.event_type,
+        "status": e.status,
+        "doctor_id": e.doctor_id,
+        "patient_id": e.patient_id,
+        "date": e.date.isoformat() if e.date else None,
+        "time": e.time.strftime("%H:%M") if e.time else None,
+        "actor_id": e.actor_id,
+        "occurred_at": e.occurred_at.isoformat(),
+    }
+
+
+def events_query(after_id: int = 0, appointment_id=None, until: datetime = None):
+    query = select(AppointmentEvent).where(AppointmentEvent.id > after_id)
+    if appointment_id is not None:
+        query = query.where(AppointmentEvent.appointment_id == appointment_id)
+    if until is not None:
+        query = query.where(AppointmentEvent.occurred_at <= until)
+    return query.order_by(AppointmentEvent.id)
+
+
+def list_events(db: Session, after_id: int = 0, limit: int = 1000, appointment_id=None, until=None):
+    """One page of events in log order; continue with after_id = last id"""
+    return [
+        event_to_dict(e)
+        for e in db.execute(events_query(after_id, appointment_id, until).limit(limit)).scalars()
+    ]
+
+
+def replay(db: Session, appointment_id=None, until: datetime = None, batch_size: int = 1000):
+    """
+    Rebuild appointment state by folding the log in order.
+
+    Returns counts by replayed status and, for the appointments the log
+    knows about, any whose replayed status differs from the appointments
+    table (changes lost before a flush, or rows deleted since).
+    With appointment_id, also returns that appointment's history.
+    """
+    state = {}
+    history = []
+    result = db.execute(
+        events_query(0, appointment_id, until).execution_options(yield_per=batch_size)
+    ).scalars()
+    for e in result:
+        state[e.appointment_id] = (e.status, e.doctor_id, e.patient_id, e.date, e.time)
+        if appointment_id is not None:
+            history.append(event_to_dict(e))
+
+    by_status = {}
+    for status, *_ in state.values():
+        by_status[status] = by_status.get(status, 0) + 1
+
+    mismatches = []
+    ids = list(state)
+    for i in range(0, len(ids), batch_size):
+        chunk = ids[i:i + batch_size]
+        current = dict(db.execute(
+            select(Appointment.id, Appointment.status).where(Appointment.id.in_(chunk))
+        ).all())
+        for apt_id in chunk:
+            replayed = state[apt_id][0]
+            if current.get(apt_id) != replayed:
+                mismatches.append({"appointment_id": apt_id, "replayed": replayed, "current": current.get(apt_id)})
+
+    summary = {"appointments": len(state), "by_status": by_status, "mismatches": mismatches}
+    if appointment_id is not None:
+        summary["history"] = history
+    return summary
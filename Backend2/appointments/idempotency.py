@@ -0,0 +1,123 @@
+"""
+Idempotency-Key support for POST /appointments/.
+
+A client sends the same Idempotency-Key with every retry of one booking.
+The first request with a key runs the booking; its outcome is kept for
+IDEMPOTENCY_TTL_SECONDS and later requests with that key get it back
+without touching the appointments table. Requests that arrive while the
+first is still running wait for its outcome instead of booking again.
+
+Keys are scoped to the user, and reusing a key for a different request
+body is rejected with 422. Transient failures (429, 5xx) are not stored,
+so a retry after one of them books normally.
+
+The store is per worker process. A retry that lands on another worker
+books again and meets the active-slot unique index; the router then
+returns the patient's existing appointment for that slot.
+
+    IDEMPOTENCY_TTL_SECONDS  how long outcomes are kept (default 86400)
+    IDEMPOTENCY_MAX_KEYS     outcomes kept per worker, LRU (default 10000)
+"""
+import asyncio
+import hashlib
+import json
+import os
+
+from fastapi import HTTPException, status
+
+from cache import TTLCache
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", 86400))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", 10000))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+
+def fingerprint(payload: dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def is_final(error: HTTPException) -> bool:
+    """Whether an error is the booking's real outcome rather than a reason to retry"""
+    return error.status_code < 500 and error.status_code != status.HTTP_429_TOO_MANY_REQUESTS
+
+
+class IdempotencyStore:
+    """Stored outcomes in a TTLCache plus the futures of bookings still running"""
+
+    def __init__(self, ttl_seconds: float = IDEMPOTENCY_TTL_SECONDS, max_keys: int = IDEMPOTENCY_MAX_KEYS):
+        # key -> (fingerprint, ("ok", body) | ("error", status_code, detail))
+        self._outcomes = TTLCache(ttl_seconds=ttl_seconds, max_entries=max_keys)
+        # key -> (fingerprint, Future); touched only from this worker's event loop
+        self._running = {}
+        self.hits = 0
+        self.joined = 0
+        self.misses = 0
+
+    async def run(self, key, request_fingerprint: str, fn):
+        """
+        Return (body, replayed). Runs `await fn()` once per key; a stored or
+        in-flight outcome with the same fingerprint is shared instead.
+        """
+        stored = self._outcomes.get(key)
+        if stored is not None:
+            self._check(stored[0], request_fingerprint)
+            self.hits += 1
+            return self._replay(stored[1]), True
+
+        running = self._running.get(key)
+        if running is not None:
+            self._check(running[0], request_fingerprint)
+            self.joined += 1
+            # shield: a disconnecting retry must not cancel the booking it joined
+            outcome = await asyncio.shield(running[1])
+            if outcome is None:
+                # The first request died without an outcome (crash, disconnect); try ourselves
+                return await self.run(key, request_fingerprint, fn)
+            return self._replay(outcome), True
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._running[key] = (request_fingerprint, future)
+        try:
+            outcome = ("ok", await fn())
+        except HTTPException as e:
+            outcome = ("error", e.status_code, e.detail)
+            if is_final(e):
+                self._outcomes.set(key, (request_fingerprint, outcome))
+            future.set_result(outcome)
+            raise
+        except BaseException:
+            future.set_result(None)
+            raise
+        else:
+            self._outcomes.set(key, (request_fingerprint, outcome))
+            future.set_result(outcome)
+            return outcome[1], False
+        finally:
+            del self._running[key]
+
+    @staticmethod
+    def _check(stored_fingerprint: str, request_fingerprint: str):
+        if stored_fingerprint != request_fingerprint:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used for a different request"
+            )
+
+    @staticmethod
+    def _replay(outcome):
+        if outcome[0] == "error":
+            raise HTTPException(status_code=outcome[1], detail=outcome[2], headers={"Idempotent-Replayed": "true"})
+        return outcome[1]
+
+    def stats(self):
+        return {
+            "stored": len(self._outcomes),
+            "running": len(self._running),
+            "hits": self.hits,
+            "joined": self.joined,
+            "misses": self.misses,
+        }
+
+
+idempotency_store = IdempotencyStore()
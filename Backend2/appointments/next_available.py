@@ -0,0 +1,71 @@
+"""
+Earliest free slots across doctors.
+
+Each candidate doctor gets a lazy, time-ordered stream of free slots read a
+few days at a time from the slot index. heapq.merge combines the streams
+(k-way merge on a heap holding one pending slot per doctor) and the search
+stops as soon as `limit` slots have been taken, so a doctor's calendar is
+only read as far as needed.
+"""
+from datetime import datetime, time, timedelta
+from itertools import islice
+import heapq
+import os
+
+from sqlalchemy import exists, or_
+from sqlalchemy.orm import Session
+from models import Doctor, DoctorSchedule, ScheduleException, ExceptionKind
+from doctors.slots import slot_index
+from doctors.availability import horizon
+
+# How far ahead to look before giving up on a doctor
+NEXT_AVAILABLE_MAX_DAYS = int(os.getenv("NEXT_AVAILABLE_MAX_DAYS", 90))
+# Days of slots fetched per doctor at a time
+NEXT_AVAILABLE_CHUNK_DAYS = 7
+
+
+def candidate_doctors(db: Session, specialty, start, end):
+    """Doctors (optionally of one specialty) with any weekly window or extra window in range"""
+    query = db.query(Doctor).filter(or_(
+        exists().where(DoctorSchedule.doctor_id == Doctor.id),
+        exists().where(
+            ScheduleException.doctor_id == Doctor.id,
+            ScheduleException.kind == ExceptionKind.OPEN,
+            ScheduleException.date >= start,
+            ScheduleException.date <= end
+        )
+    ))
+    if specialty:
+        query = query.filter(Doctor.specialty == specialty)
+    return query.order_by(Doctor.id).all()
+
+
+def doctor_slot_stream(db: Session, doctor: Doctor, after: datetime, last_day):
+    """Yield (start_at, doctor_id, doctor) for free slots at or after `after`, in order"""
+    day = after.date()
+    while day <= last_day:
+        chunk_end = min(day + timedelta(days=NEXT_AVAILABLE_CHUNK_DAYS - 1), last_day)
+        for slot_date, slot_time in slot_index.get_free_slots(db, doctor, day, chunk_end):
+            start_at = datetime.combine(slot_date, slot_time)
+            if start_at >= after:
+                yield start_at, doctor.id, doctor
+        day = chunk_end + timedelta(days=1)
+
+
+def find_next_available(db: Session, specialty=None, after: datetime = None, limit: int = 10):
+    """Return up to limit (start_at, doctor) pairs ordered by start time, then doctor id"""
+    after = after or datetime.now()
+    if after.tzinfo is not None:
+        # Slots are naive server-local times
+        after = after.astimezone().replace(tzinfo=None)
+    # Only dates inside the availability horizon can be searched
+    first, last = horizon()
+    after = max(after, datetime.combine(first, time.min))
+    last_day = min(after.date() + timedelta(days=NEXT_AVAILABLE_MAX_DAYS - 1), last)
+    if after.date() > last_day:
+        return []
+
+    doctors = candidate_doctors(db, specialty, after.date(), last_day)
+    streams = [doctor_slot_stream(db, doctor, after, last_day) for doctor in doctors]
+    # Tuples compare on (start_at, doctor_id), which are unique per slot
+    return [(start_at, doctor) for start_at, _, doctor in islice(heapq.merge(*streams), limit)]
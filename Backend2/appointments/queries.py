@@ -0,0 +1,151 @@
+from datetime import datetime, date, time, timedelta
+from functools import lru_cache
+from typing import Optional
+import base64
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from models import Appointment, Doctor, User
+
+# ========================================
+# Listing queries
+# ========================================
+# Each listing is a single SELECT that joins doctors and patients and only
+# pulls the columns the response needs, so the number of statements does not
+# grow with the number of appointments.
+
+LISTING_COLUMNS = (
+    Appointment.id,
+    Appointment.date,
+    Appointment.time,
+    Appointment.status,
+    Doctor.id.label("doctor_id"),
+    Doctor.name.label("doctor_name"),
+    Doctor.specialty.label("doctor_specialty"),
+    Doctor.duration_minutes.label("duration_minutes"),
+    User.id.label("patient_id"),
+    User.name.label("patient_name"),
+)
+
+
+def appointment_listing_query(db: Session):
+    """Base query for appointment listings with doctor and patient joined in"""
+    return (
+        db.query(*LISTING_COLUMNS)
+        .outerjoin(Doctor, Appointment.doctor_id == Doctor.id)
+        .outerjoin(User, Appointment.patient_id == User.id)
+    )
+
+
+def list_patient_appointments(db: Session, patient_id: int):
+    return appointment_listing_query(db).filter(
+        Appointment.patient_id == patient_id
+    ).all()
+
+
+def list_doctor_appointments(db: Session, doctor_id: int):
+    return appointment_listing_query(db).filter(
+        Appointment.doctor_id == doctor_id,
+        Appointment.status != "CANCELLED"
+    ).all()
+
+
+# ========================================
+# Keyset pagination
+# ========================================
+# /appointments/all is ordered by (date, time, id). A cursor encodes the last
+# row of a page, and the next page continues strictly after it, so every page
+# is an index range scan no matter how deep into the table it is.
+
+def encode_cursor(row) -> str:
+    raw = f"{row.date.isoformat()}|{row.time.strftime('%H:%M:%S')}|{row.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Return (date, time, id) from a cursor, raising ValueError if malformed"""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        day, clock, apt_id = raw.split("|")
+        return date.fromisoformat(day), time.fromisoformat(clock), int(apt_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def filtered_listing_query(
+    db: Session,
+    doctor_id: Optional[int] = None,
+    patient_id: Optional[int] = None,
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    cursor: Optional[str] = None,
+):
+    """Listing query with admin filters and keyset ordering on (date, time, id)"""
+    query = appointment_listing_query(db)
+
+    if doctor_id is not None:
+        query = query.filter(Appointment.doctor_id == doctor_id)
+    if patient_id is not None:
+        query = query.filter(Appointment.patient_id == patient_id)
+    if status:
+        query = query.filter(Appointment.status == status.upper())
+    if date_from:
+        query = query.filter(Appointment.date >= date_from)
+    if date_to:
+        query = query.filter(Appointment.date <= date_to)
+
+    if cursor:
+        last_date, last_time, last_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Appointment.date > last_date,
+            and_(Appointment.date == last_date, Appointment.time > last_time),
+            and_(Appointment.date == last_date, Appointment.time == last_time, Appointment.id > last_id),
+        ))
+
+    return query.order_by(Appointment.date, Appointment.time, Appointment.id)
+
+
+def list_appointments_page(db: Session, limit: int, **filters):
+    """Return (rows, next_cursor); next_cursor is None on the last page"""
+    rows = filtered_listing_query(db, **filters).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+# ========================================
+# Row formatting
+# ========================================
+# Listings repeat the same few (date, time, duration) combinations many times,
+# so the ISO strings are computed once per combination
+@lru_cache(maxsize=8192)
+def slot_times(day: date, clock: time, duration_minutes: int):
+    start_datetime = datetime.combine(day, clock)
+    end_datetime = start_datetime + timedelta(minutes=duration_minutes or 60)
+    return start_datetime.isoformat(), end_datetime.isoformat()
+
+
+def row_times(row):
+    return slot_times(row.date, row.time, row.duration_minutes)
+
+
+def row_to_dict(row, include_people: bool = True):
+    """Format a listing row the way the appointment endpoints return it"""
+    # Positional unpacking follows LISTING_COLUMNS
+    (apt_id, day, clock, status, doctor_id, doctor_name, doctor_specialty,
+     duration_minutes, patient_id, patient_name) = row
+    start_at, end_at = slot_times(day, clock, duration_minutes)
+    if not include_people:
+        return {"id": apt_id, "start_at": start_at, "end_at": end_at, "status": status}
+    return {
+        "id": apt_id,
+        "start_at": start_at,
+        "end_at": end_at,
+        "status": status,
+        "doctor": {"id": doctor_id, "name": doctor_name, "specialty": doctor_specialty}
+        if doctor_id is not None else None,
+        "patient": {"id": patient_id, "name": patient_name}
+        if patient_id is not None else None,
+    }
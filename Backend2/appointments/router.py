@@ -1,11 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from db import get_db
+from db import get_db, run_db, SessionLocal
 from models import Appointment, Doctor, User
 from auth.utils import get_current_user, admin_required
-from appointments.schemas import AppointmentCreate, AppointmentOut
-from datetime import datetime, timedelta
-from typing import List
+from auth.principals import Principal
+from appointments.schemas import (
+    AppointmentCreate, AppointmentOut, AppointmentListItem, AppointmentSlotOut, NextAvailableSlot,
+    AppointmentStatusUpdate
+)
+from appointments.booking import insert_appointment, SlotAlreadyBooked
+from appointments.queries import (
+    list_appointments_page, filtered_listing_query, decode_cursor,
+    list_patient_appointments, list_doctor_appointments, row_to_dict
+)
+from appointments.next_available import find_next_available
+from appointments import events
+from appointments.events import event_log
+from appointments.idempotency import idempotency_store, fingerprint, IDEMPOTENCY_KEY_MAX_LENGTH
+from doctors import invalidation
+from doctors.live import publish_slot
+from admin.router import stats_cache
+from ratelimit import (
+    BOOKING_PER_IP, BOOKING_PER_USER, Overloaded, booking_admission, enforce, client_ip, busy_exception
+)
+from responses import FastJSONResponse, dumps
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta, date
+from typing import List, Optional
 import logging
 
 # ✅ Configure logger
@@ -14,6 +36,45 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/appointments", tags=["appointments"])
 
+# ========================================
+# DB helpers (run through run_db)
+# ========================================
+def get_doctor_by_id(db: Session, doctor_id: int):
+    return db.query(Doctor).filter(Doctor.id == doctor_id).first()
+
+def get_appointment_by_id(db: Session, appointment_id: int):
+    return db.query(Appointment).filter(Appointment.id == appointment_id).first()
+
+def get_active_booking(db: Session, doctor_id: int, patient_id: int, date, time_of_day):
+    """The patient's active appointment in a slot, if the slot is theirs"""
+    return db.query(Appointment).filter(
+        Appointment.doctor_id == doctor_id,
+        Appointment.patient_id == patient_id,
+        Appointment.date == date,
+        Appointment.time == time_of_day,
+        Appointment.status != "CANCELLED"
+    ).first()
+
+def mark_cancelled(db: Session, appointment: Appointment) -> bool:
+    """Cancel an appointment; returns whether it was still active"""
+    was_active = appointment.status != "CANCELLED"
+    appointment.status = "CANCELLED"
+    db.commit()
+    return was_active
+
+def set_status(db: Session, appointment: Appointment, status: str) -> str:
+    """Change an appointment's status; returns the previous one"""
+    previous = appointment.status
+    appointment.status = status
+    try:
+        db.commit()
+    except IntegrityError:
+        # Re-activating a cancelled appointment whose slot was booked again
+        db.rollback()
+        appointment.status = previous
+        raise
+    return previous
+
 # ========================================
 # PATIENT ENDPOINTS
 # ========================================
@@ -22,14 +83,42 @@ router = APIRouter(prefix="/appointments", tags=["appointments"])
 @router.post("/", response_model=AppointmentOut)
 async def book_appointment(
     request: AppointmentCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    http_request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    db = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, max_length=IDEMPOTENCY_KEY_MAX_LENGTH)
 ):
-    """Book an appointment"""
-    logger.info(f"Received appointment request: doctor_id={request.doctor_id}, date={request.date}, time={request.time}")
+    """Book an appointment; retries sending the same Idempotency-Key book it only once"""
+    async def limited_booking(retry_safe: bool = False):
+        # Only requests that will book take a token; replays of a stored or
+        # in-flight outcome are answered without touching the limits
+        await enforce(BOOKING_PER_IP, client_ip(http_request))
+        await enforce(BOOKING_PER_USER, current_user.id)
+        return await create_booking(request, current_user, db, retry_safe=retry_safe)
+
+    if idempotency_key is None:
+        return await limited_booking()
+
+    body, replayed = await idempotency_store.run(
+        (current_user.id, idempotency_key),
+        fingerprint(request.model_dump()),
+        lambda: limited_booking(retry_safe=True)
+    )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return body
+
+async def create_booking(request: AppointmentCreate, current_user: Principal, db, retry_safe: bool = False):
+    """
+    Insert the appointment and return the response body. With retry_safe, a
+    slot already held by this patient is a retry of their own booking and is
+    returned as the result instead of a conflict.
+    """
+    logger.info("Received appointment request: doctor_id=%s, date=%s, time=%s", request.doctor_id, request.date, request.time)
     
     # Verify doctor exists
-    doctor = db.query(Doctor).filter(Doctor.id == request.doctor_id).first()
+    doctor = await run_db(db, get_doctor_by_id, request.doctor_id)
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found")
     
@@ -44,32 +133,40 @@ async def book_appointment(
     # Combine into datetime objects
     start_datetime = datetime.combine(appointment_date, appointment_time)
     end_datetime = start_datetime + timedelta(minutes=doctor.duration_minutes)
+    # Read before inserting: a rejected insert rolls back and expires `doctor`
+    doctor_info = {"id": doctor.id, "name": doctor.name, "specialty": doctor.specialty}
     
-    # Check if slot is already booked
-    existing = db.query(Appointment).filter(
-        Appointment.doctor_id == request.doctor_id,
-        Appointment.date == appointment_date,
-        Appointment.time == appointment_time,
-        Appointment.status != "CANCELLED"
-    ).first()
-    
-    if existing:
-        raise HTTPException(status_code=400, detail="This time slot is already booked")
-    
-    # Create appointment
-    new_appointment = Appointment(
-        doctor_id=request.doctor_id,
-        patient_id=current_user.id,
-        date=appointment_date,
-        time=appointment_time,
-        status="PENDING"
-    )
-    
-    db.add(new_appointment)
-    db.commit()
-    db.refresh(new_appointment)
-    
-    logger.info(f"Appointment created successfully: id={new_appointment.id}")
+    # Insert and let the active-slot unique index reject double bookings;
+    # past booking_admission's queue the request is shed with 503
+    created = True
+    try:
+        async with booking_admission:
+            new_appointment = await insert_appointment(
+                db,
+                doctor_id=request.doctor_id,
+                patient_id=current_user.id,
+                date=appointment_date,
+                time_of_day=appointment_time
+            )
+    except SlotAlreadyBooked:
+        new_appointment = None
+        if retry_safe:
+            new_appointment = await run_db(
+                db, get_active_booking, doctor_info["id"], current_user.id, appointment_date, appointment_time
+            )
+        if new_appointment is None:
+            raise HTTPException(status_code=400, detail="This time slot is already booked")
+        created = False
+    except Overloaded:
+        raise busy_exception()
+    if created:
+        await invalidation.slot_taken(doctor_info["id"], appointment_date, appointment_time)
+        stats_cache.clear()
+        await publish_slot("taken", doctor_info["id"], appointment_date, appointment_time)
+        event_log.record(events.CREATED, new_appointment, actor_id=current_user.id)
+        logger.info("Appointment created successfully: id=%s", new_appointment.id)
+    else:
+        logger.info("Booking retry matched existing appointment: id=%s", new_appointment.id)
     
     # Return formatted response
     return {
@@ -77,11 +174,7 @@ async def book_appointment(
         "start_at": start_datetime.isoformat(),
         "end_at": end_datetime.isoformat(),
         "status": new_appointment.status,
-        "doctor": {
-            "id": doctor.id,
-            "name": doctor.name,
-            "specialty": doctor.specialty
-        },
+        "doctor": doctor_info,
         "patient": {
             "id": current_user.id,
             "name": current_user.name
@@ -89,52 +182,24 @@ async def book_appointment(
     }
 
 # Get my appointments - FIXED
-@router.get("/me", response_model=List[AppointmentOut])
+@router.get("/me", response_model=List[AppointmentListItem])
 async def get_my_appointments(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db = Depends(get_db)
 ):
     """Get current user's appointments"""
-    appointments = db.query(Appointment).filter(
-        Appointment.patient_id == current_user.id
-    ).all()
-    
-    result = []
-    for apt in appointments:
-        # Combine date and time into datetime
-        start_datetime = datetime.combine(apt.date, apt.time)
-        
-        # Calculate end time using doctor's duration
-        duration = apt.doctor.duration_minutes if apt.doctor else 60
-        end_datetime = start_datetime + timedelta(minutes=duration)
-        
-        result.append({
-            "id": apt.id,
-            "start_at": start_datetime.isoformat(),
-            "end_at": end_datetime.isoformat(),
-            "status": apt.status,
-            "doctor": {
-                "id": apt.doctor.id,
-                "name": apt.doctor.name,
-                "specialty": apt.doctor.specialty
-            } if apt.doctor else None,
-            "patient": {
-                "id": current_user.id,
-                "name": current_user.name
-            }
-        })
-    
-    return result
+    rows = await run_db(db, list_patient_appointments, current_user.id)
+    return FastJSONResponse([row_to_dict(row) for row in rows])
 
 # Cancel appointment - FIXED
 @router.delete("/{appointment_id}")
 async def cancel_appointment(
     appointment_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db = Depends(get_db)
 ):
     """Cancel appointment"""
-    appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+    appointment = await run_db(db, get_appointment_by_id, appointment_id)
     
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
@@ -143,10 +208,14 @@ async def cancel_appointment(
         raise HTTPException(status_code=403, detail="Not authorized")
     
     # Mark as cancelled
-    appointment.status = "CANCELLED"
-    db.commit()
+    was_active = await run_db(db, mark_cancelled, appointment)
+    if was_active:
+        await invalidation.slot_freed(appointment.doctor_id, appointment.date, appointment.time)
+        stats_cache.clear()
+        await publish_slot("freed", appointment.doctor_id, appointment.date, appointment.time)
+        event_log.record(events.CANCELLED, appointment, actor_id=current_user.id)
     
-    logger.info(f"Appointment {appointment_id} cancelled by user {current_user.id}")
+    logger.info("Appointment %s cancelled by user %s", appointment_id, current_user.id)
     
     return {"message": "Appointment cancelled successfully"}
 
@@ -154,66 +223,128 @@ async def cancel_appointment(
 # PUBLIC/DOCTOR ENDPOINTS
 # ========================================
 
+# Earliest free slots across doctors
+@router.get("/next-available", response_model=List[NextAvailableSlot])
+async def get_next_available(
+    specialty: Optional[str] = None,
+    after: Optional[datetime] = None,
+    limit: int = Query(10, ge=1, le=100),
+    db = Depends(get_db)
+):
+    """Earliest free slots of any doctor (optionally of one specialty) from `after` (default now)"""
+    slots = await run_db(db, find_next_available, specialty=specialty, after=after, limit=limit)
+    return FastJSONResponse([
+        {
+            "doctor": {
+                "id": doctor.id,
+                "name": doctor.name,
+                "specialty": doctor.specialty
+            },
+            "date": start_at.date().isoformat(),
+            "time": start_at.strftime("%H:%M"),
+            "start_at": start_at.isoformat(),
+            "end_at": (start_at + timedelta(minutes=doctor.duration_minutes or 60)).isoformat()
+        }
+        for start_at, doctor in slots
+    ])
+
 # Get doctor's appointments
-@router.get("/doctor/{doctor_id}")
+@router.get("/doctor/{doctor_id}", response_model=List[AppointmentSlotOut])
 async def get_doctor_appointments(
     doctor_id: int,
-    db: Session = Depends(get_db)
+    db = Depends(get_db)
 ):
     """Get all appointments for a specific doctor"""
-    appointments = db.query(Appointment).filter(
-        Appointment.doctor_id == doctor_id,
-        Appointment.status != "CANCELLED"
-    ).all()
-    
-    result = []
-    for apt in appointments:
-        start_datetime = datetime.combine(apt.date, apt.time)
-        duration = apt.doctor.duration_minutes if apt.doctor else 60
-        end_datetime = start_datetime + timedelta(minutes=duration)
-        
-        result.append({
-            "id": apt.id,
-            "start_at": start_datetime.isoformat(),
-            "end_at": end_datetime.isoformat(),
-            "status": apt.status
-        })
-    
-    return result
+    rows = await run_db(db, list_doctor_appointments, doctor_id)
+    return FastJSONResponse([row_to_dict(row, include_people=False) for row in rows])
 
 # ========================================
 # ADMIN ENDPOINTS
 # ========================================
 
+# Change appointment status - ADMIN
+@router.put("/{appointment_id}/status")
+async def update_appointment_status(
+    appointment_id: int,
+    update: AppointmentStatusUpdate,
+    current_user = Depends(admin_required),
+    db = Depends(get_db)
+):
+    """Set an appointment to PENDING, CONFIRMED or CANCELLED (admin only)"""
+    appointment = await run_db(db, get_appointment_by_id, appointment_id)
+    if not appointment:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+
+    try:
+        previous = await run_db(db, set_status, appointment, update.status)
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail="This time slot is already booked")
+
+    if previous != update.status:
+        if update.status == "CANCELLED":
+            await invalidation.slot_freed(appointment.doctor_id, appointment.date, appointment.time)
+            await publish_slot("freed", appointment.doctor_id, appointment.date, appointment.time)
+        elif previous == "CANCELLED":
+            await invalidation.slot_taken(appointment.doctor_id, appointment.date, appointment.time)
+            await publish_slot("taken", appointment.doctor_id, appointment.date, appointment.time)
+        stats_cache.clear()
+        event_log.record(events.STATUS_CHANGED, appointment, actor_id=current_user.id)
+
+    return {"id": appointment.id, "status": appointment.status, "previous_status": previous}
+
 # Get all appointments - ADMIN
-@router.get("/all")
+@router.get("/all", response_model=List[AppointmentListItem])
 async def get_all_appointments(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    doctor_id: Optional[int] = None,
+    patient_id: Optional[int] = None,
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
     current_user = Depends(admin_required),
-    db: Session = Depends(get_db)
+    db = Depends(get_db)
 ):
-    """Get all appointments (admin only)"""
-    appointments = db.query(Appointment).all()
-    
-    result = []
-    for apt in appointments:
-        start_datetime = datetime.combine(apt.date, apt.time)
-        duration = apt.doctor.duration_minutes if apt.doctor else 60
-        end_datetime = start_datetime + timedelta(minutes=duration)
-        
-        result.append({
-            "id": apt.id,
-            "start_at": start_datetime.isoformat(),
-            "end_at": end_datetime.isoformat(),
-            "status": apt.status,
-            "doctor": {
-                "id": apt.doctor.id,
-                "name": apt.doctor.name,
-                "specialty": apt.doctor.specialty
-            } if apt.doctor else None,
-            "patient": {
-                "id": apt.patient.id,
-                "name": apt.patient.name
-            } if apt.patient else None
-        })
-    
-    return result
\ No newline at end of file
+    """
+    Get appointments (admin only), ordered by date, time and id.
+
+    Pages are keyset paginated: pass the X-Next-Cursor header of a response as
+    ?cursor= to get the next page. format=ndjson streams every matching row
+    (limit is ignored) without loading them all into memory.
+    """
+    filters = {
+        "doctor_id": doctor_id,
+        "patient_id": patient_id,
+        "status": status,
+        "date_from": date_from,
+        "date_to": date_to,
+        "cursor": cursor,
+    }
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    if format == "ndjson":
+        return StreamingResponse(_stream_appointments(filters), media_type="application/x-ndjson")
+
+    rows, next_cursor = await run_db(db, list_appointments_page, limit, **filters)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return FastJSONResponse([row_to_dict(row) for row in rows], headers=headers)
+
+
+def _stream_appointments(filters, batch_size: int = 1000):
+    """Yield one JSON line per appointment using a server-side cursor"""
+    # The request session may be closed before the body is sent,
+    # so the stream owns its own session
+    db = SessionLocal()
+    try:
+        query = filtered_listing_query(db, **filters).execution_options(
+            stream_results=True, yield_per=batch_size
+        )
+        for row in query:
+            yield dumps(row_to_dict(row)) + b"\n"
+    finally:
+        db.close()
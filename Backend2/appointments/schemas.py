@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Literal, Optional
 
 class DoctorInfo(BaseModel):
     id: int
@@ -27,7 +27,33 @@ class AppointmentOut(BaseModel):
     class Config:
         from_attributes = True
 
+# Listing rows: doctor/patient are null if the row outlived them
+class AppointmentListItem(BaseModel):
+    id: int
+    start_at: str
+    end_at: str
+    status: str
+    doctor: Optional[DoctorInfo] = None
+    patient: Optional[PatientInfo] = None
+
+# Public per-doctor listing (no patient details)
+class AppointmentSlotOut(BaseModel):
+    id: int
+    start_at: str
+    end_at: str
+    status: str
+
+class NextAvailableSlot(BaseModel):
+    doctor: DoctorInfo
+    date: str
+    time: str
+    start_at: str
+    end_at: str
+
 class AppointmentCreate(BaseModel):
     doctor_id: int
     date: str   # "YYYY-MM-DD"
-    time: str   # "HH:MM"
\ No newline at end of file
+    time: str   # "HH:MM"
+
+class AppointmentStatusUpdate(BaseModel):
+    status: Literal["PENDING", "CONFIRMED", "CANCELLED"]
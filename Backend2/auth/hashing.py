@@ -0,0 +1,117 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import asyncio
+import contextvars
+import os
+import threading
+import time
+
+from request_context import note_thread, record_hashing
+from ratelimit import Overloaded
+
+# ========================================
+# Argon2 configuration
+# ========================================
+# Raising these makes new hashes more expensive; existing hashes made with
+# older parameters are upgraded the next time their owner logs in.
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", 3))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", 65536))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", 4))
+
+# argon2-cffi releases the GIL while hashing, so threads scale across cores
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", os.cpu_count() or 1))
+# Hashes allowed to wait for a thread; beyond that submit() raises Overloaded (0 = no limit)
+HASH_MAX_QUEUE = int(os.getenv("HASH_MAX_QUEUE", 64))
+
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    """The process-wide CryptContext, built (and passlib imported) on first use"""
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["argon2"],
+        deprecated="auto",
+        argon2__time_cost=ARGON2_TIME_COST,
+        argon2__memory_cost=ARGON2_MEMORY_COST,
+        argon2__parallelism=ARGON2_PARALLELISM,
+    )
+
+
+class HashingPool:
+    """Fixed-size thread pool for password hashing with queue-depth counters"""
+
+    def __init__(self, size: int, max_queue: int = 0):
+        self.size = size
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="pwd-hash")
+        self._lock = threading.Lock()
+        self.queued = 0          # submitted, not yet started
+        self.running = 0         # currently hashing
+        self.max_queued = 0
+        self.rejected = 0
+        self.completed = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    def _run(self, fn, args, submitted_at):
+        note_thread()
+        started = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.total_wait_seconds += started - submitted_at
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.total_run_seconds += time.perf_counter() - started
+
+    async def submit(self, fn, *args):
+        with self._lock:
+            if self.max_queue and self.queued >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded("password hashing queue full")
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+        loop = asyncio.get_running_loop()
+        submitted_at = time.perf_counter()
+        try:
+            # Run in the request's context so the profiler sees whose thread it is
+            return await loop.run_in_executor(
+                self._executor, contextvars.copy_context().run, self._run, fn, args, submitted_at
+            )
+        finally:
+            # Queue wait plus hashing, charged to the current request when profiling
+            record_hashing(time.perf_counter() - submitted_at)
+
+    def stats(self):
+        with self._lock:
+            completed = self.completed
+            return {
+                "pool_size": self.size,
+                "queued": self.queued,
+                "running": self.running,
+                "max_queued": self.max_queued,
+                "rejected": self.rejected,
+                "completed": completed,
+                "avg_wait_ms": round(self.total_wait_seconds / completed * 1000, 3) if completed else 0.0,
+                "avg_hash_ms": round(self.total_run_seconds / completed * 1000, 3) if completed else 0.0,
+            }
+
+
+hashing_pool = HashingPool(HASH_POOL_SIZE, HASH_MAX_QUEUE)
+
+
+async def hash_password(password: str) -> str:
+    return await hashing_pool.submit(get_pwd_context().hash, password)
+
+
+async def verify_password(password: str, password_hash: str):
+    """
+    Return (valid, new_hash). new_hash is set when the stored hash was made
+    with outdated parameters and should be replaced.
+    """
+    return await hashing_pool.submit(get_pwd_context().verify_and_update, password, password_hash)
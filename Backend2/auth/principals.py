@@ -0,0 +1,111 @@
+from dataclasses import dataclass
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from cache import TTLCache
+from models import User, UserRole
+from pubsub import broker
+import os
+import threading
+
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", 300))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000))
+PRINCIPAL_CHANNEL = "principals"
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user as handlers see it (no database session attached)"""
+    id: int
+    name: str
+    email: str
+    role: UserRole
+
+    @classmethod
+    def from_user(cls, user: User):
+        return cls(id=user.id, name=user.name, email=user.email, role=user.role)
+
+
+class PrincipalCache(TTLCache):
+    """
+    TTLCache of principals by user_id with per-user generations.
+
+    invalidate() bumps the user's generation. store() ignores a principal
+    loaded under an older generation, so a load that raced a change cannot
+    put the old role back (same scheme as SlotIndex).
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 1024):
+        super().__init__(ttl_seconds, max_entries)
+        self._lock = threading.RLock()
+        self._generations = {}
+        self._epoch = 0          # bumped by clear()
+
+    def generation(self, user_id: int):
+        with self._lock:
+            return self._epoch, self._generations.get(user_id, 0)
+
+    def store(self, user_id: int, generation, principal: Principal):
+        with self._lock:
+            if self.generation(user_id) == generation:
+                self.set(user_id, principal)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self.pop(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._generations.clear()
+            super().clear()
+
+
+# user_id -> Principal
+principal_cache = PrincipalCache(ttl_seconds=PRINCIPAL_CACHE_TTL_SECONDS, max_entries=PRINCIPAL_CACHE_SIZE)
+
+
+def invalidate_principal(user_id: int):
+    principal_cache.invalidate(user_id)
+
+
+# ========================================
+# Invalidation on User changes
+# ========================================
+# Any ORM update or delete of a User invalidates its cached principal at
+# flush and again after commit. A request that loaded the user before the
+# commit took its generation before one of those bumps, so it cannot store
+# the old role; one that stored it before the commit loses it to the second.
+# After commit the user id is also published on PRINCIPAL_CHANNEL so every
+# other worker invalidates its own copy (PUBSUB_BACKEND=postgres; a resync
+# after a lost LISTEN connection clears the whole cache).
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    invalidate_principal(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_user_ids", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    for user_id in session.info.pop("changed_user_ids", ()):
+        invalidate_principal(user_id)
+        broker.publish_soon(PRINCIPAL_CHANNEL, {"user_id": user_id, "origin": os.getpid()})
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_users(session):
+    session.info.pop("changed_user_ids", None)
+
+
+def _on_message(message: dict):
+    # Our own messages come back through LISTEN; they were applied already
+    if message.get("origin") != os.getpid():
+        invalidate_principal(message["user_id"])
+
+
+broker.on(PRINCIPAL_CHANNEL, _on_message)
+broker.on_resync(principal_cache.clear)
@@ -1,25 +1,33 @@
 # auth/router.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from auth.schemas import RegisterRequest, LoginRequest
-from auth.utils import get_current_user
-from db import get_db
+from auth.utils import get_current_user, JWT_SECRET, ALGORITHM
+from auth.hashing import hash_password, verify_password
+from db import get_db, run_db
+from ratelimit import LOGIN_PER_IP, LOGIN_PER_ACCOUNT, Overloaded, enforce, client_ip, busy_exception
 from models import User, UserRole
-from passlib.context import CryptContext
 from jose import jwt
-import os
-from dotenv import load_dotenv
 from fastapi.security import OAuth2PasswordRequestForm
 
-load_dotenv()
-JWT_SECRET = os.getenv("JWT_SECRET", "fallback-secret-key")
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
-
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+def find_user_by_email(db: Session, email: str):
+    return db.query(User).filter(User.email == email).first()
+
+def save_user(db: Session, user: User):
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+def update_password_hash(db: Session, user: User, password_hash: str):
+    user.password_hash = password_hash
+    db.commit()
+
 @router.post("/register")
-async def register(request: RegisterRequest, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.email == request.email).first()
+async def register(request: RegisterRequest, db = Depends(get_db)):
+    existing_user = await run_db(db, find_user_by_email, request.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
@@ -32,7 +40,10 @@ async def register(request: RegisterRequest, db: Session = Depends(get_db)):
     
     
     password_truncated = request.password[:72]  # String slicing, not bytes
-    hashed_password = pwd_context.hash(password_truncated)
+    try:
+        hashed_password = await hash_password(password_truncated)
+    except Overloaded:
+        raise busy_exception()
     
     new_user = User(
         name=request.name,
@@ -41,9 +52,7 @@ async def register(request: RegisterRequest, db: Session = Depends(get_db)):
         role=role_enum
     )
     
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await run_db(db, save_user, new_user)
     
     return {
         "message": "User registered successfully",
@@ -56,8 +65,12 @@ async def register(request: RegisterRequest, db: Session = Depends(get_db)):
     }
 
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db = Depends(get_db)):
+    # Cheap checks first: each attempt past them costs a full argon2 verification
+    await enforce(LOGIN_PER_IP, client_ip(request))
+    await enforce(LOGIN_PER_ACCOUNT, form_data.username.lower())
+
+    user = await run_db(db, find_user_by_email, form_data.username)
     
     # TRUNCATE PASSWORD TO 72 BYTES
     # password_bytes = form_data.password.encode('utf-8')[:72]
@@ -66,19 +79,30 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
         
     password_truncated = form_data.password[:72]  # String slicing
     
-    if not user or not pwd_context.verify(password_truncated, user.password_hash):
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    try:
+        valid, new_hash = await verify_password(password_truncated, user.password_hash)
+    except Overloaded:
+        raise busy_exception()
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    # Upgrade hashes made with older argon2 parameters
+    if new_hash:
+        await run_db(db, update_password_hash, user, new_hash)
+
     token = jwt.encode(
         {"user_id": user.id, "role": user.role.value}, 
         JWT_SECRET, 
-        algorithm="HS256"
+        algorithm=ALGORITHM
     )
     
     return {"access_token": token, "token_type": "bearer"}
 
 @router.get("/me")
-def get_me(current_user=Depends(get_current_user)):
+async def get_me(current_user=Depends(get_current_user)):
     return {
         "id": current_user.id,
         "name": current_user.name,
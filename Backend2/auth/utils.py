@@ -2,38 +2,22 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 import os
-from dotenv import load_dotenv
 
-from db import get_db
+from db import get_db, run_db
+from db_routing import use_primary
 from models import User, UserRole
-
-load_dotenv()
+from auth.principals import Principal, principal_cache
 
 # JWT Configuration with fallback for production
 JWT_SECRET = os.getenv("JWT_SECRET", "fallback-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-# Password utilities
-def hash_password(password: str):
-    # Truncate password to 72 bytes for bcrypt compatibility
-    password_bytes = password.encode('utf-8')[:72]
-    return pwd_context.hash(password_bytes)
-
-def verify_password(plain_password, hashed_password):
-    # Truncate password to 72 bytes for bcrypt compatibility
-    password_bytes = plain_password.encode('utf-8')[:72]
-    return pwd_context.verify(password_bytes, hashed_password)
-
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
@@ -44,41 +28,67 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     token = jwt.encode(to_encode, JWT_SECRET, algorithm=ALGORITHM)
     return token
 
-# Current user dependency
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Get current user from JWT token"""
-    credentials_exception = HTTPException(
+def load_user(db: Session, user_id: int):
+    use_primary(db)  # fills principal_cache: a lagging replica could restore an old role
+    user = db.query(User).filter(User.id == user_id).first()
+    # End the read-only transaction so the request does not hold a pooled
+    # connection while it waits on other work (expire_on_commit is off)
+    db.commit()
+    return user
+
+def credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+# Token claims dependency (no database access)
+def get_token_claims(token: str = Depends(oauth2_scheme)) -> dict:
+    """Decode and validate the JWT"""
     try:
         # Decode JWT token
         payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
-        user_id: int = payload.get("user_id")
-        
-        if user_id is None:
-            raise credentials_exception
-            
     except JWTError as e:
         print(f"JWT Error: {e}")
-        raise credentials_exception
+        raise credentials_exception()
 
-    # Get user from database
-    user = db.query(User).filter(User.id == user_id).first()
-    
-    if user is None:
-        raise credentials_exception
-        
-    return user
+    if payload.get("user_id") is None:
+        raise credentials_exception()
+    return payload
+
+async def resolve_principal(user_id: int, db) -> Principal:
+    """Principal for user_id from the cache, loading the user on a miss"""
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        generation = principal_cache.generation(user_id)
+        user = await run_db(db, load_user, user_id)
+        if user is None:
+            raise credentials_exception()
+        principal = Principal.from_user(user)
+        principal_cache.store(user_id, generation, principal)
+    return principal
+
+# Current user dependency
+async def get_current_user(claims: dict = Depends(get_token_claims), db = Depends(get_db)) -> Principal:
+    """Get current user from JWT token"""
+    return await resolve_principal(claims["user_id"], db)
 
 # Admin required dependency
-def admin_required(current_user: User = Depends(get_current_user)):
+async def admin_required(claims: dict = Depends(get_token_claims), db = Depends(get_db)) -> Principal:
     """Require admin role"""
+    # Tokens without the admin claim are rejected before any lookup;
+    # the cached principal confirms the role has not been revoked since.
+    if claims.get("role") != UserRole.ADMIN.value:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+
+    current_user = await resolve_principal(claims["user_id"], db)
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
         )
-    return current_user
\ No newline at end of file
+    return current_user
@@ -0,0 +1,115 @@
+"""
+Concurrent booking load test.
+
+Fires --requests bookings with --concurrency in flight at one doctor and one
+date, spread over --slots distinct times, and reports throughput, latency,
+conflicts and whether any slot ended up double booked.
+"""
+import argparse
+import asyncio
+from datetime import date, timedelta
+
+from benchmarks.common import (
+    configure_database, load_app, asgi_client, token_for, summarize, Timer, write_results
+)
+
+
+def seed(patients: int):
+    from db import SessionLocal
+    from models import Doctor, User, UserRole
+
+    db = SessionLocal()
+    try:
+        doctor = Doctor(name="Load Test", email=f"load-{id(db)}@bench.local",
+                        specialty="General", duration_minutes=15)
+        users = [
+            User(name=f"Patient {i}", email=f"patient-{id(db)}-{i}@bench.local",
+                 password_hash="x", role=UserRole.PATIENT)
+            for i in range(patients)
+        ]
+        db.add(doctor)
+        db.add_all(users)
+        db.commit()
+        return doctor.id, [token_for(u) for u in users]
+    finally:
+        db.close()
+
+
+async def run(app, doctor_id, tokens, total, concurrency, slots, day):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, outcomes = [], {"booked": 0, "conflicts": 0, "errors": 0}
+
+    async with asgi_client(app) as client:
+        async def book(i):
+            minutes = 8 * 60 + 15 * (i % slots)
+            payload = {
+                "doctor_id": doctor_id,
+                "date": day.isoformat(),
+                "time": f"{minutes // 60:02d}:{minutes % 60:02d}",
+            }
+            headers = {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+            async with semaphore:
+                with Timer() as t:
+                    response = await client.post("/appointments/", json=payload, headers=headers)
+            latencies.append(t.elapsed)
+            if response.status_code == 200:
+                outcomes["booked"] += 1
+            elif response.status_code == 400 and "already booked" in response.text:
+                outcomes["conflicts"] += 1
+            else:
+                outcomes["errors"] += 1
+
+        with Timer() as wall:
+            await asyncio.gather(*(book(i) for i in range(total)))
+
+    return latencies, wall.elapsed, outcomes
+
+
+def count_double_bookings(doctor_id, day):
+    from sqlalchemy import func
+    from db import SessionLocal
+    from models import Appointment
+
+    db = SessionLocal()
+    try:
+        return db.query(Appointment.time).filter(
+            Appointment.doctor_id == doctor_id,
+            Appointment.date == day,
+            Appointment.status != "CANCELLED"
+        ).group_by(Appointment.time).having(func.count(Appointment.id) > 1).count()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--slots", type=int, default=20)
+    parser.add_argument("--database-url")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    if not 1 <= args.slots <= 60:
+        parser.error("--slots must be between 1 and 60 (15 minute slots from 08:00)")
+
+    configure_database(args.database_url)
+    app = load_app()
+    doctor_id, tokens = seed(min(args.requests, 200))
+    day = date.today() + timedelta(days=30)
+
+    latencies, elapsed, outcomes = asyncio.run(
+        run(app, doctor_id, tokens, args.requests, args.concurrency, args.slots, day)
+    )
+    results = {
+        "benchmark": "booking_load",
+        "concurrency": args.concurrency,
+        "slots": args.slots,
+        **summarize(latencies, elapsed),
+        **outcomes,
+        "double_booked_slots": count_double_bookings(doctor_id, day),
+    }
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Run benchmarks from the Backend2 directory, e.g.
+    python -m benchmarks.booking_load --concurrency 50
+
+They drive the real FastAPI app in-process through its ASGI interface.
+DATABASE_URL is honoured; without it a throwaway SQLite file is used.
+"""
+import asyncio
+import json
+import os
+import socket
+import statistics
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def configure_database(url=None):
+    """Point the app at url (or a fresh temp SQLite file). Call before importing app modules."""
+    # Benchmarks drive thousands of logins and bookings from one client
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    if url:
+        os.environ["DATABASE_URL"] = url
+    elif "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="healthtrack-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    return os.environ["DATABASE_URL"]
+
+
+def load_app():
+    import main
+    import migrations
+    from db import engine
+    migrations.create_schema(engine)
+    return main.app
+
+
+def asgi_client(app):
+    import httpx
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+
+def token_for(user):
+    from auth.utils import create_access_token
+    return create_access_token({"user_id": user.id, "role": user.role.value})
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed):
+    """Throughput and latency percentiles (milliseconds) for a run"""
+    return {
+        "requests": len(latencies),
+        "elapsed_seconds": round(elapsed, 4),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+    }
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+async def run_concurrent(request, total, concurrency):
+    """
+    Await request(i) for i in range(total) with at most concurrency in flight.
+
+    request returns an httpx response. Returns (latencies, elapsed, status_counts).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], {}
+
+    async def one(i):
+        async with semaphore:
+            with Timer() as t:
+                response = await request(i)
+        latencies.append(t.elapsed)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    with Timer() as wall:
+        await asyncio.gather(*(one(i) for i in range(total)))
+    return latencies, wall.elapsed, statuses
+
+
+def run_in_subprocess(module, args, env=None):
+    """Run python -m module args with extra env and parse the JSON it prints last"""
+    import subprocess
+    import sys
+
+    result = subprocess.run(
+        [sys.executable, "-m", module, *args],
+        env={**os.environ, **(env or {})},
+        capture_output=True, text=True,
+        cwd=BACKEND_DIR,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{module} failed:\n{result.stderr}")
+    start = result.stdout.index("{")
+    return json.loads(result.stdout[start:])
+
+
+def free_port() -> int:
+    """A TCP port that was free a moment ago, for servers started as subprocesses"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def write_results(results, output=None):
+    text = json.dumps(results, indent=2, default=str)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    print(text)
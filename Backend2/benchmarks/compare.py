@@ -0,0 +1,82 @@
+"""
+Compare two benchmark suite results and flag regressions.
+
+    python -m benchmarks.compare base.json head.json [--threshold 0.15]
+
+A scenario regresses when head's p99 latency grows, or its throughput
+drops, by more than --threshold (relative), or when it issues more SQL
+statements per request. Exits with status 1 if anything regressed.
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def relative_change(base, head):
+    if not base:
+        return 0.0
+    return (head - base) / base
+
+
+def population(run):
+    """Seeded doctors/patients; appointment counts grow with every run on a reused database"""
+    return {k: v for k, v in run.get("scale", {}).items() if k != "appointments"}
+
+
+def compare(base, head, threshold):
+    """Return (rows, regressions) for scenarios present in both runs"""
+    rows, regressions = [], []
+    for name, before in base["scenarios"].items():
+        after = head["scenarios"].get(name)
+        if after is None:
+            continue
+        p99 = relative_change(before["p99_ms"], after["p99_ms"])
+        rps = relative_change(before["throughput_rps"], after["throughput_rps"])
+        queries = after["queries_per_request"] - before["queries_per_request"]
+        problems = []
+        if p99 > threshold:
+            problems.append(f"p99 +{p99:.0%}")
+        if rps < -threshold:
+            problems.append(f"throughput {rps:.0%}")
+        if queries > 0.01:
+            problems.append(f"+{queries:.2f} queries/request")
+        rows.append((name, before, after, p99, rps, problems))
+        if problems:
+            regressions.append((name, problems))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.15)
+    args = parser.parse_args()
+
+    base, head = load(args.base), load(args.head)
+    if base.get("database") != head.get("database") or population(base) != population(head):
+        print("⚠️ Runs used different databases or data scales; numbers are not directly comparable")
+
+    rows, regressions = compare(base, head, args.threshold)
+    print(f"{base.get('commit')} -> {head.get('commit')} ({head.get('database')})")
+    print(f"{'scenario':<18}{'rps':>18}{'p99 ms':>22}{'queries/req':>16}")
+    for name, before, after, p99, rps, problems in rows:
+        print(
+            f"{name:<18}"
+            f"{before['throughput_rps']:>8.1f} -> {after['throughput_rps']:<7.1f}"
+            f"{before['p99_ms']:>10.2f} -> {after['p99_ms']:<9.2f}"
+            f"{before['queries_per_request']:>6.2f} -> {after['queries_per_request']:<6.2f}"
+            + ("  ❌ " + ", ".join(problems) if problems else "  ✅")
+        )
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Compare requests per second of the sync and async database modes.
+
+Each mode runs in its own process (DB_ASYNC is read at import time) against
+its own freshly seeded database, and serves the same read-heavy mix of
+/doctors/, /doctors/{id} and /appointments/me under concurrent clients.
+"""
+import argparse
+import asyncio
+import uuid
+from datetime import date, time, timedelta
+
+from benchmarks.common import (
+    configure_database, load_app, asgi_client, token_for, summarize,
+    run_concurrent, run_in_subprocess, write_results
+)
+
+
+def seed(doctors: int, appointments_per_doctor: int):
+    from db import SessionLocal
+    from models import Appointment, Doctor, User, UserRole
+
+    run = uuid.uuid4().hex[:8]
+    db = SessionLocal()
+    try:
+        patient = User(name="Bench Patient", email=f"patient-{run}@bench.local",
+                       password_hash="x", role=UserRole.PATIENT)
+        db.add(patient)
+        db.add_all(
+            Doctor(name=f"Doctor {i}", email=f"doctor-{run}-{i}@bench.local",
+                   specialty="General", duration_minutes=30)
+            for i in range(doctors)
+        )
+        db.flush()
+        start = date.today()
+        doctor_ids = [row[0] for row in db.query(Doctor.id).filter(Doctor.email.like(f"doctor-{run}-%")).all()]
+        db.add_all(
+            Appointment(doctor_id=doctor_id, patient_id=patient.id,
+                        date=start + timedelta(days=n // 16), time=time(8 + n % 16 // 2, 30 * (n % 2)))
+            for doctor_id in doctor_ids
+            for n in range(appointments_per_doctor)
+        )
+        db.commit()
+        return doctor_ids, token_for(patient)
+    finally:
+        db.close()
+
+
+async def drive(app, doctor_ids, token, total, concurrency):
+    headers = {"Authorization": f"Bearer {token}"}
+    async with asgi_client(app) as client:
+        def request(i):
+            kind = i % 3
+            if kind == 0:
+                return client.get("/doctors/")
+            if kind == 1:
+                return client.get(f"/doctors/{doctor_ids[i % len(doctor_ids)]}")
+            return client.get("/appointments/me", headers=headers)
+        return await run_concurrent(request, total, concurrency)
+
+
+def worker(args):
+    configure_database(args.database_url)
+    app = load_app()
+    import db
+
+    doctor_ids, token = seed(args.doctors, args.appointments_per_doctor)
+    latencies, elapsed, statuses = asyncio.run(
+        drive(app, doctor_ids, token, args.requests, args.concurrency)
+    )
+    write_results({
+        "mode": "async" if db.DB_ASYNC else "sync",
+        **summarize(latencies, elapsed),
+        "statuses": statuses,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--doctors", type=int, default=50)
+    parser.add_argument("--appointments-per-doctor", type=int, default=20)
+    parser.add_argument("--database-url")
+    parser.add_argument("--output")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    passthrough = [
+        "--worker",
+        "--requests", str(args.requests),
+        "--concurrency", str(args.concurrency),
+        "--doctors", str(args.doctors),
+        "--appointments-per-doctor", str(args.appointments_per_doctor),
+    ]
+    if args.database_url:
+        passthrough += ["--database-url", args.database_url]
+
+    results = {"benchmark": "db_modes", "concurrency": args.concurrency, "modes": {}}
+    for mode, flag in (("sync", "false"), ("async", "true")):
+        results["modes"][mode] = run_in_subprocess("benchmarks.db_modes", passthrough, {"DB_ASYNC": flag})
+    sync_rps = results["modes"]["sync"]["throughput_rps"]
+    if sync_rps:
+        results["async_speedup"] = round(results["modes"]["async"]["throughput_rps"] / sync_rps, 3)
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Idempotent booking under concurrent retries.
+
+For each of --keys bookings (one patient, one slot, one Idempotency-Key)
+fires --retries identical POST /appointments/ requests at once, then the
+same number again after they finished. Every request should answer 200
+with the same appointment, and each slot should hold exactly one
+appointment. Reports latency of the requests that booked versus those
+that were replayed (joined a running booking or read a stored outcome),
+and exits non-zero if any key inserted anything but one appointment.
+
+    python -m benchmarks.idempotency --keys 20 --retries 10
+"""
+import argparse
+import asyncio
+import sys
+import uuid
+from datetime import date, timedelta
+
+from benchmarks.common import configure_database, load_app, asgi_client, summarize, Timer, write_results
+from benchmarks.booking_load import seed
+
+
+async def run(app, doctor_id, tokens, keys, retries, day):
+    booked, replayed, statuses, ids_per_key = [], [], {}, {}
+
+    async with asgi_client(app) as client:
+        async def attempt(k, key, payload, headers):
+            with Timer() as t:
+                response = await client.post("/appointments/", json=payload, headers=headers)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            (replayed if response.headers.get("idempotent-replayed") else booked).append(t.elapsed)
+            if response.status_code == 200:
+                ids_per_key.setdefault(k, set()).add(response.json()["id"])
+
+        async def book(k):
+            minutes = 8 * 60 + 15 * k
+            payload = {"doctor_id": doctor_id, "date": day.isoformat(),
+                       "time": f"{minutes // 60:02d}:{minutes % 60:02d}"}
+            headers = {"Authorization": f"Bearer {tokens[k % len(tokens)]}", "Idempotency-Key": str(uuid.uuid4())}
+            # A burst of concurrent retries, then late retries after the first burst finished
+            for _ in range(2):
+                await asyncio.gather(*(attempt(k, headers["Idempotency-Key"], payload, headers) for _ in range(retries)))
+
+        with Timer() as wall:
+            await asyncio.gather(*(book(k) for k in range(keys)))
+
+    return booked, replayed, wall.elapsed, statuses, ids_per_key
+
+
+def count_inserts(doctor_id, day):
+    from db import SessionLocal
+    from models import Appointment
+
+    db = SessionLocal()
+    try:
+        return db.query(Appointment).filter(Appointment.doctor_id == doctor_id, Appointment.date == day).count()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=20, help="distinct bookings, one slot each")
+    parser.add_argument("--retries", type=int, default=10, help="concurrent identical requests per burst")
+    parser.add_argument("--database-url")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    if not 1 <= args.keys <= 60:
+        parser.error("--keys must be between 1 and 60 (15 minute slots from 08:00)")
+
+    configure_database(args.database_url)
+    app = load_app()
+    doctor_id, tokens = seed(args.keys)
+    day = date.today() + timedelta(days=30)
+
+    booked, replayed, elapsed, statuses, ids_per_key = asyncio.run(
+        run(app, doctor_id, tokens, args.keys, args.retries, day)
+    )
+    inserts = count_inserts(doctor_id, day)
+    consistent = inserts == args.keys and all(len(ids) == 1 for ids in ids_per_key.values())
+    write_results({
+        "benchmark": "idempotency",
+        "keys": args.keys,
+        "requests_per_key": 2 * args.retries,
+        "elapsed_seconds": round(elapsed, 4),
+        "statuses": statuses,
+        "inserts": inserts,
+        "one_insert_per_key": consistent,
+        "booked": summarize(booked, elapsed),
+        "replayed": summarize(replayed, elapsed),
+    }, args.output)
+    if not consistent:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
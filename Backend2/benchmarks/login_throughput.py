@@ -0,0 +1,81 @@
+"""
+Login throughput per core.
+
+Seeds users with argon2 hashes made with the current ARGON2_* settings, then
+fires concurrent /auth/login requests and reports logins per second overall
+and per hashing-pool thread / CPU core.
+"""
+import argparse
+import asyncio
+import os
+import uuid
+
+from benchmarks.common import (
+    configure_database, load_app, asgi_client, summarize, run_concurrent, write_results
+)
+
+PASSWORD = "bench-password"
+
+
+def seed(users: int):
+    from auth.hashing import get_pwd_context
+    from db import SessionLocal
+    from models import User, UserRole
+
+    run = uuid.uuid4().hex[:8]
+    password_hash = get_pwd_context().hash(PASSWORD)
+    emails = [f"login-{run}-{i}@bench.local" for i in range(users)]
+    db = SessionLocal()
+    try:
+        db.add_all(
+            User(name=f"User {i}", email=email, password_hash=password_hash, role=UserRole.PATIENT)
+            for i, email in enumerate(emails)
+        )
+        db.commit()
+    finally:
+        db.close()
+    return emails
+
+
+async def drive(app, emails, total, concurrency):
+    async with asgi_client(app) as client:
+        def request(i):
+            return client.post("/auth/login", data={"username": emails[i % len(emails)], "password": PASSWORD})
+        return await run_concurrent(request, total, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--database-url")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    configure_database(args.database_url)
+    app = load_app()
+    from auth.hashing import hashing_pool, ARGON2_TIME_COST, ARGON2_MEMORY_COST, ARGON2_PARALLELISM
+
+    emails = seed(args.users)
+    latencies, elapsed, statuses = asyncio.run(drive(app, emails, args.requests, args.concurrency))
+    summary = summarize(latencies, elapsed)
+    cores = os.cpu_count() or 1
+
+    write_results({
+        "benchmark": "login_throughput",
+        "argon2": {
+            "time_cost": ARGON2_TIME_COST,
+            "memory_cost": ARGON2_MEMORY_COST,
+            "parallelism": ARGON2_PARALLELISM,
+        },
+        "cpu_count": cores,
+        **summary,
+        "logins_per_core": round(summary["throughput_rps"] / min(cores, hashing_pool.size), 2),
+        "statuses": statuses,
+        "hashing_pool": hashing_pool.stats(),
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
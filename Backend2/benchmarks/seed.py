@@ -0,0 +1,159 @@
+"""
+Synthetic clinic data for the benchmark suite.
+
+Creates doctors (with weekly schedules), patients sharing one real argon2
+password hash, an admin, and appointments spread over the past year and the
+next few months. Generation is deterministic for a given --seed, and rows are
+written with batched INSERT ... VALUES through SQLAlchemy Core, so millions
+of appointments load in minutes rather than hours.
+
+Run alone to prepare a database once and reuse it across commits:
+    python -m benchmarks.seed --database-url postgresql://localhost/bench --appointments 2000000
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta, time as time_of_day
+
+from sqlalchemy import func, insert, select
+
+from benchmarks.common import configure_database, write_results
+
+PASSWORD = "bench-password"
+ADMIN_EMAIL = "admin@seed.bench"
+SPECIALTIES = [
+    "Cardiology", "Dermatology", "Neurology", "Orthopedics", "Pediatrics",
+    "Psychiatry", "Oncology", "Radiology", "Gastroenterology", "General Practice",
+]
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 16           # 08:00 - 16:00
+BATCH_SIZE = 5000
+HISTORY_DAYS = 365
+CALENDAR_DAYS = HISTORY_DAYS + 90    # past year plus the next three months
+
+
+def patient_email(i: int) -> str:
+    return f"patient-{i}@seed.bench"
+
+
+def _insert_batches(conn, table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            conn.execute(insert(table), batch)
+            batch = []
+    if batch:
+        conn.execute(insert(table), batch)
+
+
+def _slot(k: int):
+    """
+    k-th (day offset, time) of a doctor's calendar, distinct for distinct k.
+    Consecutive k land on consecutive days so appointments spread over the
+    whole calendar; a doctor with more than CALENDAR_DAYS * SLOTS_PER_DAY
+    appointments continues past it.
+    """
+    cycle, rest = divmod(k, CALENDAR_DAYS * SLOTS_PER_DAY)
+    minutes = 8 * 60 + SLOT_MINUTES * (rest // CALENDAR_DAYS)
+    return cycle * CALENDAR_DAYS + rest % CALENDAR_DAYS, time_of_day(minutes // 60, minutes % 60)
+
+
+def seeded_scale():
+    """Row counts already in the database (doctors, patients, appointments)"""
+    from db import engine
+    from models import Appointment, Doctor, User, UserRole
+
+    with engine.connect() as conn:
+        return {
+            "doctors": conn.execute(select(func.count()).select_from(Doctor)).scalar(),
+            "patients": conn.execute(
+                select(func.count()).select_from(User).where(User.role == UserRole.PATIENT)
+            ).scalar(),
+            "appointments": conn.execute(select(func.count()).select_from(Appointment)).scalar(),
+        }
+
+
+def seed(doctors: int, patients: int, appointments: int, seed: int = 42):
+    """Populate an empty database; returns the scale actually present"""
+    from auth.hashing import get_pwd_context
+    from db import engine
+    from models import Appointment, Doctor, DoctorSchedule, DayOfWeek, User, UserRole
+
+    existing = seeded_scale()
+    if existing["doctors"]:
+        print(f"♻️  Reusing seeded data: {existing}")
+        return existing
+
+    rng = random.Random(seed)
+    password_hash = get_pwd_context().hash(PASSWORD)
+    first_day = date.today() - timedelta(days=HISTORY_DAYS)
+    weekdays = [DayOfWeek.MONDAY, DayOfWeek.TUESDAY, DayOfWeek.WEDNESDAY, DayOfWeek.THURSDAY, DayOfWeek.FRIDAY]
+
+    with engine.begin() as conn:
+        _insert_batches(conn, User.__table__, [
+            {"name": "Bench Admin", "email": ADMIN_EMAIL, "password_hash": password_hash, "role": UserRole.ADMIN}
+        ])
+        _insert_batches(conn, User.__table__, (
+            {"name": f"Patient {i}", "email": patient_email(i), "password_hash": password_hash,
+             "role": UserRole.PATIENT}
+            for i in range(patients)
+        ))
+        _insert_batches(conn, Doctor.__table__, (
+            {"name": f"Doctor {i}", "email": f"doctor-{i}@seed.bench", "specialty": SPECIALTIES[i % len(SPECIALTIES)],
+             "bio": f"Synthetic doctor {i}", "duration_minutes": SLOT_MINUTES}
+            for i in range(doctors)
+        ))
+
+    with engine.connect() as conn:
+        doctor_ids = list(conn.execute(select(Doctor.id).order_by(Doctor.id)).scalars())
+        patient_ids = list(conn.execute(
+            select(User.id).where(User.role == UserRole.PATIENT).order_by(User.id)
+        ).scalars())
+
+    with engine.begin() as conn:
+        _insert_batches(conn, DoctorSchedule.__table__, (
+            {"doctor_id": doctor_id, "day": day, "start_time": time_of_day(8), "end_time": time_of_day(16)}
+            for doctor_id in doctor_ids
+            for day in weekdays
+        ))
+
+    def appointment_rows():
+        for i in range(appointments):
+            # Round-robin over doctors; each doctor's k-th appointment gets its k-th slot
+            days, slot_time = _slot(i // len(doctor_ids))
+            yield {
+                "doctor_id": doctor_ids[i % len(doctor_ids)],
+                "patient_id": rng.choice(patient_ids),
+                "date": first_day + timedelta(days=days),
+                "time": slot_time,
+                "status": rng.choices(["PENDING", "CONFIRMED", "CANCELLED"], weights=[2, 6, 1])[0],
+            }
+
+    with engine.begin() as conn:
+        _insert_batches(conn, Appointment.__table__, appointment_rows())
+
+    return seeded_scale()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--doctors", type=int, default=2000)
+    parser.add_argument("--patients", type=int, default=20000)
+    parser.add_argument("--appointments", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    url = configure_database(args.database_url)
+    import migrations
+    from db import engine
+    migrations.create_schema(engine)
+
+    started = time.perf_counter()
+    scale = seed(args.doctors, args.patients, args.appointments, args.seed)
+    write_results({"database_url": url, "scale": scale, "seconds": round(time.perf_counter() - started, 2)})
+
+
+if __name__ == "__main__":
+    main()
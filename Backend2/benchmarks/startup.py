@@ -0,0 +1,99 @@
+"""
+Worker cold start: time from process spawn to the first served request.
+
+Each run starts a fresh `uvicorn main:app` process, polls --path until it
+answers 200 and records the elapsed time, then stops the worker. Runs are
+repeated with schema creation off and on (DB_CREATE_SCHEMA) so its cost
+shows up separately. `import main` alone is timed in its own processes too.
+
+    python -m benchmarks.startup --runs 10
+    python -m benchmarks.startup --database-url postgresql://localhost/bench
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import BACKEND_DIR, configure_database, free_port, write_results
+
+
+def time_import(env) -> float:
+    """Seconds for `import main` in a fresh interpreter (interpreter start excluded)"""
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], env=env, cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def time_first_request(env, path: str, timeout: float) -> float:
+    """Seconds from spawning a worker to its first 200 response on path"""
+    import httpx
+
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env=env, cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            while time.perf_counter() - started < timeout:
+                if process.poll() is not None:
+                    raise RuntimeError(f"worker exited:\n{process.stderr.read().decode()}")
+                try:
+                    if client.get(path).status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+        raise RuntimeError(f"no 200 from {path} within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summary(samples):
+    return {
+        "runs": len(samples),
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/doctors/", help="first request to serve")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--database-url")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    url = configure_database(args.database_url)
+    # Workers started without DB_CREATE_SCHEMA need the tables to exist already
+    import migrations
+    from db import engine
+    migrations.create_schema(engine)
+
+    results = {"benchmark": "startup", "database_url": url, "path": args.path}
+    base_env = {**os.environ, "DATABASE_URL": url}
+
+    imports = [time_import({**base_env, "DB_CREATE_SCHEMA": "false"}) for _ in range(args.runs)]
+    results["import_main"] = summary(imports)
+    print(f"✅ import main: {results['import_main']['median_ms']} ms")
+
+    for label, flag in (("first_request", "false"), ("first_request_create_schema", "true")):
+        env = {**base_env, "DB_CREATE_SCHEMA": flag}
+        results[label] = summary([time_first_request(env, args.path, args.timeout) for _ in range(args.runs)])
+        print(f"✅ {label}: {results[label]['median_ms']} ms")
+
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
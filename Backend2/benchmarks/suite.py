@@ -0,0 +1,212 @@
+"""
+End-to-end API benchmark suite.
+
+Seeds a synthetic clinic (benchmarks/seed.py) unless the database already
+holds one, then drives the real app through ASGI for the key flows:
+
+    login, doctors_list, doctor_detail, booking, appointments_me, appointments_all
+
+For each flow it records throughput, p50/p99 latency, status counts and SQL
+statements per request (counted with engine events). Results are JSON so two
+runs can be compared with benchmarks.compare:
+
+    python -m benchmarks.suite --output base.json
+    git checkout my-branch
+    python -m benchmarks.suite --output head.json
+    python -m benchmarks.compare base.json head.json
+
+Point --database-url at a seeded PostgreSQL database to benchmark it instead
+of a throwaway SQLite file.
+"""
+import argparse
+import asyncio
+import itertools
+import platform
+import random
+import subprocess
+import threading
+from datetime import date, timedelta
+
+from sqlalchemy import event, func, select
+
+from benchmarks.common import (
+    configure_database, load_app, asgi_client, summarize, run_concurrent, write_results, Timer
+)
+from benchmarks import seed as seeding
+
+SCENARIOS = ["login", "doctors_list", "doctor_detail", "booking", "appointments_me", "appointments_all"]
+
+
+class StatementCounter:
+    """Counts SQL statements executed on the app's engines"""
+
+    def __init__(self, engines):
+        self._lock = threading.Lock()
+        self.count = 0
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        with self._lock:
+            self.count += 1
+
+    def reset(self):
+        with self._lock:
+            count, self.count = self.count, 0
+        return count
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_fixtures(rng):
+    """Ids and tokens the scenarios pick from"""
+    from auth.utils import create_access_token
+    from db import engine
+    from models import Appointment, Doctor, User, UserRole
+
+    with engine.connect() as conn:
+        last_day = conn.execute(select(func.max(Appointment.date))).scalar() or date.today()
+        doctor_ids = list(conn.execute(select(Doctor.id)).scalars())
+        patients = conn.execute(
+            select(User.id, User.email).where(User.email.like("patient-%@seed.bench")).limit(5000)
+        ).all()
+        admin_id = conn.execute(select(User.id).where(User.email == seeding.ADMIN_EMAIL)).scalar()
+
+    return {
+        "doctor_ids": doctor_ids,
+        "patient_emails": [email for _, email in patients],
+        "patient_tokens": [
+            create_access_token({"user_id": user_id, "role": UserRole.PATIENT.value})
+            for user_id, _ in rng.sample(patients, min(len(patients), 500))
+        ],
+        "admin_token": create_access_token({"user_id": admin_id, "role": UserRole.ADMIN.value}),
+        # Bookings go after every existing appointment, so reruns on a reused database don't conflict
+        "booking_day": last_day + timedelta(days=1),
+    }
+
+
+def build_requests(client, fixtures, rng):
+    """scenario name -> request(i) coroutine factory"""
+    doctor_ids = fixtures["doctor_ids"]
+    patient_tokens = fixtures["patient_tokens"]
+    # Bookings number themselves so warm-up and measured runs never reuse a slot
+    booking_numbers = itertools.count()
+
+    def auth(token):
+        return {"Authorization": f"Bearer {token}"}
+
+    def login(i):
+        email = rng.choice(fixtures["patient_emails"])
+        return client.post("/auth/login", data={"username": email, "password": seeding.PASSWORD})
+
+    def doctors_list(i):
+        return client.get("/doctors/")
+
+    def doctor_detail(i):
+        return client.get(f"/doctors/{rng.choice(doctor_ids)}")
+
+    def booking(i):
+        # Distinct (doctor, time) per request on days the seed never uses
+        i = next(booking_numbers)
+        slot_minutes = 8 * 60 + seeding.SLOT_MINUTES * (i // len(doctor_ids) % seeding.SLOTS_PER_DAY)
+        day = fixtures["booking_day"] + timedelta(days=i // (len(doctor_ids) * seeding.SLOTS_PER_DAY))
+        return client.post("/appointments/", headers=auth(patient_tokens[i % len(patient_tokens)]), json={
+            "doctor_id": doctor_ids[i % len(doctor_ids)],
+            "date": day.isoformat(),
+            "time": f"{slot_minutes // 60:02d}:{slot_minutes % 60:02d}",
+        })
+
+    def appointments_me(i):
+        return client.get("/appointments/me", headers=auth(rng.choice(patient_tokens)))
+
+    def appointments_all(i):
+        return client.get("/appointments/all", params={"limit": 100}, headers=auth(fixtures["admin_token"]))
+
+    return {
+        "login": login,
+        "doctors_list": doctors_list,
+        "doctor_detail": doctor_detail,
+        "booking": booking,
+        "appointments_me": appointments_me,
+        "appointments_all": appointments_all,
+    }
+
+
+async def run_scenarios(app, fixtures, names, requests, concurrency, login_requests, counter, rng):
+    results = {}
+    async with asgi_client(app) as client:
+        scenario_requests = build_requests(client, fixtures, rng)
+        for name in names:
+            total = login_requests if name == "login" else requests
+            # Warm caches and connections so runs measure steady state
+            await run_concurrent(scenario_requests[name], min(total, concurrency), concurrency)
+            counter.reset()
+
+            latencies, elapsed, statuses = await run_concurrent(scenario_requests[name], total, concurrency)
+            statements = counter.reset()
+            results[name] = {
+                **summarize(latencies, elapsed),
+                "statuses": {str(code): count for code, count in sorted(statuses.items())},
+                "queries_per_request": round(statements / total, 2) if total else 0.0,
+            }
+            print(f"✅ {name}: {results[name]['throughput_rps']} req/s, p99 {results[name]['p99_ms']} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--doctors", type=int, default=2000)
+    parser.add_argument("--patients", type=int, default=20000)
+    parser.add_argument("--appointments", type=int, default=200000)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=100, help="login is hashing-bound; fewer by default")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    configure_database(args.database_url)
+    app = load_app()
+    import db
+
+    engines = [db.engine] + ([db.async_engine.sync_engine] if db.async_engine is not None else [])
+    counter = StatementCounter(engines)
+
+    with Timer() as seeding_time:
+        scale = seeding.seed(args.doctors, args.patients, args.appointments, args.seed)
+
+    rng = random.Random(args.seed)
+    fixtures = load_fixtures(rng)
+    scenarios = asyncio.run(run_scenarios(
+        app, fixtures, names, args.requests, args.concurrency, args.login_requests, counter, rng
+    ))
+
+    write_results({
+        "benchmark": "suite",
+        "commit": git_commit(),
+        "database": db.engine.dialect.name,
+        "db_async": db.DB_ASYNC,
+        "python": platform.python_version(),
+        "scale": scale,
+        "seed_seconds": round(seeding_time.elapsed, 2),
+        "concurrency": args.concurrency,
+        "scenarios": scenarios,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Throughput of serve.py as the worker count grows from 1 to N.
+
+Seeds a small clinic once, then for each worker count starts
+`python serve.py --workers k` on a free port and drives it over real HTTP
+from --clients load-generator processes (so the client is not the
+bottleneck) with a read mix of /doctors/{id} and /doctors/{id}/slots.
+Reports requests per second, p50/p99 latency and scaling efficiency
+(rps_k / (k * rps_1)) per worker count.
+
+    python -m benchmarks.workers --max-workers 8 --duration 10
+
+Scaling is bounded by the cores available to workers plus clients; on a
+single-core machine every worker count shares one CPU.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+
+from benchmarks.common import BACKEND_DIR, configure_database, free_port, percentile, write_results
+from benchmarks import seed as seeding
+
+
+def worker_counts(maximum: int):
+    counts, k = [], 1
+    while k < maximum:
+        counts.append(k)
+        k *= 2
+    return counts + [maximum]
+
+
+def drive(base_url, doctor_ids, duration, concurrency, seed):
+    """Load-generator process: returns (latencies, errors)"""
+    import httpx
+
+    rng = random.Random(seed)
+    latencies, errors = [], 0
+
+    async def client_loop(client, deadline):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            doctor_id = rng.choice(doctor_ids)
+            path = f"/doctors/{doctor_id}" if rng.random() < 0.5 else f"/doctors/{doctor_id}/slots"
+            started = time.perf_counter()
+            try:
+                response = await client.get(path)
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.TransportError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    async def run():
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+            deadline = time.perf_counter() + duration
+            await asyncio.gather(*(client_loop(client, deadline) for _ in range(concurrency)))
+
+    asyncio.run(run())
+    return latencies, errors
+
+
+def wait_until_ready(base_url, count, timeout=60):
+    import httpx
+
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            status = httpx.get(f"{base_url}/health/workers").json()["workers"]
+            if sum(1 for w in status if w["ready"]) == count:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{count} workers not ready within {timeout}s")
+
+
+def measure(k, args, doctor_ids, pool):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(k), "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, "DB_CREATE_SCHEMA": "false"},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(base_url, k)
+        # Warm every worker's caches before measuring
+        pool.starmap(drive, [(base_url, doctor_ids, 1.0, args.concurrency, i) for i in range(args.clients)])
+        results = pool.starmap(drive, [
+            (base_url, doctor_ids, args.duration, args.concurrency, 100 + i) for i in range(args.clients)
+        ])
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = [latency for part, _ in results for latency in part]
+    return {
+        "workers": k,
+        "requests": len(latencies),
+        "errors": sum(errors for _, errors in results),
+        "throughput_rps": round(len(latencies) / args.duration, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load per worker count")
+    parser.add_argument("--clients", type=int, default=max(2, (os.cpu_count() or 1) // 2),
+                        help="load-generator processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="connections per load generator")
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--database-url")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    url = configure_database(args.database_url)
+    import migrations
+    from db import engine
+    from models import Doctor
+    from sqlalchemy import select
+
+    migrations.create_schema(engine)
+    seeding.seed(args.doctors, args.doctors * 10, args.doctors * 50)
+    with engine.connect() as conn:
+        doctor_ids = list(conn.execute(select(Doctor.id)).scalars())
+    engine.dispose()
+
+    runs = []
+    with multiprocessing.get_context("spawn").Pool(args.clients) as pool:
+        for k in worker_counts(args.max_workers):
+            run = measure(k, args, doctor_ids, pool)
+            runs.append(run)
+            print(f"✅ {k} workers: {run['throughput_rps']} req/s, p99 {run['p99_ms']} ms")
+
+    base = runs[0]["throughput_rps"]
+    for run in runs:
+        run["scaling_efficiency"] = round(run["throughput_rps"] / (run["workers"] * base), 2) if base else 0.0
+
+    write_results({
+        "benchmark": "workers",
+        "database_url": url,
+        "cpu_count": os.cpu_count(),
+        "clients": args.clients,
+        "concurrency_per_client": args.concurrency,
+        "runs": runs,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
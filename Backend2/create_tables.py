@@ -1,7 +1,6 @@
-from db import Base, engine
-import models
+from db import engine
+import migrations
 
 print("Creating tables...")
-Base.metadata.create_all(bind=engine)
+migrations.create_schema(engine)
 print("✅ Tables created successfully!")
-
@@ -1,20 +1,125 @@
 import os
+import env  # noqa: F401  (.env before any module below reads its settings)
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+from db_pool import engine_options, configure_sqlite, is_sqlite
+from db_routing import replica_urls, routing_session_class
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./healthtrack.db")
+def normalize_url(url: str) -> str:
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql://", 1)
+    return url
 
-if DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+DATABASE_URL = normalize_url(os.getenv("DATABASE_URL", "sqlite:///./healthtrack.db"))
+# Read replicas (db_routing.py): request sessions read there until they write
+DATABASE_REPLICA_URLS = [normalize_url(url) for url in replica_urls()]
+
+# DB_ASYNC=true serves requests through an asyncio driver (aiosqlite/asyncpg).
+# The sync engine below is always created for scripts, migrations and streams.
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+
+def make_engine(url: str):
+    # Pool sizing, timeouts and SQLite pragmas are configured in db_pool.py
+    new_engine = create_engine(url, **engine_options(url))
+    if is_sqlite(url):
+        configure_sqlite(new_engine)
+    return new_engine
+
+
+# `engine` is always the primary: migrations, scripts and background writers use it
+engine = make_engine(DATABASE_URL)
+replica_engines = [make_engine(url) for url in DATABASE_REPLICA_URLS]
+
+# Sessions keep loaded attributes after commit so objects can still be read
+# outside the session's worker (threadpool or async greenlet).
+if replica_engines:
+    SessionLocal = sessionmaker(
+        class_=routing_session_class(engine, replica_engines),
+        autocommit=False, autoflush=False, expire_on_commit=False
+    )
+else:
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+def async_database_url(url: str) -> str:
+    """Map a sync URL to its asyncio driver"""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql:"):
+        return url.replace("postgresql:", "postgresql+asyncpg:", 1)
+    if url.startswith("postgresql+psycopg2:"):
+        return url.replace("postgresql+psycopg2:", "postgresql+asyncpg:", 1)
+    return url
+
+
+async_engine = None
+async_replica_engines = []
+AsyncSessionLocal = None
+
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    def make_async_engine(url: str):
+        new_engine = create_async_engine(async_database_url(url), **engine_options(url, async_driver=True))
+        if is_sqlite(url):
+            configure_sqlite(new_engine.sync_engine)
+        return new_engine
+
+    async_engine = make_async_engine(DATABASE_URL)
+    async_replica_engines = [make_async_engine(url) for url in DATABASE_REPLICA_URLS]
+    if async_replica_engines:
+        # AsyncSession routes through its sync session, which must return sync engines
+        AsyncSessionLocal = async_sessionmaker(
+            sync_session_class=routing_session_class(
+                async_engine.sync_engine, [e.sync_engine for e in async_replica_engines]
+            ),
+            autoflush=False, expire_on_commit=False
+        )
+    else:
+        AsyncSessionLocal = async_sessionmaker(
+            async_engine, autoflush=False, expire_on_commit=False
+        )
+
+
+async def get_db():
+    """Request session: AsyncSession when DB_ASYNC is on, else a sync Session"""
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as session:
+            yield session
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+async def run_db(db, fn, *args, **kwargs):
+    """
+    Run fn(session, *args, **kwargs) without blocking the event loop.
+
+    Query code is written once against the sync Session API. With an
+    AsyncSession it runs through run_sync on the async driver; with a sync
+    Session it runs on the threadpool.
+    """
+    if AsyncSessionLocal is not None and hasattr(db, "run_sync"):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+
+def reset_after_fork():
+    """
+    Drop pooled connections inherited from the parent process.
+
+    A forked worker must never reuse the parent's sockets; close=False leaves
+    them open for the parent and gives this process empty pools.
+    """
+    for sync_engine in [engine, *replica_engines]:
+        sync_engine.dispose(close=False)
+    if async_engine is not None:
+        for async_pool_engine in [async_engine, *async_replica_engines]:
+            async_pool_engine.sync_engine.dispose(close=False)
@@ -0,0 +1,141 @@
+"""
+Read replica routing for db.py.
+
+    DATABASE_REPLICA_URLS  comma-separated replica URLs (default: none)
+    DB_REPLICA_POLICY      round_robin (default) or random
+
+Sessions are RoutingSession instances. Each session picks one replica when
+it is created (so a request sees one consistent replica) and sends plain
+SELECTs there (textual ones included). INSERT/UPDATE/DELETE, flushes,
+SELECT ... FOR UPDATE and other statements go to the primary; the first pins
+the session to the primary for the rest of its life: a request reads its
+own writes. use_primary() pins up front for reads that must not lag: the
+shared caches (SlotIndex, directory_cache, principal_cache) fill through it,
+otherwise a lagging replica's rows would be cached and served after the
+replica catches up.
+"""
+import itertools
+import os
+import random
+import threading
+
+import env  # noqa: F401  (settings below may come from .env)
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import TextClause
+
+DB_REPLICA_POLICY = os.getenv("DB_REPLICA_POLICY", "round_robin").lower()
+
+
+def replica_urls():
+    return [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+
+
+class RoundRobin:
+    def __init__(self, engines):
+        self._engines = itertools.cycle(engines)
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            return next(self._engines)
+
+
+class Random:
+    def __init__(self, engines):
+        self._engines = list(engines)
+
+    def __call__(self):
+        return random.choice(self._engines)
+
+
+POLICIES = {"round_robin": RoundRobin, "random": Random}
+
+
+class RoutingStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.writes = 0
+        self.pinned_sessions = 0
+
+    def add(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "replica_reads": self.replica_reads,
+                "primary_reads": self.primary_reads,
+                "writes": self.writes,
+                "pinned_sessions": self.pinned_sessions,
+            }
+
+
+routing_stats = RoutingStats()
+
+
+class RoutingSession(Session):
+    """Session bound to a primary engine plus read replicas (set by routing_session_class)"""
+
+    primary = None
+    choose_replica = None
+
+    def __init__(self, *args, **kwargs):
+        kwargs.pop("bind", None)
+        super().__init__(*args, **kwargs)
+        self.replica = self.choose_replica() if self.choose_replica else None
+        self.pinned = self.replica is None
+
+    def use_primary(self):
+        """Send every later statement of this session to the primary"""
+        if not self.pinned:
+            self.pinned = True
+            routing_stats.add("pinned_sessions")
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.pinned:
+            if _is_read(clause):
+                routing_stats.add("primary_reads")
+            return self.primary
+        if clause is None and not self._flushing:
+            # Bind lookups without a statement (dialect checks) don't decide routing
+            return self.replica
+        if self._flushing or not _is_read(clause):
+            self.use_primary()
+            routing_stats.add("writes")
+            return self.primary
+        routing_stats.add("replica_reads")
+        return self.replica
+
+
+def use_primary(session):
+    """Pin a routing session to the primary; plain sessions already use it"""
+    if isinstance(session, RoutingSession):
+        session.use_primary()
+
+
+def _is_read(clause) -> bool:
+    """SELECT without FOR UPDATE, as a construct or as text"""
+    if isinstance(clause, TextClause):
+        sql = clause.text.lstrip().upper()
+        return sql.startswith("SELECT") and "FOR UPDATE" not in sql
+    return (
+        clause is not None
+        and getattr(clause, "is_select", False)
+        and getattr(clause, "_for_update_arg", None) is None
+    )
+
+
+def routing_session_class(primary, replicas, policy: str = DB_REPLICA_POLICY):
+    """
+    A RoutingSession subclass for one primary and its replicas.
+    Pass sync engines; for AsyncSession use the engines' .sync_engine.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown DB_REPLICA_POLICY: {policy}")
+    return type("RoutingSession", (RoutingSession,), {
+        "primary": primary,
+        "choose_replica": staticmethod(POLICIES[policy](replicas)),
+    })
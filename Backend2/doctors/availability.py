@@ -0,0 +1,254 @@
+"""
+Materialised doctor availability.
+
+Weekly schedules (any number of windows per day) and dated exceptions are
+expanded into concrete open intervals in doctor_availability, one row per
+interval per date. Slot lookups read those rows with a range scan on
+(doctor_id, date) instead of re-deriving them from the weekly rules.
+
+Rows are materialised on demand for the dates a read asks for, and
+availability_covered_dates records which dates have been built. Only dates
+inside the horizon (AVAILABILITY_PAST_DAYS before today to
+AVAILABILITY_FUTURE_DAYS after it) are ever built; reads outside it see no
+availability. Schedule and exception changes rebuild only the affected
+covered dates inside the horizon, in the same transaction as the change
+(the refresh_* helpers flush nothing and commit nothing themselves).
+
+Both sides hold lock_doctor() until they commit. A read that builds dates
+does so from schedules read under the lock, and a change rebuilds every date
+covered when it gets the lock, so rows built from a schedule that has since
+changed are never left behind.
+"""
+from datetime import date, time, timedelta
+import os
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+from models import (
+    AvailabilityCoveredDate, Doctor, DoctorAvailability, DoctorSchedule, ScheduleException, ExceptionKind, DayOfWeek
+)
+
+# date.weekday() order (Monday == 0)
+WEEKDAYS = [
+    DayOfWeek.MONDAY, DayOfWeek.TUESDAY, DayOfWeek.WEDNESDAY, DayOfWeek.THURSDAY,
+    DayOfWeek.FRIDAY, DayOfWeek.SATURDAY, DayOfWeek.SUNDAY
+]
+
+# Keep IN (...) lists well below driver parameter limits
+DATE_CHUNK = 200
+
+# Dates that can be materialised, relative to today
+AVAILABILITY_PAST_DAYS = int(os.getenv("AVAILABILITY_PAST_DAYS", 31))
+AVAILABILITY_FUTURE_DAYS = int(os.getenv("AVAILABILITY_FUTURE_DAYS", 365))
+
+
+def horizon():
+    """(first, last) date whose availability can be materialised"""
+    today = date.today()
+    return today - timedelta(days=AVAILABILITY_PAST_DAYS), today + timedelta(days=AVAILABILITY_FUTURE_DAYS)
+
+
+def within_horizon(start: date, end: date) -> bool:
+    first, last = horizon()
+    return first <= start and end <= last
+
+
+def _dates(start: date, end: date):
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def _chunks(items, size=DATE_CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def merge_intervals(intervals):
+    """Sort and merge overlapping or touching (start, end) intervals"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_interval(intervals, start: time, end: time):
+    """Remove [start, end) from each interval, splitting where needed"""
+    result = []
+    for a, b in intervals:
+        if end <= a or start >= b:
+            result.append((a, b))
+            continue
+        if a < start:
+            result.append((a, start))
+        if end < b:
+            result.append((end, b))
+    return result
+
+
+def day_intervals(windows, exceptions):
+    """
+    Open intervals for one date.
+
+    windows are the weekly (start, end) windows for that weekday. OPEN
+    exceptions add windows, CLOSED exceptions remove them (the whole day when
+    they have no times).
+    """
+    intervals = list(windows)
+    intervals.extend(
+        (e.start_time, e.end_time) for e in exceptions if e.kind == ExceptionKind.OPEN
+    )
+    intervals = merge_intervals(intervals)
+    for e in exceptions:
+        if e.kind != ExceptionKind.CLOSED:
+            continue
+        if e.start_time is None or e.end_time is None:
+            return []
+        intervals = subtract_interval(intervals, e.start_time, e.end_time)
+    return intervals
+
+
+def overlapping_window(windows, start: time, end: time):
+    """Return the first (start, end) in windows that overlaps [start, end), if any"""
+    for a, b in windows:
+        if start < b and a < end:
+            return a, b
+    return None
+
+
+def lock_doctor(db: Session, doctor_id: int):
+    """
+    Serialise availability writes for doctor_id until the transaction ends.
+    Locks the doctor row; SQLite ignores FOR UPDATE, so there a no-op UPDATE
+    takes the database write lock instead.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        db.execute(
+            update(Doctor).where(Doctor.id == doctor_id).values(id=Doctor.id),
+            execution_options={"synchronize_session": False}
+        )
+    else:
+        db.execute(select(Doctor.id).where(Doctor.id == doctor_id).with_for_update())
+
+
+def _build(db: Session, doctor_id: int, dates):
+    """Replace the availability rows of doctor_id for the given dates"""
+    if not dates:
+        return
+    weekly = {}
+    for s in db.query(DoctorSchedule).filter(DoctorSchedule.doctor_id == doctor_id):
+        weekly.setdefault(s.day, []).append((s.start_time, s.end_time))
+
+    for chunk in _chunks(sorted(dates)):
+        exceptions = {}
+        for e in db.query(ScheduleException).filter(
+            ScheduleException.doctor_id == doctor_id,
+            ScheduleException.date.in_(chunk)
+        ):
+            exceptions.setdefault(e.date, []).append(e)
+
+        db.execute(delete(DoctorAvailability).where(
+            DoctorAvailability.doctor_id == doctor_id,
+            DoctorAvailability.date.in_(chunk)
+        ))
+        rows = [
+            {"doctor_id": doctor_id, "date": d, "start_time": start, "end_time": end}
+            for d in chunk
+            for start, end in day_intervals(weekly.get(WEEKDAYS[d.weekday()], []), exceptions.get(d, []))
+        ]
+        if rows:
+            db.execute(insert(DoctorAvailability).values(rows))
+
+
+def covered_dates(db: Session, doctor_id: int, start: date, end: date, lock: bool = False):
+    """Dates of [start, end] already built; lock=True reads past the transaction's snapshot"""
+    query = select(AvailabilityCoveredDate.date).where(
+        AvailabilityCoveredDate.doctor_id == doctor_id,
+        AvailabilityCoveredDate.date >= start,
+        AvailabilityCoveredDate.date <= end
+    )
+    if lock:
+        query = query.with_for_update(read=True)
+    return set(db.execute(query).scalars())
+
+
+def ensure_materialised(db: Session, doctor_id: int, start: date, end: date):
+    """Make sure availability rows exist for every date in [start, end] inside the horizon"""
+    first, last = horizon()
+    start, end = max(start, first), min(end, last)
+    if start > end:
+        return
+    covered = covered_dates(db, doctor_id, start, end)
+    if all(d in covered for d in _dates(start, end)):
+        return
+    # End the read transaction so the schedules below are read after the lock
+    db.commit()
+    lock_doctor(db, doctor_id)
+    covered = covered_dates(db, doctor_id, start, end)
+    missing = [d for d in _dates(start, end) if d not in covered]
+    if missing:
+        _build(db, doctor_id, missing)
+        db.execute(insert(AvailabilityCoveredDate).values(
+            [{"doctor_id": doctor_id, "date": d} for d in missing]
+        ))
+    db.commit()
+
+
+def load_intervals(db: Session, doctor_id: int, start: date, end: date):
+    """Return {date: [(start_time, end_time), ...]} for every date in [start, end]"""
+    ensure_materialised(db, doctor_id, start, end)
+    intervals = {d: [] for d in _dates(start, end)}
+    rows = db.execute(
+        select(DoctorAvailability.date, DoctorAvailability.start_time, DoctorAvailability.end_time)
+        .where(
+            DoctorAvailability.doctor_id == doctor_id,
+            DoctorAvailability.date >= start,
+            DoctorAvailability.date <= end
+        )
+        .order_by(DoctorAvailability.date, DoctorAvailability.start_time)
+    )
+    for d, start_time, end_time in rows:
+        intervals[d].append((start_time, end_time))
+    return intervals
+
+
+def refresh_dates(db: Session, doctor_id: int, dates):
+    """Rebuild the covered subset of dates after an exception changed"""
+    if not dates:
+        return
+    lock_doctor(db, doctor_id)
+    covered = covered_dates(db, doctor_id, min(dates), max(dates), lock=True)
+    _build(db, doctor_id, [d for d in dates if d in covered])
+
+
+def refresh_weekday(db: Session, doctor_id: int, day: DayOfWeek):
+    """
+    Rebuild every covered date inside the horizon falling on day after a
+    weekly window changed. Covered dates of that weekday outside the horizon
+    are dropped instead, to be rebuilt if they are ever read again.
+    """
+    first, last = horizon()
+    weekday = WEEKDAYS.index(day)
+    lock_doctor(db, doctor_id)
+    dates = [
+        d for d in covered_dates(db, doctor_id, date.min, date.max, lock=True) if d.weekday() == weekday
+    ]
+    stale = [d for d in dates if not first <= d <= last]
+    for chunk in _chunks(stale):
+        db.execute(delete(DoctorAvailability).where(
+            DoctorAvailability.doctor_id == doctor_id,
+            DoctorAvailability.date.in_(chunk)
+        ))
+        db.execute(delete(AvailabilityCoveredDate).where(
+            AvailabilityCoveredDate.doctor_id == doctor_id,
+            AvailabilityCoveredDate.date.in_(chunk)
+        ))
+    _build(db, doctor_id, [d for d in dates if first <= d <= last])
+
+
+def forget_doctor(db: Session, doctor_id: int):
+    """Delete materialised rows of a doctor (called before the doctor is deleted)"""
+    db.execute(delete(DoctorAvailability).where(DoctorAvailability.doctor_id == doctor_id))
+    db.execute(delete(AvailabilityCoveredDate).where(AvailabilityCoveredDate.doctor_id == doctor_id))
@@ -0,0 +1,393 @@
+"""
+Bulk import and export of doctors and schedules.
+
+Uploads are spooled to a temporary file (in memory up to 1 MB, then on disk)
+and read back one row at a time: CSV and NDJSON by line, JSON arrays by
+decoding one element at a time from JSON_CHUNK_SIZE reads (an element may be
+at most MAX_JSON_RECORD_SIZE characters). Only the current batch is held, plus
+the emails seen so far in a doctor import and at most MAX_REPORTED_ERRORS
+error entries. Valid rows are written with multi-row INSERT ... VALUES
+statements in batches, all inside one transaction; a batch that still
+violates a constraint (a row written concurrently) rolls back the whole
+import with BulkImportConflict.
+
+Accepted formats (by Content-Type):
+    text/csv               header row followed by one row per record
+    application/x-ndjson   one JSON object per line
+    application/json       a JSON array of objects
+"""
+from datetime import datetime
+from typing import Optional
+import csv
+import io
+import json
+import re
+import tempfile
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import Doctor, DoctorSchedule, DayOfWeek
+from doctors.availability import overlapping_window, refresh_weekday
+
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+SPOOL_MAX_MEMORY = 1024 * 1024
+JSON_CHUNK_SIZE = 64 * 1024
+MAX_JSON_RECORD_SIZE = 1024 * 1024
+
+DOCTOR_FIELDS = ["id", "name", "email", "specialty", "bio", "duration_minutes"]
+SCHEDULE_FIELDS = ["id", "doctor_id", "weekday", "start_time", "end_time"]
+
+WEEKDAY_TO_DAY = {
+    0: DayOfWeek.SUNDAY, 1: DayOfWeek.MONDAY, 2: DayOfWeek.TUESDAY, 3: DayOfWeek.WEDNESDAY,
+    4: DayOfWeek.THURSDAY, 5: DayOfWeek.FRIDAY, 6: DayOfWeek.SATURDAY
+}
+DAY_TO_WEEKDAY = {day: weekday for weekday, day in WEEKDAY_TO_DAY.items()}
+
+
+class DoctorRow(BaseModel):
+    name: str
+    email: str
+    specialty: str
+    bio: Optional[str] = None
+    duration_minutes: Optional[int] = 60
+
+
+class ScheduleRow(BaseModel):
+    doctor_id: int
+    weekday: int
+    start_time: str
+    end_time: str
+
+
+class BulkImportError(Exception):
+    """The upload cannot be parsed at all (bad format or malformed file)"""
+
+
+class BulkImportConflict(Exception):
+    """A batch hit a database constraint; nothing was committed"""
+
+    def __init__(self, report: dict):
+        super().__init__("The import conflicts with rows written meanwhile")
+        self.report = report
+
+
+# ========================================
+# Reading uploads
+# ========================================
+def detect_format(content_type: str) -> str:
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("text/csv", "application/csv"):
+        return "csv"
+    if content_type in ("application/x-ndjson", "application/ndjson"):
+        return "ndjson"
+    if content_type == "application/json":
+        return "json"
+    raise BulkImportError("Unsupported Content-Type. Use text/csv, application/x-ndjson or application/json")
+
+
+async def spool_body(request):
+    """Copy the request body to a spooled temp file without holding it all in memory"""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+def iter_records(spool, fmt: str):
+    """Yield (row_number, dict) from the upload; row numbers start at 1"""
+    text_stream = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        for number, record in enumerate(csv.DictReader(text_stream), start=1):
+            # Empty CSV cells mean "not given"
+            yield number, {k: v for k, v in record.items() if k and v not in ("", None)}
+    elif fmt == "ndjson":
+        number = 0
+        for line in text_stream:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                yield number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield number, e
+    else:
+        yield from enumerate(iter_json_array(text_stream), start=1)
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def iter_json_array(text_stream):
+    """Yield the elements of a top-level JSON array without reading it whole"""
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    state = "start"  # then "first", "value", "separator", "end"
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+        need_more = pos == len(buffer)
+        if not need_more:
+            char = buffer[pos]
+            if state == "end":
+                raise BulkImportError("Invalid JSON: extra data after the array")
+            if state == "start":
+                if char != "[":
+                    raise BulkImportError("JSON body must be an array of objects")
+                pos, state = pos + 1, "first"
+            elif state == "separator" or (state == "first" and char == "]"):
+                if char not in ",]":
+                    raise BulkImportError("Invalid JSON: expected ',' or ']' after an array element")
+                pos, state = pos + 1, ("value" if char == "," else "end")
+            else:
+                try:
+                    record, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError as e:
+                    error, end = e, None
+                # An element reaching the end of the buffer may go on in the next read
+                need_more = end is None or (end == len(buffer) and not eof)
+                if not need_more:
+                    yield record
+                    pos, state = end, "separator"
+                elif eof:
+                    raise BulkImportError(f"Invalid JSON: {error}")
+        if need_more:
+            if eof:
+                if state == "end":
+                    return
+                raise BulkImportError("Invalid JSON: unexpected end of the array")
+            if len(buffer) - pos > MAX_JSON_RECORD_SIZE:
+                raise BulkImportError(f"JSON array elements must be under {MAX_JSON_RECORD_SIZE} characters")
+            chunk = text_stream.read(JSON_CHUNK_SIZE)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+
+
+def validation_messages(error: ValidationError):
+    return [f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors()]
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []
+
+    def fail(self, row: int, messages):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "errors": messages})
+
+    def as_dict(self, committed: bool):
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted if committed else 0,
+            "failed": self.error_count,
+            "committed": committed,
+            "errors": sorted(self.errors, key=lambda e: e["row"]),
+        }
+
+
+# ========================================
+# Import
+# ========================================
+def _import(db: Session, records, model, parse_row, check_batch, atomic: bool, after_insert=None):
+    """
+    Validate records one by one and insert the valid ones in batches.
+
+    parse_row(record) returns (values, errors); check_batch(db, batch) returns
+    {row_number: errors} for rows that clash with the database or with
+    earlier rows of the upload. after_insert(db, rows) runs after each batch
+    is written. With atomic=True nothing is committed when any row fails.
+    """
+    report = ImportReport()
+    batch = []
+
+    def flush():
+        failed = check_batch(db, batch)
+        rows = []
+        for number, values in batch:
+            if number in failed:
+                report.fail(number, failed[number])
+            else:
+                rows.append(values)
+        if rows:
+            try:
+                db.execute(insert(model).values(rows))
+            except IntegrityError as e:
+                report.fail(batch[0][0], [f"rows {batch[0][0]}-{batch[-1][0]}: {e.orig}"])
+                raise BulkImportConflict(report.as_dict(committed=False))
+            report.inserted += len(rows)
+            if after_insert:
+                after_insert(db, rows)
+        batch.clear()
+
+    try:
+        for number, record in records:
+            report.rows += 1
+            if isinstance(record, Exception):
+                report.fail(number, [f"Invalid JSON: {record}"])
+                continue
+            if not isinstance(record, dict):
+                report.fail(number, ["Row must be an object"])
+                continue
+            values, errors = parse_row(record)
+            if errors:
+                report.fail(number, errors)
+                continue
+            batch.append((number, values))
+            if len(batch) >= BATCH_SIZE:
+                flush()
+        flush()
+    except Exception:
+        db.rollback()
+        raise
+
+    committed = not (atomic and report.error_count)
+    if committed:
+        db.commit()
+    else:
+        db.rollback()
+    return report.as_dict(committed)
+
+
+def parse_doctor(record: dict):
+    try:
+        row = DoctorRow(**record)
+    except ValidationError as e:
+        return None, validation_messages(e)
+    values = row.model_dump()
+    values["duration_minutes"] = values["duration_minutes"] or 60
+    return values, None
+
+
+def import_doctors(db: Session, spool, fmt: str, atomic: bool = False):
+    seen_emails = set()
+
+    def check_batch(db: Session, batch):
+        emails = [values["email"] for _, values in batch]
+        existing = set(db.execute(select(Doctor.email).where(Doctor.email.in_(emails))).scalars())
+        failed = {}
+        for number, values in batch:
+            if values["email"] in existing:
+                failed[number] = [f"email: {values['email']} already exists"]
+            elif values["email"] in seen_emails:
+                failed[number] = [f"email: {values['email']} appears earlier in the upload"]
+            else:
+                seen_emails.add(values["email"])
+        return failed
+
+    return _import(db, iter_records(spool, fmt), Doctor, parse_doctor, check_batch, atomic)
+
+
+def parse_schedule(record: dict):
+    try:
+        row = ScheduleRow(**record)
+    except ValidationError as e:
+        return None, validation_messages(e)
+
+    if row.weekday not in WEEKDAY_TO_DAY:
+        return None, [f"weekday: invalid weekday {row.weekday}. Use 0-6"]
+    try:
+        start = datetime.strptime(row.start_time, "%H:%M").time()
+        end = datetime.strptime(row.end_time, "%H:%M").time()
+    except ValueError:
+        return None, ["Invalid time format. Use HH:MM"]
+    if end <= start:
+        return None, ["End time must be after start time"]
+
+    return {
+        "doctor_id": row.doctor_id,
+        "day": WEEKDAY_TO_DAY[row.weekday],
+        "start_time": start,
+        "end_time": end,
+    }, None
+
+
+def import_schedules(db: Session, spool, fmt: str, atomic: bool = False):
+    def check_batch(db: Session, batch):
+        doctor_ids = {values["doctor_id"] for _, values in batch}
+        known_doctors = set(db.execute(select(Doctor.id).where(Doctor.id.in_(doctor_ids))).scalars())
+        # Windows already stored, including rows inserted by earlier batches
+        windows = {}
+        for doctor_id, day, start, end in db.execute(
+            select(DoctorSchedule.doctor_id, DoctorSchedule.day, DoctorSchedule.start_time, DoctorSchedule.end_time)
+            .where(DoctorSchedule.doctor_id.in_(doctor_ids))
+        ):
+            windows.setdefault((doctor_id, day), []).append((start, end))
+
+        failed = {}
+        for number, values in batch:
+            key = (values["doctor_id"], values["day"])
+            if values["doctor_id"] not in known_doctors:
+                failed[number] = [f"doctor_id: doctor {values['doctor_id']} not found"]
+                continue
+            clash = overlapping_window(windows.get(key, []), values["start_time"], values["end_time"])
+            if clash:
+                failed[number] = [
+                    f"Schedule overlaps the {clash[0].strftime('%H:%M')}-{clash[1].strftime('%H:%M')} window on this day"
+                ]
+            else:
+                windows.setdefault(key, []).append((values["start_time"], values["end_time"]))
+        return failed
+
+    def refresh_availability(db: Session, rows):
+        for doctor_id, day in {(row["doctor_id"], row["day"]) for row in rows}:
+            refresh_weekday(db, doctor_id, day)
+
+    return _import(
+        db, iter_records(spool, fmt), DoctorSchedule, parse_schedule, check_batch, atomic,
+        after_insert=refresh_availability
+    )
+
+
+# ========================================
+# Export
+# ========================================
+def _export_rows(query, fields, fmt: str, session_factory, convert=tuple, batch_size: int = 1000):
+    """Stream rows as CSV or NDJSON from a server-side cursor on its own session"""
+    db = session_factory()
+    try:
+        result = db.execute(query.execution_options(stream_results=True, yield_per=batch_size))
+        if fmt == "csv":
+            yield _csv_lines([fields])
+        for partition in result.partitions():
+            rows = [convert(row) for row in partition]
+            if fmt == "csv":
+                yield _csv_lines(rows)
+            else:
+                yield "".join(json.dumps(dict(zip(fields, row)), default=str) + "\n" for row in rows)
+    finally:
+        db.close()
+
+
+def _csv_lines(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def export_doctors(fmt: str, session_factory):
+    query = select(
+        Doctor.id, Doctor.name, Doctor.email, Doctor.specialty, Doctor.bio, Doctor.duration_minutes
+    ).order_by(Doctor.id)
+    return _export_rows(query, DOCTOR_FIELDS, fmt, session_factory)
+
+
+def _schedule_row(row):
+    return (
+        row.id, row.doctor_id, DAY_TO_WEEKDAY[row.day],
+        row.start_time.strftime("%H:%M"), row.end_time.strftime("%H:%M")
+    )
+
+
+def export_schedules(fmt: str, session_factory):
+    """Exported rows use the same columns the schedule import accepts"""
+    query = select(
+        DoctorSchedule.id, DoctorSchedule.doctor_id, DoctorSchedule.day,
+        DoctorSchedule.start_time, DoctorSchedule.end_time
+    ).order_by(DoctorSchedule.doctor_id, DoctorSchedule.id)
+    return _export_rows(query, SCHEDULE_FIELDS, fmt, session_factory, convert=_schedule_row)
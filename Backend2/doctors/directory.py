@@ -0,0 +1,71 @@
+from fastapi import Request, Response
+from responses import dumps
+import hashlib
+import os
+import threading
+
+# How long browsers and CDNs may reuse a directory response without revalidating
+DIRECTORY_MAX_AGE = int(os.getenv("DOCTOR_DIRECTORY_MAX_AGE", 60))
+DIRECTORY_STALE_WHILE_REVALIDATE = int(os.getenv("DOCTOR_DIRECTORY_STALE_WHILE_REVALIDATE", 300))
+
+
+class CachedBody:
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+class DirectoryCache:
+    """
+    Versioned cache of serialised public doctor responses.
+
+    invalidate() bumps the version and drops every entry. store() ignores
+    results computed under an older version, so a read that raced a write
+    cannot put stale data back into the cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.version = 0
+
+    def get(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+    def store(self, key, version: int, data) -> CachedBody:
+        cached = CachedBody(dumps(data))
+        with self._lock:
+            if version == self.version:
+                self._entries[key] = cached
+        return cached
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+
+directory_cache = DirectoryCache()
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def directory_response(request: Request, cached: CachedBody) -> Response:
+    """200 with the cached body, or 304 when the client already has it"""
+    headers = {
+        "ETag": cached.etag,
+        "Cache-Control": f"public, max-age={DIRECTORY_MAX_AGE}, "
+                         f"stale-while-revalidate={DIRECTORY_STALE_WHILE_REVALIDATE}",
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
@@ -0,0 +1,94 @@
+"""
+Cache invalidation shared by every worker process.
+
+The slot index (doctors/slots.py) and the directory cache
+(doctors/directory.py) live in each worker's memory. Every change that
+touches them goes through this module: it is applied to this worker's
+caches at once and published on CACHE_CHANNEL, and every other worker
+applies it as the broker delivers it (pubsub.broker.on).
+
+Only PUBSUB_BACKEND=postgres delivers to other processes. With the memory
+backend each worker would keep serving what it cached before another
+worker's change, so serve.py refuses to run more than one worker with it.
+When the postgres LISTEN connection comes back after a drop, both caches
+are cleared, since changes made meanwhile were not heard.
+
+Changes are published before the live taken/freed events of the same
+booking, so an SSE snapshot taken on any worker after an event already
+reflects it.
+"""
+from datetime import date, time
+import os
+
+from doctors.directory import directory_cache
+from doctors.slots import slot_index
+from pubsub import broker
+
+CACHE_CHANNEL = "cache"
+
+
+def apply(message: dict):
+    op = message["op"]
+    if op == "taken":
+        slot_index.mark_booked(message["doctor_id"], date.fromisoformat(message["date"]),
+                               time.fromisoformat(message["time"]))
+    elif op == "freed":
+        slot_index.mark_freed(message["doctor_id"], date.fromisoformat(message["date"]),
+                              time.fromisoformat(message["time"]))
+    elif op == "day":
+        slot_index.invalidate_day(message["doctor_id"], date.fromisoformat(message["date"]))
+    elif op == "doctor":
+        slot_index.invalidate_doctor(message["doctor_id"])
+        directory_cache.invalidate()
+    elif op == "directory":
+        directory_cache.invalidate()
+    elif op == "all":
+        slot_index.clear()
+        directory_cache.invalidate()
+
+
+def on_message(message: dict):
+    # Our own messages come back through LISTEN; they were applied already
+    if message.get("origin") != os.getpid():
+        apply(message)
+
+
+def resync():
+    # Invalidations from other workers may have been missed
+    apply({"op": "all"})
+
+
+broker.on(CACHE_CHANNEL, on_message)
+broker.on_resync(resync)
+
+
+async def publish(op: str, **fields):
+    message = {"op": op, **fields}
+    apply(message)
+    await broker.publish(CACHE_CHANNEL, {**message, "origin": os.getpid()})
+
+
+async def slot_taken(doctor_id: int, day: date, slot: time):
+    await publish("taken", doctor_id=doctor_id, date=day.isoformat(), time=slot.isoformat())
+
+
+async def slot_freed(doctor_id: int, day: date, slot: time):
+    await publish("freed", doctor_id=doctor_id, date=day.isoformat(), time=slot.isoformat())
+
+
+async def day_changed(doctor_id: int, day: date):
+    """A schedule exception on one date was added or removed"""
+    await publish("day", doctor_id=doctor_id, date=day.isoformat())
+
+
+async def doctor_changed(doctor_id: int):
+    """A doctor or their weekly schedule changed"""
+    await publish("doctor", doctor_id=doctor_id)
+
+
+async def directory_changed():
+    await publish("directory")
+
+
+async def all_changed():
+    await publish("all")
@@ -0,0 +1,72 @@
+"""
+Live slot availability over Server-Sent Events.
+
+GET /doctors/{id}/slots/stream?date=YYYY-MM-DD sends
+
+    event: snapshot   {"date": ..., "slots": ["09:00", ...]}   free slots on connect
+    event: taken      {"date": ..., "time": "09:00"}
+    event: freed      {"date": ..., "time": "09:00"}
+
+Booking and cancellation publish taken/freed on the doctor's channel for
+that date (pubsub.broker). A subscriber that overflows its queue gets a
+fresh snapshot instead of the dropped deltas; comment lines keep idle
+connections open through proxies.
+"""
+from datetime import date, time
+import os
+
+from starlette.concurrency import run_in_threadpool
+from db import SessionLocal
+from models import Doctor
+from doctors.slots import slot_index
+from pubsub import broker
+from responses import dumps
+
+SLOT_STREAM_KEEPALIVE_SECONDS = float(os.getenv("SLOT_STREAM_KEEPALIVE_SECONDS", 15))
+
+
+def slot_channel(doctor_id: int, day: date) -> str:
+    return f"slots:{doctor_id}:{day.isoformat()}"
+
+
+async def publish_slot(event: str, doctor_id: int, day: date, slot: time):
+    """Tell live clients that a slot was taken or freed"""
+    await broker.publish(slot_channel(doctor_id, day), {
+        "event": event,
+        "date": day.isoformat(),
+        "time": slot.strftime("%H:%M"),
+    })
+
+
+def free_slot_times(doctor_id: int, day: date):
+    # Streams outlive the request session, so they read with their own
+    db = SessionLocal()
+    try:
+        doctor = db.query(Doctor).filter(Doctor.id == doctor_id).first()
+        if doctor is None:
+            return []
+        return [t.strftime("%H:%M") for _, t in slot_index.get_free_slots(db, doctor, day, day)]
+    finally:
+        db.close()
+
+
+def sse(event: str, data) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+async def slot_events(doctor_id: int, day: date):
+    """Yield SSE frames for one doctor and date until the client disconnects"""
+    # Subscribe before reading the snapshot so no change falls in between
+    with broker.subscribe(slot_channel(doctor_id, day)) as subscription:
+        snapshot = await run_in_threadpool(free_slot_times, doctor_id, day)
+        yield sse("snapshot", {"date": day.isoformat(), "slots": snapshot})
+        while True:
+            message = await subscription.get(timeout=SLOT_STREAM_KEEPALIVE_SECONDS)
+            if subscription.overflowed:
+                subscription.overflowed = False
+                snapshot = await run_in_threadpool(free_slot_times, doctor_id, day)
+                yield sse("snapshot", {"date": day.isoformat(), "slots": snapshot})
+            elif message is None:
+                yield b": keepalive\n\n"
+            else:
+                yield sse(message["event"], {"date": message["date"], "time": message["time"]})
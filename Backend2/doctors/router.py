@@ -1,11 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from db import get_db
-from models import Doctor, DoctorSchedule, DayOfWeek
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, selectinload
+from db import get_db, run_db, SessionLocal
+from db_routing import use_primary
+from models import Doctor, DoctorSchedule, DayOfWeek, ScheduleException, ExceptionKind
 from auth.utils import admin_required
-from datetime import datetime
+from doctors.slots import slot_index, MAX_RANGE_DAYS
+from doctors.directory import directory_cache, directory_response
+from doctors.search import search_doctors
+from doctors import availability, invalidation
+from doctors.live import slot_events
+from doctors.schemas import DoctorOut, DoctorWithSchedules, SearchResults, DoctorSlots
+from appointments.queries import slot_times
+from responses import FastJSONResponse
+from admin.router import stats_cache
+from datetime import datetime, date, timedelta
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 # ========================================
 # Schemas
@@ -22,78 +33,189 @@ class ScheduleCreateRequest(BaseModel):
     start_time: str
     end_time: str
 
+class ScheduleExceptionCreate(BaseModel):
+    date: date
+    kind: ExceptionKind = ExceptionKind.CLOSED
+    start_time: Optional[str] = None   # omit both times to close the whole day
+    end_time: Optional[str] = None
+    reason: Optional[str] = None
+
 # ========================================
 # Router
 # ========================================
 router = APIRouter(prefix="/doctors", tags=["doctors"])
 
+# Map day enum value to weekday number for frontend
+DAY_TO_WEEKDAY = {
+    "SUNDAY": 0, "MONDAY": 1, "TUESDAY": 2, "WEDNESDAY": 3,
+    "THURSDAY": 4, "FRIDAY": 5, "SATURDAY": 6
+}
+
+# ========================================
+# DB helpers (run through run_db)
+# ========================================
+def schedule_to_dict(s: DoctorSchedule):
+    return {
+        "id": s.id,
+        "weekday": DAY_TO_WEEKDAY.get(s.day.value, 0),
+        "start_time": s.start_time.strftime("%H:%M"),
+        "end_time": s.end_time.strftime("%H:%M")
+    }
+
+def doctor_to_dict(d: Doctor):
+    return {
+        "id": d.id,
+        "name": d.name,
+        "email": d.email,
+        "specialty": d.specialty,
+        "bio": d.bio,
+        "duration_minutes": d.duration_minutes or 60
+    }
+
+def slot_to_dict(day: date, clock, duration: int):
+    start_at, end_at = slot_times(day, clock, duration)
+    return {"date": day.isoformat(), "time": clock.strftime("%H:%M"), "start_at": start_at, "end_at": end_at}
+
+def horizon_exception():
+    first, last = availability.horizon()
+    return HTTPException(
+        status_code=400,
+        detail=f"Dates must be between {first.isoformat()} and {last.isoformat()}"
+    )
+
+def get_doctor_by_id(db: Session, doctor_id: int):
+    return db.query(Doctor).filter(Doctor.id == doctor_id).first()
+
+def list_doctors_with_schedules(db: Session):
+    return [
+        {**doctor_to_dict(d), "schedules": [schedule_to_dict(s) for s in d.schedules]}
+        for d in db.query(Doctor).options(selectinload(Doctor.schedules)).all()
+    ]
+
+def list_doctors(db: Session):
+    use_primary(db)  # fills directory_cache
+    return [doctor_to_dict(d) for d in db.query(Doctor).all()]
+
+def load_doctor_detail(db: Session, doctor_id: int):
+    use_primary(db)  # fills directory_cache
+    doctor = get_doctor_by_id(db, doctor_id)
+    if not doctor:
+        return None
+    schedules = db.query(DoctorSchedule).filter(DoctorSchedule.doctor_id == doctor_id).all()
+    return {**doctor_to_dict(doctor), "schedules": [schedule_to_dict(s) for s in schedules]}
+
+def find_doctor_by_email(db: Session, email: str):
+    return db.query(Doctor).filter(Doctor.email == email).first()
+
+def find_schedules_for_day(db: Session, doctor_id: int, day: DayOfWeek):
+    return db.query(DoctorSchedule).filter(
+        DoctorSchedule.doctor_id == doctor_id,
+        DoctorSchedule.day == day
+    ).all()
+
+def get_schedule_by_id(db: Session, schedule_id: int):
+    return db.query(DoctorSchedule).filter(DoctorSchedule.id == schedule_id).first()
+
+def save(db: Session, obj):
+    db.add(obj)
+    db.commit()
+    db.refresh(obj)
+    return obj
+
+def delete(db: Session, obj):
+    db.delete(obj)
+    db.commit()
+
+def delete_doctor_row(db: Session, doctor: Doctor):
+    availability.forget_doctor(db, doctor.id)
+    delete(db, doctor)
+
+# Schedule and exception changes rebuild the affected availability dates in
+# the same transaction
+def save_schedule(db: Session, schedule: DoctorSchedule):
+    db.add(schedule)
+    db.flush()
+    availability.refresh_weekday(db, schedule.doctor_id, schedule.day)
+    db.commit()
+    db.refresh(schedule)
+    return schedule
+
+def delete_schedule_row(db: Session, schedule: DoctorSchedule):
+    db.delete(schedule)
+    db.flush()
+    availability.refresh_weekday(db, schedule.doctor_id, schedule.day)
+    db.commit()
+
+def exception_to_dict(e: ScheduleException):
+    return {
+        "id": e.id,
+        "doctor_id": e.doctor_id,
+        "date": e.date.isoformat(),
+        "kind": e.kind.value,
+        "start_time": e.start_time.strftime("%H:%M") if e.start_time else None,
+        "end_time": e.end_time.strftime("%H:%M") if e.end_time else None,
+        "reason": e.reason
+    }
+
+def list_exceptions(db: Session, doctor_id: int, start: date, end: date):
+    return [
+        exception_to_dict(e)
+        for e in db.query(ScheduleException).filter(
+            ScheduleException.doctor_id == doctor_id,
+            ScheduleException.date >= start,
+            ScheduleException.date <= end
+        ).order_by(ScheduleException.date, ScheduleException.start_time)
+    ]
+
+def get_exception_by_id(db: Session, exception_id: int):
+    return db.query(ScheduleException).filter(ScheduleException.id == exception_id).first()
+
+def save_exception(db: Session, exception: ScheduleException):
+    db.add(exception)
+    db.flush()
+    availability.refresh_dates(db, exception.doctor_id, [exception.date])
+    db.commit()
+    return exception_to_dict(exception)
+
+def delete_exception_row(db: Session, exception: ScheduleException):
+    db.delete(exception)
+    db.flush()
+    availability.refresh_dates(db, exception.doctor_id, [exception.date])
+    db.commit()
+
 # ========================================
 # ROUTES (Order matters!)
 # ========================================
 
 # 1️⃣ /all MUST be FIRST (before /{doctor_id})
-@router.get("/all")
+@router.get("/all", response_model=List[DoctorWithSchedules])
 async def get_all_doctors_admin(
     current_user = Depends(admin_required),
-    db: Session = Depends(get_db)
+    db = Depends(get_db)
 ):
     """Get all doctors - admin"""
-    doctors = db.query(Doctor).all()
-    
-    # Map day enum value to weekday number for frontend
-    day_to_weekday = {
-        "SUNDAY": 0, "MONDAY": 1, "TUESDAY": 2, "WEDNESDAY": 3,
-        "THURSDAY": 4, "FRIDAY": 5, "SATURDAY": 6
-    }
-    
-    return [
-        {
-            "id": d.id,
-            "name": d.name,
-            "email": d.email,
-            "specialty": d.specialty,
-            "bio": d.bio,
-            "duration_minutes": d.duration_minutes or 60,
-            "schedules": [
-                {
-                    "id": s.id,
-                    "weekday": day_to_weekday.get(s.day.value, 0),
-                    "start_time": s.start_time.strftime("%H:%M"),
-                    "end_time": s.end_time.strftime("%H:%M")
-                }
-                for s in d.schedules
-            ]
-        }
-        for d in doctors
-    ]
+    return FastJSONResponse(await run_db(db, list_doctors_with_schedules))
 
 # 2️⃣ Get all doctors - PUBLIC
-@router.get("/")
-async def get_all_doctors_public(db: Session = Depends(get_db)):
-    """Get all doctors - public"""
-    doctors = db.query(Doctor).all()
-    return [
-        {
-            "id": d.id,
-            "name": d.name,
-            "email": d.email,
-            "specialty": d.specialty,
-            "bio": d.bio,
-            "duration_minutes": d.duration_minutes or 60
-        }
-        for d in doctors
-    ]
+@router.get("/", response_model=List[DoctorOut])
+async def get_all_doctors_public(request: Request, db = Depends(get_db)):
+    """Get all doctors - public (cached, supports If-None-Match)"""
+    cached = directory_cache.get("list")
+    if cached is None:
+        version = directory_cache.version
+        cached = directory_cache.store("list", version, await run_db(db, list_doctors))
+    return directory_response(request, cached)
 
 # 3️⃣ Create doctor
 @router.post("/")
 async def create_doctor(
     doctor: DoctorCreate,
     current_user = Depends(admin_required),
-    db: Session = Depends(get_db)
+    db = Depends(get_db)
 ):
     """Create doctor"""
     # Check if email exists
-    existing = db.query(Doctor).filter(Doctor.email == doctor.email).first()
+    existing = await run_db(db, find_doctor_by_email, doctor.email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already exists")
     
@@ -106,9 +228,9 @@ async def create_doctor(
         duration_minutes=doctor.duration_minutes or 60
     )
     
-    db.add(new_doctor)
-    db.commit()
-    db.refresh(new_doctor)
+    await run_db(db, save, new_doctor)
+    stats_cache.clear()
+    await invalidation.directory_changed()
     
     return {
         "id": new_doctor.id,
@@ -119,55 +241,184 @@ async def create_doctor(
         "duration_minutes": new_doctor.duration_minutes
     }
 
+# Search doctors (MUST be before /{doctor_id})
+@router.get("/search", response_model=SearchResults)
+async def search(
+    q: Optional[str] = None,
+    specialty: Optional[str] = None,
+    available_on: Optional[date] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db = Depends(get_db)
+):
+    """Search doctors by text, specialty and working day, with specialty facets"""
+    total, doctors, facets = await run_db(
+        db, search_doctors, q=q, specialty=specialty, available_on=available_on, limit=limit, offset=offset
+    )
+    return FastJSONResponse({
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "results": doctors,
+        "facets": {"specialty": facets}
+    })
+
+# Bulk import / export (MUST be before /{doctor_id})
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+async def run_bulk_import(request: Request, db, import_name: str, atomic: bool):
+    # Admin-only, so doctors.bulk (csv, tempfile) is imported on first use
+    from doctors import bulk
+
+    import_fn = getattr(bulk, import_name)
+    try:
+        fmt = bulk.detect_format(request.headers.get("content-type"))
+        spool = await bulk.spool_body(request)
+        try:
+            report = await run_db(db, import_fn, spool, fmt, atomic)
+        finally:
+            spool.close()
+    except bulk.BulkImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except bulk.BulkImportConflict as e:
+        raise HTTPException(status_code=409, detail=e.report)
+
+    if report["inserted"]:
+        await invalidation.all_changed()
+        stats_cache.clear()
+    return report
+
+@router.post("/bulk")
+async def bulk_import_doctors(
+    request: Request,
+    atomic: bool = False,
+    current_user = Depends(admin_required),
+    db = Depends(get_db)
+):
+    """
+    Import doctors from CSV, NDJSON or a JSON array (by Content-Type).
+    Returns a per-row error report; atomic=true commits nothing if any row fails.
+    """
+    return await run_bulk_import(request, db, "import_doctors", atomic)
+
+@router.post("/schedules/bulk")
+async def bulk_import_schedules(
+    request: Request,
+    atomic: bool = False,
+    current_user = Depends(admin_required),
+    db = Depends(get_db)
+):
+    """Import schedules (doctor_id, weekday, start_time, end_time) in bulk"""
+    return await run_bulk_import(request, db, "import_schedules", atomic)
+
+@router.get("/export")
+async def export_doctors(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    current_user = Depends(admin_required)
+):
+    """Stream every doctor as CSV or NDJSON"""
+    from doctors import bulk
+    return StreamingResponse(
+        bulk.export_doctors(format, SessionLocal),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="doctors.{format}"'}
+    )
+
+@router.get("/schedules/export")
+async def export_schedules(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    current_user = Depends(admin_required)
+):
+    """Stream every schedule as CSV or NDJSON"""
+    from doctors import bulk
+    return StreamingResponse(
+        bulk.export_schedules(format, SessionLocal),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="schedules.{format}"'}
+    )
+
 # 4️⃣ Get single doctor (MUST be after /all)
-@router.get("/{doctor_id}")
-async def get_doctor(doctor_id: int, db: Session = Depends(get_db)):
-    """Get single doctor with schedules"""
-    doctor = db.query(Doctor).filter(Doctor.id == doctor_id).first()
+@router.get("/{doctor_id}", response_model=DoctorWithSchedules)
+async def get_doctor(doctor_id: int, request: Request, db = Depends(get_db)):
+    """Get single doctor with schedules (cached, supports If-None-Match)"""
+    cached = directory_cache.get(("doctor", doctor_id))
+    if cached is None:
+        version = directory_cache.version
+        doctor = await run_db(db, load_doctor_detail, doctor_id)
+        if not doctor:
+            raise HTTPException(status_code=404, detail="Doctor not found")
+        cached = directory_cache.store(("doctor", doctor_id), version, doctor)
+    return directory_response(request, cached)
+
+# Free slots for a doctor
+@router.get("/{doctor_id}/slots", response_model=DoctorSlots)
+async def get_available_slots(
+    doctor_id: int,
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db = Depends(get_db)
+):
+    """Get free slots for a doctor between from and to (inclusive)"""
+    doctor = await run_db(db, get_doctor_by_id, doctor_id)
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found")
-    
-    # Get schedules
-    schedules = db.query(DoctorSchedule).filter(DoctorSchedule.doctor_id == doctor_id).all()
-    
-    # Map day enum to weekday number
-    day_to_weekday = {
-        "SUNDAY": 0, "MONDAY": 1, "TUESDAY": 2, "WEDNESDAY": 3,
-        "THURSDAY": 4, "FRIDAY": 5, "SATURDAY": 6
-    }
-    
-    return {
-        "id": doctor.id,
-        "name": doctor.name,
-        "email": doctor.email,
-        "specialty": doctor.specialty,
-        "bio": doctor.bio,
-        "duration_minutes": doctor.duration_minutes or 60,
-        "schedules": [
-            {
-                "id": s.id,
-                "weekday": day_to_weekday.get(s.day.value, 0),
-                "start_time": s.start_time.strftime("%H:%M"),
-                "end_time": s.end_time.strftime("%H:%M")
-            }
-            for s in schedules
-        ]
-    }
+
+    start = from_date or date.today()
+    end = to_date or start
+    if end < start:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range cannot exceed {MAX_RANGE_DAYS} days")
+    if not availability.within_horizon(start, end):
+        raise horizon_exception()
+
+    duration = doctor.duration_minutes or 60
+    slots = await run_db(db, slot_index.get_free_slots, doctor, start, end)
+
+    return FastJSONResponse({
+        "doctor_id": doctor.id,
+        "duration_minutes": duration,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "slots": [slot_to_dict(d, t, duration) for d, t in slots]
+    })
+
+# Live slot changes for one day (Server-Sent Events, see doctors/live.py)
+@router.get("/{doctor_id}/slots/stream")
+async def stream_slots(
+    doctor_id: int,
+    day: Optional[date] = Query(None, alias="date"),
+    db = Depends(get_db)
+):
+    """Free slots of a doctor on a date, then taken/freed events as they happen"""
+    day = day or date.today()
+    if not availability.within_horizon(day, day):
+        raise horizon_exception()
+    doctor = await run_db(db, get_doctor_by_id, doctor_id)
+    if not doctor:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+
+    return StreamingResponse(
+        slot_events(doctor_id, day),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # 5️⃣ Delete doctor
 @router.delete("/{doctor_id}")
 async def delete_doctor(
     doctor_id: int,
     current_user = Depends(admin_required),
-    db: Session = Depends(get_db)
+    db = Depends(get_db)
 ):
     """Delete doctor"""
-    doctor = db.query(Doctor).filter(Doctor.id == doctor_id).first()
+    doctor = await run_db(db, get_doctor_by_id, doctor_id)
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found")
     
-    db.delete(doctor)
-    db.commit()
+    await run_db(db, delete_doctor_row, doctor)
+    await invalidation.doctor_changed(doctor_id)
+    stats_cache.clear()
     return {"message": "Doctor deleted successfully"}
 
 # 6️⃣ Add schedule
@@ -176,11 +427,11 @@ async def add_schedule(
     doctor_id: int,
     schedule: ScheduleCreateRequest,
     current_user = Depends(admin_required),
-    db: Session = Depends(get_db)
+    db = Depends(get_db)
 ):
     """Add schedule for doctor"""
     # Check doctor exists
-    doctor = db.query(Doctor).filter(Doctor.id == doctor_id).first()
+    doctor = await run_db(db, get_doctor_by_id, doctor_id)
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found")
     
@@ -211,14 +462,14 @@ async def add_schedule(
     if end <= start:
         raise HTTPException(status_code=400, detail="End time must be after start time")
     
-    # Check if schedule already exists for this day
-    existing = db.query(DoctorSchedule).filter(
-        DoctorSchedule.doctor_id == doctor_id,
-        DoctorSchedule.day == day_enum
-    ).first()
-    
-    if existing:
-        raise HTTPException(status_code=400, detail="Schedule already exists for this day. Delete the existing one first.")
+    # Several windows per day are allowed (split shifts) as long as they don't overlap
+    existing = await run_db(db, find_schedules_for_day, doctor_id, day_enum)
+    clash = availability.overlapping_window([(s.start_time, s.end_time) for s in existing], start, end)
+    if clash:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Schedule overlaps the existing {clash[0].strftime('%H:%M')}-{clash[1].strftime('%H:%M')} window on this day"
+        )
     
     # Create schedule
     new_schedule = DoctorSchedule(
@@ -228,9 +479,8 @@ async def add_schedule(
         end_time=end
     )
     
-    db.add(new_schedule)
-    db.commit()
-    db.refresh(new_schedule)
+    await run_db(db, save_schedule, new_schedule)
+    await invalidation.doctor_changed(doctor_id)
     
     return {
         "id": new_schedule.id,
@@ -246,13 +496,84 @@ async def add_schedule(
 async def delete_schedule(
     schedule_id: int,
     current_user = Depends(admin_required),
-    db: Session = Depends(get_db)
+    db = Depends(get_db)
 ):
     """Delete schedule"""
-    schedule = db.query(DoctorSchedule).filter(DoctorSchedule.id == schedule_id).first()
+    schedule = await run_db(db, get_schedule_by_id, schedule_id)
     if not schedule:
         raise HTTPException(status_code=404, detail="Schedule not found")
     
-    db.delete(schedule)
-    db.commit()
-    return {"message": "Schedule deleted successfully"}
\ No newline at end of file
+    doctor_id = schedule.doctor_id
+    await run_db(db, delete_schedule_row, schedule)
+    await invalidation.doctor_changed(doctor_id)
+    return {"message": "Schedule deleted successfully"}
+
+# 8️⃣ Schedule exceptions (holidays, extra or shortened days)
+@router.get("/{doctor_id}/exceptions")
+async def get_schedule_exceptions(
+    doctor_id: int,
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db = Depends(get_db)
+):
+    """List schedule exceptions of a doctor between from and to (default: next 90 days)"""
+    start = from_date or date.today()
+    end = to_date or start + timedelta(days=90)
+    return await run_db(db, list_exceptions, doctor_id, start, end)
+
+@router.post("/{doctor_id}/exceptions")
+async def add_schedule_exception(
+    doctor_id: int,
+    exception: ScheduleExceptionCreate,
+    current_user = Depends(admin_required),
+    db = Depends(get_db)
+):
+    """
+    Add a dated exception. CLOSED without times closes the whole day, CLOSED
+    with times removes that window, OPEN adds a window on that date.
+    """
+    doctor = await run_db(db, get_doctor_by_id, doctor_id)
+    if not doctor:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+
+    if (exception.start_time is None) != (exception.end_time is None):
+        raise HTTPException(status_code=400, detail="Give both start_time and end_time, or neither")
+    if exception.kind == ExceptionKind.OPEN and exception.start_time is None:
+        raise HTTPException(status_code=400, detail="OPEN exceptions need start_time and end_time")
+
+    start = end = None
+    if exception.start_time is not None:
+        try:
+            start = datetime.strptime(exception.start_time, "%H:%M").time()
+            end = datetime.strptime(exception.end_time, "%H:%M").time()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid time format. Use HH:MM")
+        if end <= start:
+            raise HTTPException(status_code=400, detail="End time must be after start time")
+
+    new_exception = ScheduleException(
+        doctor_id=doctor_id,
+        date=exception.date,
+        kind=exception.kind,
+        start_time=start,
+        end_time=end,
+        reason=exception.reason
+    )
+    result = await run_db(db, save_exception, new_exception)
+    await invalidation.day_changed(doctor_id, exception.date)
+    return result
+
+@router.delete("/exceptions/{exception_id}")
+async def delete_schedule_exception(
+    exception_id: int,
+    current_user = Depends(admin_required),
+    db = Depends(get_db)
+):
+    """Delete a schedule exception"""
+    exception = await run_db(db, get_exception_by_id, exception_id)
+    if not exception:
+        raise HTTPException(status_code=404, detail="Schedule exception not found")
+
+    await run_db(db, delete_exception_row, exception)
+    await invalidation.day_changed(exception.doctor_id, exception.date)
+    return {"message": "Schedule exception deleted successfully"}
\ No newline at end of file
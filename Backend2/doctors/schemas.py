@@ -19,8 +19,8 @@
 #     start_time: str        # "HH:MM"
 #     end_time: str          # "HH:MM"
 
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import Dict, List, Optional
 from models import DayOfWeek
 
 class DoctorCreate(BaseModel):
@@ -39,4 +39,46 @@ class ScheduleCreate(BaseModel):
 class AppointmentCreate(BaseModel):
     doctor_id: int
     day: str        # "THURSDAY"
-    time: str       # "13:30"
\ No newline at end of file
+    time: str       # "13:30"
+
+
+# ========================================
+# Response models (documented in OpenAPI; listings return
+# FastJSONResponse so they are not re-validated per row)
+# ========================================
+class ScheduleOut(BaseModel):
+    id: int
+    weekday: int
+    start_time: str  # "HH:MM"
+    end_time: str    # "HH:MM"
+
+class DoctorOut(BaseModel):
+    id: int
+    name: str
+    email: str
+    specialty: Optional[str] = None
+    bio: Optional[str] = None
+    duration_minutes: int
+
+class DoctorWithSchedules(DoctorOut):
+    schedules: List[ScheduleOut]
+
+class SearchResults(BaseModel):
+    total: int
+    limit: int
+    offset: int
+    results: List[DoctorOut]
+    facets: Dict[str, Dict[str, int]]
+
+class SlotOut(BaseModel):
+    date: str
+    time: str
+    start_at: str
+    end_at: str
+
+class DoctorSlots(BaseModel):
+    doctor_id: int
+    duration_minutes: int
+    from_date: str = Field(alias="from")  # "from" is a Python keyword
+    to: str
+    slots: List[SlotOut]
@@ -0,0 +1,153 @@
+"""
+Doctor full-text search.
+
+SQLite uses an FTS5 table (doctors_fts) kept in sync with doctors by
+triggers; PostgreSQL uses a GIN index over a tsvector expression. Both are
+created by migration 0002. If neither is available the search falls back to
+case-insensitive LIKE so the endpoint keeps working on unmigrated databases.
+"""
+from datetime import date
+import re
+
+from sqlalchemy import select, func, literal, null, cast, or_, and_, union_all, Integer, String, Text, text
+from sqlalchemy.orm import Session
+from models import Doctor, DoctorSchedule
+from doctors.slots import WEEKDAYS
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+PG_SEARCH_DOCUMENT = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(specialty, '') || ' ' || coalesce(bio, ''))"
+)
+
+SQLITE_STATEMENTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS doctors_fts USING fts5("
+    "name, specialty, bio, content='doctors', content_rowid='id', tokenize='unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS doctors_fts_insert AFTER INSERT ON doctors BEGIN "
+    "INSERT INTO doctors_fts(rowid, name, specialty, bio) VALUES (new.id, new.name, new.specialty, new.bio); END",
+    "CREATE TRIGGER IF NOT EXISTS doctors_fts_delete AFTER DELETE ON doctors BEGIN "
+    "INSERT INTO doctors_fts(doctors_fts, rowid, name, specialty, bio) "
+    "VALUES ('delete', old.id, old.name, old.specialty, old.bio); END",
+    "CREATE TRIGGER IF NOT EXISTS doctors_fts_update AFTER UPDATE ON doctors BEGIN "
+    "INSERT INTO doctors_fts(doctors_fts, rowid, name, specialty, bio) "
+    "VALUES ('delete', old.id, old.name, old.specialty, old.bio); "
+    "INSERT INTO doctors_fts(rowid, name, specialty, bio) VALUES (new.id, new.name, new.specialty, new.bio); END",
+    "INSERT INTO doctors_fts(doctors_fts) VALUES ('rebuild')",
+]
+
+POSTGRES_STATEMENTS = [
+    f"CREATE INDEX IF NOT EXISTS ix_doctors_search ON doctors USING GIN ({PG_SEARCH_DOCUMENT})",
+    "CREATE INDEX IF NOT EXISTS ix_doctors_specialty ON doctors (specialty)",
+]
+
+
+def create_search_index(conn):
+    """Create the dialect's text index (used by migration 0002)"""
+    if conn.dialect.name == "sqlite":
+        statements = SQLITE_STATEMENTS + ["CREATE INDEX IF NOT EXISTS ix_doctors_specialty ON doctors (specialty)"]
+    elif conn.dialect.name == "postgresql":
+        statements = POSTGRES_STATEMENTS
+    else:
+        return
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+_fts_available = {}
+
+
+def has_sqlite_fts(db: Session) -> bool:
+    bind = db.get_bind()
+    key = str(bind.url)
+    if key not in _fts_available:
+        _fts_available[key] = db.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'doctors_fts'"
+        )).first() is not None
+    return _fts_available[key]
+
+
+def text_condition(db: Session, q: str):
+    """WHERE clause matching every term of q as a prefix in name, specialty or bio"""
+    terms = TOKEN_RE.findall(q.lower())
+    if not terms:
+        return None
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite" and has_sqlite_fts(db):
+        match = " ".join(f'"{term}"*' for term in terms)
+        return Doctor.id.in_(
+            text("SELECT rowid FROM doctors_fts WHERE doctors_fts MATCH :match").bindparams(match=match)
+        )
+    if dialect == "postgresql":
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        return text(f"{PG_SEARCH_DOCUMENT} @@ to_tsquery('simple', :tsquery)").bindparams(tsquery=tsquery)
+
+    return and_(*(
+        or_(
+            func.lower(Doctor.name).like(f"%{term}%"),
+            func.lower(Doctor.specialty).like(f"%{term}%"),
+            func.lower(Doctor.bio).like(f"%{term}%"),
+        )
+        for term in terms
+    ))
+
+
+def search_doctors(db: Session, q=None, specialty=None, available_on: date = None, limit: int = 20, offset: int = 0):
+    """
+    Return (total, doctors, facets) with a single SQL statement.
+
+    Facet counts cover every doctor matching q and available_on, ignoring
+    the specialty filter, so the client can show how many doctors each other
+    specialty would return.
+    """
+    conditions = []
+    if q:
+        condition = text_condition(db, q)
+        if condition is not None:
+            conditions.append(condition)
+    if available_on:
+        conditions.append(Doctor.id.in_(
+            select(DoctorSchedule.doctor_id).where(DoctorSchedule.day == WEEKDAYS[available_on.weekday()])
+        ))
+
+    matches = select(
+        Doctor.id, Doctor.name, Doctor.email, Doctor.specialty, Doctor.bio, Doctor.duration_minutes
+    ).where(*conditions).cte("matches")
+
+    selected = select(matches).where(matches.c.specialty == specialty) if specialty else select(matches)
+    page = selected.order_by(matches.c.name, matches.c.id).limit(limit).offset(offset).subquery("page")
+    filtered = selected.subquery("filtered")
+
+    rows = db.execute(union_all(
+        select(
+            literal("hit").label("kind"), page.c.id, page.c.name, page.c.email,
+            page.c.specialty, page.c.bio, page.c.duration_minutes, cast(null(), Integer).label("n")
+        ),
+        select(
+            literal("facet"), cast(null(), Integer), cast(null(), String), cast(null(), String),
+            matches.c.specialty, cast(null(), Text), cast(null(), Integer), func.count()
+        ).group_by(matches.c.specialty),
+        select(
+            literal("total"), cast(null(), Integer), cast(null(), String), cast(null(), String),
+            cast(null(), String), cast(null(), Text), cast(null(), Integer), func.count()
+        ).select_from(filtered),
+    )).all()
+
+    doctors, facets, total = [], {}, 0
+    for row in rows:
+        if row.kind == "hit":
+            doctors.append({
+                "id": row.id,
+                "name": row.name,
+                "email": row.email,
+                "specialty": row.specialty,
+                "bio": row.bio,
+                "duration_minutes": row.duration_minutes or 60
+            })
+        elif row.kind == "facet":
+            facets[row.specialty] = row.n
+        else:
+            total = row.n
+
+    doctors.sort(key=lambda d: (d["name"] or "", d["id"]))
+    return total, doctors, facets
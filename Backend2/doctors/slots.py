@@ -0,0 +1,143 @@
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+import threading
+
+from sqlalchemy.orm import Session
+from db_routing import use_primary
+from models import Appointment, Doctor
+from doctors.availability import WEEKDAYS, load_intervals
+
+MAX_RANGE_DAYS = 31
+
+
+def generate_slots(start_time: time, end_time: time, duration: int):
+    """Split a schedule window into consecutive slots that fit inside it"""
+    slots = []
+    step = timedelta(minutes=duration or 60)
+    current = datetime.combine(date.min, start_time)
+    end = datetime.combine(date.min, end_time)
+    while current + step <= end:
+        slots.append(current.time())
+        current += step
+    return slots
+
+
+class SlotIndex:
+    """
+    In-process index of slots per (doctor_id, date).
+
+    Each entry keeps every slot of the doctor's materialised availability
+    (doctors/availability.py) for that day plus the set of booked slot times,
+    so booking and cancellation only touch a set instead of recomputing the
+    day. Least recently used days are evicted once max_entries is reached.
+
+    Loads read the database outside the lock. Every change to a doctor bumps
+    its generation, and a load that raced with one is used for that read
+    only, never cached, so a booking made mid-load cannot be lost.
+    """
+
+    def __init__(self, max_entries: int = 20000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generations = {}   # doctor_id -> changes seen
+        self._epoch = 0          # bumped by clear()
+
+    def _generation(self, doctor_id: int):
+        return self._epoch, self._generations.get(doctor_id, 0)
+
+    def _bump(self, doctor_id: int):
+        self._generations[doctor_id] = self._generations.get(doctor_id, 0) + 1
+
+    def _load(self, db: Session, doctor: Doctor, dates):
+        use_primary(db)  # cached until invalidated, so never from a lagging replica
+        intervals = load_intervals(db, doctor.id, min(dates), max(dates))
+
+        booked = {d: set() for d in dates}
+        rows = db.query(Appointment.date, Appointment.time).filter(
+            Appointment.doctor_id == doctor.id,
+            Appointment.date >= min(dates),
+            Appointment.date <= max(dates),
+            Appointment.status != "CANCELLED"
+        ).all()
+        for apt_date, apt_time in rows:
+            if apt_date in booked:
+                booked[apt_date].add(apt_time)
+
+        return {
+            d: (
+                [slot for start, end in intervals[d] for slot in generate_slots(start, end, doctor.duration_minutes)],
+                booked[d]
+            )
+            for d in dates
+        }
+
+    def get_free_slots(self, db: Session, doctor: Doctor, start: date, end: date):
+        """Return [(date, time), ...] of free slots between start and end inclusive"""
+        dates = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+        with self._lock:
+            generation = self._generation(doctor.id)
+            missing = [d for d in dates if (doctor.id, d) not in self._entries]
+
+        loaded = {}
+        if missing:
+            loaded = self._load(db, doctor, missing)
+            with self._lock:
+                if self._generation(doctor.id) == generation:
+                    for d, entry in loaded.items():
+                        self._entries.setdefault((doctor.id, d), entry)
+                    self._evict()
+
+        result = []
+        with self._lock:
+            for d in dates:
+                entry = self._entries.get((doctor.id, d))
+                if entry is not None:
+                    self._entries.move_to_end((doctor.id, d))
+                else:
+                    entry = loaded.get(d)
+                    if entry is None:
+                        continue
+                slots, booked = entry
+                result.extend((d, t) for t in slots if t not in booked)
+        return result
+
+    def mark_booked(self, doctor_id: int, day: date, slot: time):
+        with self._lock:
+            self._bump(doctor_id)
+            entry = self._entries.get((doctor_id, day))
+            if entry is not None:
+                entry[1].add(slot)
+
+    def mark_freed(self, doctor_id: int, day: date, slot: time):
+        with self._lock:
+            self._bump(doctor_id)
+            entry = self._entries.get((doctor_id, day))
+            if entry is not None:
+                entry[1].discard(slot)
+
+    def invalidate_day(self, doctor_id: int, day: date):
+        with self._lock:
+            self._bump(doctor_id)
+            self._entries.pop((doctor_id, day), None)
+
+    def invalidate_doctor(self, doctor_id: int):
+        """Drop every cached day of a doctor (schedule or doctor changed)"""
+        with self._lock:
+            self._bump(doctor_id)
+            for key in [k for k in self._entries if k[0] == doctor_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._generations.clear()
+            self._entries.clear()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+slot_index = SlotIndex()
@@ -0,0 +1,15 @@
+"""
+Loads .env into the environment.
+
+Modules that read settings when they are imported (db.py, db_pool.py,
+db_routing.py, ...) import this first, so values from .env are seen
+whatever module happens to be imported first. Variables already set in
+the environment win over .env.
+
+    ENV_FILE  path of the file to load (default: the nearest .env above this directory)
+"""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv(os.getenv("ENV_FILE") or None)
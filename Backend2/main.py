@@ -1,32 +1,81 @@
 # main.py
-from fastapi import FastAPI, Request
+import env  # noqa: F401  (.env before any module reads its settings)
+from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+import asyncio
 import logging
+import os
+import sys
 
 # Import database setup
-from db import Base, engine
-import models
+from db import engine, get_db, run_db
+from db_pool import pool_status
+from db_routing import routing_stats
+from responses import FastJSONResponse
+from request_context import PROFILING_ENABLED
+from auth.hashing import hashing_pool
+from ratelimit import rate_limiter, booking_admission
+from appointments.events import event_log
+from appointments.idempotency import idempotency_store
+from pubsub import broker, PUBSUB_BACKEND
+import db
+
+# serve.py imports workers and sets up its shared table before loading the
+# app; under plain `uvicorn main:app` there is no table, so it is not imported
+workers = sys.modules.get("workers")
 
 # Import routers
 from auth.router import router as auth_router
 from doctors.router import router as doctor_router
 from appointments.router import router as appointment_router
+from admin.router import router as admin_router
 
 # ------------------------------
-# Create all database tables
+# Startup / shutdown
 # ------------------------------
-try:
-    Base.metadata.create_all(bind=engine)
-    print("✅ Database tables created successfully")
-except Exception as e:
-    print(f"⚠️ Database setup warning: {e}")
+# Schema creation checks every table on each boot, so workers skip it unless
+# asked; deploys run `python migrate.py` once (or set DB_CREATE_SCHEMA=true).
+DB_CREATE_SCHEMA = os.getenv("DB_CREATE_SCHEMA", "false").lower() in ("1", "true", "yes")
+
+def create_schema():
+    import migrations
+
+    try:
+        migrations.create_schema(engine)
+        print("✅ Database tables created successfully")
+    except Exception as e:
+        print(f"⚠️ Database setup warning: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if DB_CREATE_SCHEMA:
+        await run_in_threadpool(create_schema)
+    # Appointment events are written behind requests; flush what is left on shutdown
+    event_log.start()
+    await broker.start()
+    launched = workers is not None and workers.enabled()
+    if launched and PUBSUB_BACKEND != "memory" and not broker.shared:
+        # Other workers would never hear of this one's changes (doctors/invalidation.py)
+        raise RuntimeError("Pub/sub LISTEN is not connected; refusing to serve with stale caches")
+    # Under serve.py the first heartbeat marks this worker ready
+    heartbeat = asyncio.create_task(workers.heartbeat()) if launched else None
+    yield
+    if heartbeat is not None:
+        heartbeat.cancel()
+    await broker.stop()
+    await event_log.stop()
 
 # ------------------------------
 # FastAPI app
 # ------------------------------
-app = FastAPI(title="HealthTrack Clinic System")
+app = FastAPI(
+    title="HealthTrack Clinic System", default_response_class=FastJSONResponse, lifespan=lifespan
+)
 
 # ------------------------------
 # Validation Error Handler
@@ -61,13 +110,33 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Idempotent-Replayed"],
 )
+
+# ------------------------------
+# Opt-in profiling (PROFILING_ENABLED=true), see profiling.py
+# ------------------------------
+if PROFILING_ENABLED:
+    from profiling import ProfilingMiddleware, instrument_engine
+
+    for sync_engine in [db.engine, *db.replica_engines]:
+        instrument_engine(sync_engine)
+    if db.async_engine is not None:
+        for async_engine in [db.async_engine, *db.async_replica_engines]:
+            instrument_engine(async_engine.sync_engine)
+    app.add_middleware(ProfilingMiddleware)
+
+# Per-worker request counters for /health/workers (serve.py only)
+if workers is not None:
+    app.add_middleware(workers.RequestCounterMiddleware)
+
 # ------------------------------
 # Include Routers
 # ------------------------------
 app.include_router(auth_router)
 app.include_router(doctor_router)
 app.include_router(appointment_router)
+app.include_router(admin_router)
 
 # ------------------------------
 # Root endpoint
@@ -84,8 +153,60 @@ def home():
 def health():
     return {"status": "healthy"}
 
+def engine_pools():
+    """(name, engine) for the primary and every replica, sync and async"""
+    pools = [("sync", db.engine)]
+    pools += [(f"replica-{i}", e) for i, e in enumerate(db.replica_engines)]
+    if db.async_engine is not None:
+        pools.append(("async", db.async_engine))
+        pools += [(f"async-replica-{i}", e) for i, e in enumerate(db.async_replica_engines)]
+    return pools
+
+@app.get("/health/db")
+async def health_db(session = Depends(get_db)):
+    """Database connectivity plus live connection pool counters"""
+    try:
+        await run_db(session, lambda s: s.execute(text("SELECT 1")).scalar())
+        status = "healthy"
+    except Exception as e:
+        logging.error(f"❌ Database health check failed: {e}")
+        status = "unhealthy"
+
+    content = {
+        "status": status,
+        "dialect": db.engine.dialect.name,
+        "pools": {name: pool_status(e) for name, e in engine_pools()},
+    }
+    if db.replica_engines:
+        content["routing"] = routing_stats.snapshot()
+    return JSONResponse(status_code=200 if status == "healthy" else 503, content=content)
+
+@app.get("/health/workers")
+def health_workers():
+    """Every worker started by serve.py: pid, uptime, heartbeat age, requests served"""
+    return {"pid": os.getpid(), "workers": workers.status() if workers is not None else []}
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics: per-route request stats (when profiling is on), pools, hashing and limits"""
+    from profiling import render_gauges, request_metrics
+
+    body = request_metrics.render() if PROFILING_ENABLED else ""
+    pools = [({"pool": name}, pool_status(e)) for name, e in engine_pools()]
+    body += render_gauges("db_pool", "Connection pool state", pools)
+    if db.replica_engines:
+        body += render_gauges("db_routing", "Statements routed to replicas and primary", [({}, routing_stats.snapshot())])
+    body += render_gauges("password_hash_pool", "Password hashing pool state", [({}, hashing_pool.stats())])
+    limits = [({"limit": name}, counts) for name, counts in rate_limiter.stats()["limits"].items()]
+    body += render_gauges("rate_limit", "Requests allowed and denied per rate limit", limits)
+    body += render_gauges("admission", "Admission control queues", [({"queue": "booking"}, booking_admission.stats())])
+    body += render_gauges("booking_idempotency", "Idempotency-Key outcomes for bookings", [({}, idempotency_store.stats())])
+    body += render_gauges("pubsub", "Live update subscribers", [({}, broker.stats())])
+    body += render_gauges("appointment_event_log", "Write-behind appointment event log", [({}, event_log.stats())])
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
 # ------------------------------
-# For local development only
+# For local development only (production: python serve.py --workers N)
 # ------------------------------
 if __name__ == "__main__":
     import uvicorn
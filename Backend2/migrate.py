@@ -0,0 +1,75 @@
+# migrate.py
+# Usage:
+#   python migrate.py            create missing tables and apply pending migrations
+#   python migrate.py --explain  also check that hot queries use their indexes
+import sys
+from sqlalchemy import text
+
+from db import engine
+import migrations
+
+# (description, query, index the planner is expected to pick)
+HOT_QUERIES = [
+    (
+        "booking conflict check",
+        "SELECT id FROM appointments WHERE doctor_id = 1 AND date = '2030-01-01' "
+        "AND time = '09:00:00' AND status != 'CANCELLED'",
+        ("uq_appointments_active_slot", "ix_appointments_doctor_date_time_status"),
+    ),
+    (
+        "/appointments/me",
+        "SELECT id FROM appointments WHERE patient_id = 1 ORDER BY date, time",
+        ("ix_appointments_patient_date_time",),
+    ),
+    (
+        "/appointments/all keyset page",
+        "SELECT id FROM appointments WHERE date > '2030-01-01' ORDER BY date, time, id LIMIT 100",
+        ("ix_appointments_date_time_id",),
+    ),
+    (
+        "add_schedule day lookup",
+        "SELECT id FROM doctor_schedules WHERE doctor_id = 1 AND day = 'MONDAY'",
+        ("ix_doctor_schedules_doctor_day",),
+    ),
+    (
+        "materialised availability range scan",
+        "SELECT start_time, end_time FROM doctor_availability WHERE doctor_id = 1 "
+        "AND date >= '2030-01-01' AND date <= '2030-01-31'",
+        ("uq_doctor_availability_interval",),
+    ),
+]
+
+
+def explain(conn, sql):
+    if conn.dialect.name == "sqlite":
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        return "\n".join(str(row[-1]) for row in rows)
+    if conn.dialect.name == "postgresql":
+        # Tiny tables are cheaper to scan sequentially; ask whether the index is usable
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+    rows = conn.execute(text(f"EXPLAIN {sql}")).all()
+    return "\n".join(str(row[0]) for row in rows)
+
+
+def check_plans():
+    ok = True
+    with engine.begin() as conn:
+        for description, sql, expected in HOT_QUERIES:
+            plan = explain(conn, sql)
+            if any(index in plan for index in expected):
+                print(f"✅ {description}: uses {', '.join(i for i in expected if i in plan)}")
+            else:
+                ok = False
+                print(f"❌ {description}: expected one of {expected}\n{plan}")
+    return ok
+
+
+if __name__ == "__main__":
+    applied = migrations.create_schema(engine)
+    for migration in applied:
+        print(f"✅ Applied migration {migration.VERSION:04d} {migration.NAME}")
+    if not applied:
+        print("✅ Database schema is up to date")
+
+    if "--explain" in sys.argv and not check_plans():
+        sys.exit(1)
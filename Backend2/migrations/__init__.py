@@ -0,0 +1,65 @@
+"""
+Versioned schema migrations.
+
+Base.metadata.create_all only creates missing tables, so changes to existing
+tables (new indexes, columns) ship as numbered modules in this package. Each
+module defines VERSION, NAME and upgrade(conn). Applied versions are recorded
+in the schema_migrations table, and every statement must be valid on both
+SQLite and PostgreSQL.
+"""
+from datetime import datetime
+import importlib
+import pkgutil
+
+from sqlalchemy import text
+
+
+def load_migrations():
+    """Return migration modules of this package sorted by VERSION"""
+    modules = []
+    for info in pkgutil.iter_modules(__path__):
+        if info.name.startswith("m") and info.name[1:5].isdigit():
+            modules.append(importlib.import_module(f"{__name__}.{info.name}"))
+    return sorted(modules, key=lambda m: m.VERSION)
+
+
+def ensure_version_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, "
+        "name VARCHAR(255) NOT NULL, "
+        "applied_at TIMESTAMP NOT NULL)"
+    ))
+
+
+def applied_versions(conn):
+    ensure_version_table(conn)
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def upgrade(engine):
+    """Apply every pending migration, each in its own transaction"""
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+
+    applied = []
+    for migration in load_migrations():
+        if migration.VERSION in done:
+            continue
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": migration.VERSION, "n": migration.NAME, "t": datetime.utcnow()}
+            )
+        applied.append(migration)
+    return applied
+
+
+def create_schema(engine):
+    """Create missing tables, then apply pending migrations; returns the applied ones"""
+    from db import Base
+    import models  # noqa: F401  (registers the tables on Base.metadata)
+
+    Base.metadata.create_all(bind=engine)
+    return upgrade(engine)
@@ -0,0 +1,39 @@
+"""Composite indexes for appointment and schedule hot paths"""
+from sqlalchemy import text
+
+VERSION = 1
+NAME = "hot_path_indexes"
+
+STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS ix_appointments_doctor_date_time_status "
+    "ON appointments (doctor_id, date, time, status)",
+    "CREATE INDEX IF NOT EXISTS ix_appointments_patient_date_time "
+    "ON appointments (patient_id, date, time)",
+    "CREATE INDEX IF NOT EXISTS ix_appointments_date_time_id "
+    "ON appointments (date, time, id)",
+    "CREATE INDEX IF NOT EXISTS ix_doctor_schedules_doctor_day "
+    "ON doctor_schedules (doctor_id, day)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_appointments_active_slot "
+    "ON appointments (doctor_id, date, time) WHERE status != 'CANCELLED'",
+]
+
+
+def find_double_bookings(conn):
+    return conn.execute(text(
+        "SELECT doctor_id, date, time, COUNT(*) FROM appointments "
+        "WHERE status != 'CANCELLED' "
+        "GROUP BY doctor_id, date, time HAVING COUNT(*) > 1"
+    )).all()
+
+
+def upgrade(conn):
+    duplicates = find_double_bookings(conn)
+    if duplicates:
+        listing = ", ".join(f"doctor {d} on {day} at {t} ({n}x)" for d, day, t, n in duplicates[:10])
+        raise RuntimeError(
+            f"Cannot add uq_appointments_active_slot: {len(duplicates)} slots are double booked "
+            f"({listing}). Cancel the extra bookings and run the migration again."
+        )
+
+    for statement in STATEMENTS:
+        conn.execute(text(statement))
@@ -0,0 +1,9 @@
+"""Full-text index over doctor name, specialty and bio"""
+from doctors.search import create_search_index
+
+VERSION = 2
+NAME = "doctor_search_index"
+
+
+def upgrade(conn):
+    create_search_index(conn)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Enum, Time, Date, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, Enum, Time, Date, DateTime, Text, Index, Float, text
 from sqlalchemy.orm import relationship
 from db import Base
 import enum
@@ -47,6 +47,7 @@ class Doctor(Base):
     duration_minutes = Column(Integer, default=60)
 
     schedules = relationship("DoctorSchedule", back_populates="doctor", cascade="all, delete")
+    exceptions = relationship("ScheduleException", back_populates="doctor", cascade="all, delete")
     appointments = relationship("Appointment", back_populates="doctor", cascade="all, delete")
 
     
@@ -63,6 +64,61 @@ class DoctorSchedule(Base):
 
     doctor = relationship("Doctor", back_populates="schedules")
 
+    __table_args__ = (
+        # add_schedule / slot generation look schedules up per doctor and day
+        Index("ix_doctor_schedules_doctor_day", "doctor_id", "day"),
+    )
+
+
+# ------------------------------
+# One-off changes to the weekly schedule
+# ------------------------------
+class ExceptionKind(enum.Enum):
+    CLOSED = "CLOSED"   # not working (whole day when no times are given)
+    OPEN = "OPEN"       # extra working window on that date
+
+
+class ScheduleException(Base):
+    __tablename__ = "schedule_exceptions"
+    id = Column(Integer, primary_key=True, index=True)
+    doctor_id = Column(Integer, ForeignKey("doctors.id", ondelete="CASCADE"))
+    date = Column(Date)
+    kind = Column(Enum(ExceptionKind), default=ExceptionKind.CLOSED)
+    start_time = Column(Time, nullable=True)
+    end_time = Column(Time, nullable=True)
+    reason = Column(String(255), nullable=True)
+
+    doctor = relationship("Doctor", back_populates="exceptions")
+
+    __table_args__ = (
+        Index("ix_schedule_exceptions_doctor_date", "doctor_id", "date"),
+    )
+
+
+# ------------------------------
+# Materialised availability (see doctors/availability.py)
+# ------------------------------
+class DoctorAvailability(Base):
+    """Concrete open interval of a doctor on a date, derived from schedules and exceptions"""
+    __tablename__ = "doctor_availability"
+    id = Column(Integer, primary_key=True)
+    doctor_id = Column(Integer, ForeignKey("doctors.id", ondelete="CASCADE"))
+    date = Column(Date)
+    start_time = Column(Time)
+    end_time = Column(Time)
+
+    __table_args__ = (
+        # Slot queries are range scans on (doctor_id, date)
+        Index("uq_doctor_availability_interval", "doctor_id", "date", "start_time", unique=True),
+    )
+
+
+class AvailabilityCoveredDate(Base):
+    """A date for which a doctor's availability has been materialised"""
+    __tablename__ = "availability_covered_dates"
+    doctor_id = Column(Integer, ForeignKey("doctors.id", ondelete="CASCADE"), primary_key=True)
+    date = Column(Date, primary_key=True)
+
 
 # ------------------------------
 # Appointments
@@ -77,4 +133,56 @@ class Appointment(Base):
     status = Column(String(20), default="PENDING")
 
     doctor = relationship("Doctor", back_populates="appointments")
-    patient = relationship("User", back_populates="appointments")
\ No newline at end of file
+    patient = relationship("User", back_populates="appointments")
+
+    __table_args__ = (
+        # Booking conflict check and per-doctor slot lookups
+        Index("ix_appointments_doctor_date_time_status", "doctor_id", "date", "time", "status"),
+        # /appointments/me
+        Index("ix_appointments_patient_date_time", "patient_id", "date", "time"),
+        # Keyset pagination of /appointments/all
+        Index("ix_appointments_date_time_id", "date", "time", "id"),
+        # At most one active booking per doctor and slot
+        Index(
+            "uq_appointments_active_slot", "doctor_id", "date", "time",
+            unique=True,
+            sqlite_where=text("status != 'CANCELLED'"),
+            postgresql_where=text("status != 'CANCELLED'"),
+        ),
+    )
+
+
+# ------------------------------
+# Append-only appointment history (see appointments/events.py)
+# ------------------------------
+class AppointmentEvent(Base):
+    """
+    One status change of an appointment. Rows are only ever inserted; no
+    foreign keys, so history outlives deleted doctors and patients.
+    """
+    __tablename__ = "appointment_events"
+    id = Column(Integer, primary_key=True)
+    appointment_id = Column(Integer, nullable=False)
+    event_type = Column(String(20), nullable=False)   # CREATED, CANCELLED, STATUS_CHANGED
+    status = Column(String(20), nullable=False)       # status after the event
+    doctor_id = Column(Integer)
+    patient_id = Column(Integer)
+    date = Column(Date)
+    time = Column(Time)
+    actor_id = Column(Integer)
+    occurred_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_appointment_events_appointment_id", "appointment_id", "id"),
+        Index("ix_appointment_events_occurred_at", "occurred_at"),
+    )
+
+
+# ------------------------------
+# Shared rate limit buckets (RATE_LIMIT_BACKEND=database, see ratelimit.py)
+# ------------------------------
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+    bucket_key = Column(String(255), primary_key=True)   # "<limit name>:<client key>"
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)           # epoch seconds of the last refill
@@ -0,0 +1,284 @@
+"""
+Opt-in request profiling and Prometheus-style metrics.
+
+Enabled with PROFILING_ENABLED=true. For every request the middleware
+records, per route template:
+
+    latency histogram, request count by status,
+    SQL statement count and time (SQLAlchemy cursor events on the engines),
+    time spent waiting for password hashing.
+
+They are exposed by GET /metrics, and each response carries a
+Server-Timing header with that request's SQL and hashing time.
+
+Sending X-Profile-Token equal to PROFILE_TOKEN runs a sampling profiler for
+that one request and returns its collapsed stacks (flamegraph input)
+instead of the normal response; the original status is in X-Profiled-Status.
+Only the request's threads are sampled: the event loop thread, threads that
+ran SQL for it (run_db) and password hashing threads working for it. The
+event loop thread is shared, so coroutines of concurrent requests can show
+up in its stacks; profile on an otherwise idle worker. X-Profiled-Threads
+gives the number of threads sampled.
+"""
+from collections import Counter
+import os
+import sys
+import threading
+import time
+
+from sqlalchemy import event
+from request_context import PROFILING_ENABLED, RequestStats, current_stats, note_thread  # noqa: F401
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 1)) / 1000
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def instrument_engine(sync_engine):
+    """Count statements and SQL time of the current request on sync_engine"""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        note_thread()
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        stats = current_stats.get()
+        if stats is not None:
+            stats.sql_statements += 1
+            stats.sql_seconds += time.perf_counter() - started
+
+
+# ========================================
+# Metrics
+# ========================================
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class RouteStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.statuses = Counter()
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.hash_seconds = 0.0
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{k}="{str(v).replace(chr(34), "")}"' for k, v in labels.items())
+
+
+class RequestMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        with self._lock:
+            entry = self._routes.get((method, route))
+            if entry is None:
+                entry = self._routes[(method, route)] = RouteStats()
+            entry.latency.observe(seconds)
+            entry.statuses[status] += 1
+            entry.sql_statements += stats.sql_statements
+            entry.sql_seconds += stats.sql_seconds
+            entry.hash_seconds += stats.hash_seconds
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by route",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        totals = []
+        with self._lock:
+            for (method, route), entry in sorted(self._routes.items()):
+                labels = _labels(method=method, route=route)
+                cumulative = 0
+                for bound, count in zip(entry.latency.buckets, entry.latency.counts):
+                    cumulative += count
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {entry.latency.count}')
+                lines.append(f"http_request_duration_seconds_sum{{{labels}}} {entry.latency.sum:.6f}")
+                lines.append(f"http_request_duration_seconds_count{{{labels}}} {entry.latency.count}")
+                totals.append((method, route, entry, dict(entry.statuses)))
+
+        counters = [
+            ("http_requests_total", "Requests by route and status", None),
+            ("http_request_sql_statements_total", "SQL statements executed", "sql_statements"),
+            ("http_request_sql_seconds_total", "Time spent in SQL", "sql_seconds"),
+            ("http_request_password_hash_seconds_total", "Time spent waiting for password hashing", "hash_seconds"),
+        ]
+        for name, help_text, attribute in counters:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for method, route, entry, statuses in totals:
+                if attribute is None:
+                    for status, count in sorted(statuses.items()):
+                        lines.append(f"{name}{{{_labels(method=method, route=route, status=status)}}} {count}")
+                else:
+                    lines.append(f"{name}{{{_labels(method=method, route=route)}}} {getattr(entry, attribute):g}")
+        return "\n".join(lines) + "\n"
+
+
+request_metrics = RequestMetrics()
+
+
+def render_gauges(name: str, help_text: str, series) -> str:
+    """Render [(labels, stats_dict), ...] (pool_status, hashing stats) as one gauge family"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for labels, values in series:
+        for key, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"{name}{{{_labels(**labels, stat=key)}}} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# ========================================
+# Sampling profiler
+# ========================================
+# Leaf frames in these files are threads waiting for work, not doing it
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py", os.path.join("concurrent", "futures", "thread.py"))
+
+
+class SamplingProfiler:
+    """
+    Samples thread stacks at a fixed interval and counts collapsed stacks.
+    With threads (a set of idents, which may grow while it runs) only those
+    threads are sampled; without it every thread is.
+    """
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL, threads=None):
+        self.interval = interval
+        self.threads = threads
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own or frame.f_code.co_filename.endswith(IDLE_FILES):
+                    continue
+                if self.threads is not None and ident not in self.threads:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stop.set()
+        self._thread.join()
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+# ========================================
+# Middleware
+# ========================================
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    # Unmatched paths share one label to keep metric cardinality bounded
+    return getattr(route, "path", None) or "unmatched"
+
+
+def _server_timing(stats: RequestStats) -> bytes:
+    return (
+        f'sql;dur={stats.sql_seconds * 1000:.2f};desc="{stats.sql_statements} statements", '
+        f"hash;dur={stats.hash_seconds * 1000:.2f}"
+    ).encode()
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+        try:
+            if PROFILE_TOKEN and _header(scope, b"x-profile-token") == PROFILE_TOKEN.encode():
+                status = await self._profile(scope, receive, send, stats)
+                return
+
+            async def send_wrapper(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", _server_timing(stats))
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_stats.reset(token)
+            request_metrics.observe(
+                scope["method"], _route_label(scope), status, time.perf_counter() - started, stats
+            )
+
+    async def _profile(self, scope, receive, send, stats: RequestStats) -> int:
+        """Run the request under the sampler and answer with the profile"""
+        status = 500
+        stats.threads = {threading.get_ident()}
+
+        async def swallow(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        profiler = SamplingProfiler(threads=stats.threads)
+        profiler.start()
+        try:
+            await self.app(scope, receive, swallow)
+        finally:
+            body = profiler.stop().encode()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"x-profiled-status", str(status).encode()),
+                (b"x-profiled-threads", str(len(stats.threads)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+        return status
+
+
+def _header(scope, name: bytes):
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value
+    return None
@@ -0,0 +1,297 @@
+"""
+In-process publish/subscribe with a pluggable backend.
+
+    broker.subscribe(channel)          -> Subscription (async iterator of messages)
+    await broker.publish(channel, msg) -> delivered to every subscriber of channel
+
+PUBSUB_BACKEND selects the backend:
+
+    memory    (default) fan-out inside this process only
+    postgres  LISTEN/NOTIFY through asyncpg, so every worker process
+              connected to the same database sees every message
+
+Messages are JSON-serialisable dicts. Each subscriber has a bounded queue;
+a subscriber that falls behind is marked `overflowed` and its pending
+messages dropped, so one slow client cannot hold memory for everyone.
+
+    broker.on(channel, fn)             -> fn(message) runs on every delivery
+
+Handlers run synchronously as each message arrives, before any subscriber
+sees it, and cannot overflow; they keep per-worker caches in step
+(doctors/invalidation.py). `broker.shared` tells whether messages reach
+other processes at all.
+
+    broker.on_resync(fn)               -> fn() runs after messages may have been lost
+    broker.publish_soon(channel, msg)  -> publish() from sync code in any thread
+
+publish() never raises: when NOTIFY fails the message is delivered in this
+process only, so a request that already committed its change still
+succeeds. The postgres backend reconnects a lost LISTEN connection with
+exponential backoff (PUBSUB_RECONNECT_MIN_SECONDS, default 0.5, up to
+PUBSUB_RECONNECT_MAX_SECONDS, default 30). Messages from other workers are
+missed while it is down, so on reconnecting it runs the resync handlers
+and sends every live subscriber a fresh snapshot.
+"""
+import asyncio
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "memory").lower()
+PUBSUB_QUEUE_SIZE = int(os.getenv("PUBSUB_QUEUE_SIZE", 100))
+PUBSUB_RECONNECT_MIN_SECONDS = float(os.getenv("PUBSUB_RECONNECT_MIN_SECONDS", 0.5))
+PUBSUB_RECONNECT_MAX_SECONDS = float(os.getenv("PUBSUB_RECONNECT_MAX_SECONDS", 30))
+# How often a quiet LISTEN connection is checked for having closed
+PUBSUB_HEALTH_CHECK_SECONDS = 5
+# Longest a publish waits on NOTIFY before falling back to local delivery
+PUBSUB_PUBLISH_TIMEOUT_SECONDS = 5
+# One NOTIFY channel carries every logical channel
+PG_NOTIFY_CHANNEL = "healthtrack_pubsub"
+
+
+class Subscription:
+    def __init__(self, broker, channel: str, queue_size: int = PUBSUB_QUEUE_SIZE):
+        self.broker = broker
+        self.channel = channel
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def deliver(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # The consumer must resynchronise from the source of truth
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+
+    async def get(self, timeout: float = None):
+        """Next message, or None after timeout seconds without one"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MemoryBroker:
+    """Delivers messages to subscribers in this process"""
+
+    shared = False
+
+    def __init__(self):
+        self._subscribers = {}
+        self._handlers = {}
+        self._resync_handlers = []
+        self._loop = None
+        self._pending = set()
+
+    def on(self, channel: str, handler):
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def on_resync(self, handler):
+        self._resync_handlers.append(handler)
+
+    def _resync(self):
+        """Messages may have been missed: reset handler state and resend snapshots"""
+        for handler in self._resync_handlers:
+            try:
+                handler()
+            except Exception:
+                logger.exception("Pub/sub resync handler failed")
+        for subscribers in self._subscribers.values():
+            for subscription in subscribers:
+                subscription.overflowed = True
+
+    def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(self, channel)
+        self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.channel)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.channel]
+
+    def _deliver(self, channel: str, message):
+        for handler in self._handlers.get(channel, ()):
+            try:
+                handler(message)
+            except Exception:
+                logger.exception("Pub/sub handler failed on %s", channel)
+        for subscription in list(self._subscribers.get(channel, ())):
+            subscription.deliver(message)
+
+    async def publish(self, channel: str, message):
+        self._deliver(channel, message)
+
+    def publish_soon(self, channel: str, message):
+        """Schedule publish() on the broker's loop; before start() deliver in-process"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self._deliver(channel, message)
+            return
+        loop.call_soon_threadsafe(self._publish_task, channel, message)
+
+    def _publish_task(self, channel: str, message):
+        task = asyncio.get_running_loop().create_task(self.publish(channel, message))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    async def stop(self):
+        self._loop = None
+
+    def stats(self):
+        return {
+            "channels": len(self._subscribers),
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+        }
+
+
+class PostgresBroker(MemoryBroker):
+    """
+    Fans out through PostgreSQL NOTIFY so all workers receive each message.
+
+    One asyncpg connection per process LISTENs and publishes. While it is
+    not connected messages are only delivered locally, and a background
+    task keeps reconnecting.
+    """
+
+    def __init__(self, database_url: str):
+        super().__init__()
+        # asyncpg takes a plain postgresql:// DSN
+        self.dsn = database_url.replace("postgresql+asyncpg://", "postgresql://").replace(
+            "postgresql+psycopg2://", "postgresql://"
+        )
+        self._conn = None
+        self._lock = None
+        self._lost = None
+        self._task = None
+        self.reconnects = 0
+        self.publish_failures = 0
+
+    @property
+    def shared(self) -> bool:
+        return self._conn is not None and not self._conn.is_closed()
+
+    async def _open(self):
+        import asyncpg
+
+        return await asyncpg.connect(self.dsn)
+
+    async def _connect(self) -> bool:
+        try:
+            conn = await self._open()
+            await conn.add_listener(PG_NOTIFY_CHANNEL, self._on_notify)
+            conn.add_termination_listener(self._on_terminate)
+        except Exception as e:
+            logger.warning("Pub/sub LISTEN failed, delivering in-process only: %s", e)
+            return False
+        self._conn = conn
+        self._lost.clear()
+        return True
+
+    def _on_terminate(self, conn):
+        if conn is self._conn:
+            self._lost.set()
+
+    async def _close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.is_closed():
+            try:
+                await conn.close()
+            except Exception:
+                conn.terminate()
+
+    async def _keep_connected(self):
+        while True:
+            while self.shared and not self._lost.is_set():
+                try:
+                    await asyncio.wait_for(self._lost.wait(), PUBSUB_HEALTH_CHECK_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+            logger.warning("Pub/sub LISTEN connection is down; reconnecting")
+            await self._close()
+            delay = PUBSUB_RECONNECT_MIN_SECONDS
+            while not await self._connect():
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, PUBSUB_RECONNECT_MAX_SECONDS)
+            self.reconnects += 1
+            logger.info("Pub/sub LISTEN reconnected")
+            # Other workers' messages sent meanwhile are gone
+            self._resync()
+
+    async def start(self):
+        await super().start()
+        self._lock = asyncio.Lock()
+        self._lost = asyncio.Event()
+        await self._connect()
+        self._task = asyncio.create_task(self._keep_connected())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._close()
+        await super().stop()
+
+    def _on_notify(self, conn, pid, notify_channel, payload):
+        envelope = json.loads(payload)
+        self._deliver(envelope["channel"], envelope["message"])
+
+    async def publish(self, channel: str, message):
+        if not self.shared:
+            self._deliver(channel, message)
+            return
+        payload = json.dumps({"channel": channel, "message": message})
+        try:
+            # Our own LISTEN delivers it back to local subscribers
+            async with self._lock:
+                await self._conn.execute(
+                    "SELECT pg_notify($1, $2)", PG_NOTIFY_CHANNEL, payload, timeout=PUBSUB_PUBLISH_TIMEOUT_SECONDS
+                )
+        except Exception as e:
+            # Callers publish after committing; never turn that into an error
+            self.publish_failures += 1
+            logger.warning("Pub/sub NOTIFY failed, delivering in-process only: %s", e)
+            self._lost.set()
+            self._deliver(channel, message)
+
+    def stats(self):
+        return {
+            **super().stats(),
+            "connected": int(self.shared),
+            "reconnects": self.reconnects,
+            "publish_failures": self.publish_failures,
+        }
+
+
+def create_broker():
+    if PUBSUB_BACKEND == "postgres":
+        from db import DATABASE_URL
+        return PostgresBroker(DATABASE_URL)
+    if PUBSUB_BACKEND != "memory":
+        raise ValueError(f"Unknown PUBSUB_BACKEND: {PUBSUB_BACKEND}")
+    return MemoryBroker()
+
+
+broker = create_broker()
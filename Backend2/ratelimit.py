@@ -0,0 +1,321 @@
+"""
+Rate limiting and admission control for /auth/login and POST /appointments/.
+
+Rate limits are token buckets. A limit "N/S" allows a burst of N requests
+per key and refills at N per S seconds; "0" turns it off. Each endpoint is
+limited per client IP and per account, and a request over a limit gets 429
+with Retry-After. Booking retries answered from a stored Idempotency-Key
+outcome (appointments/idempotency.py) do not count.
+
+    RATE_LIMIT_ENABLED            default true
+    RATE_LIMIT_BACKEND            memory (default) buckets in this process only
+                                  database  buckets in the rate_limit_buckets table,
+                                            shared by every worker on the primary
+    RATE_LIMIT_MAX_KEYS           memory backend: buckets kept, LRU (default 100000)
+    LOGIN_RATE_LIMIT_PER_IP       default 30/60
+    LOGIN_RATE_LIMIT_PER_ACCOUNT  default 10/60 (keyed by the submitted email)
+    BOOKING_RATE_LIMIT_PER_IP     default 60/60
+    BOOKING_RATE_LIMIT_PER_USER   default 20/60
+
+With the memory backend and serve.py every worker has its own buckets, so a
+client can get up to N times the limit across N workers.
+
+Admission control bounds queued work instead of request rates: an
+AdmissionLimiter lets max_concurrent callers run, up to max_queue more wait
+at most timeout seconds, and the rest get Overloaded at once (503), so
+latency stays bounded when the server is saturated. The hashing pool
+(auth/hashing.py) applies the same rule with HASH_MAX_QUEUE.
+
+    BOOKING_MAX_CONCURRENCY        booking transactions at once
+                                   (default DB_POOL_SIZE + DB_MAX_OVERFLOW, 0 = no limit)
+    BOOKING_MAX_QUEUE              bookings waiting for a turn (default 100)
+    BOOKING_QUEUE_TIMEOUT_SECONDS  longest wait for a turn (default 2)
+"""
+from collections import Counter, OrderedDict
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+
+from fastapi import HTTPException, Request, status
+from starlette.concurrency import run_in_threadpool
+
+from db_pool import DB_POOL_SIZE, DB_MAX_OVERFLOW
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+# Database backend: drop full buckets of a limit every this many takes
+RATE_LIMIT_PRUNE_EVERY = 1000
+
+BOOKING_MAX_CONCURRENCY = int(os.getenv("BOOKING_MAX_CONCURRENCY", DB_POOL_SIZE + DB_MAX_OVERFLOW))
+BOOKING_MAX_QUEUE = int(os.getenv("BOOKING_MAX_QUEUE", 100))
+BOOKING_QUEUE_TIMEOUT_SECONDS = float(os.getenv("BOOKING_QUEUE_TIMEOUT_SECONDS", 2))
+
+
+class Overloaded(Exception):
+    """Raised when admission control sheds work instead of queueing it"""
+
+
+# ========================================
+# Token buckets
+# ========================================
+class Limit:
+    """A burst of `burst` requests, refilled at `rate` per second"""
+
+    def __init__(self, name: str, requests: int, seconds: float):
+        self.name = name
+        self.burst = requests
+        self.rate = requests / seconds if seconds else 0.0
+
+    @classmethod
+    def parse(cls, name: str, spec: str):
+        """Limit from "N/S" (N requests per S seconds)"""
+        requests, _, seconds = spec.partition("/")
+        return cls(name, int(requests), float(seconds or 1))
+
+    @property
+    def enabled(self) -> bool:
+        return self.burst > 0 and self.rate > 0
+
+    @property
+    def refill_seconds(self) -> float:
+        """Time for an empty bucket to fill up again"""
+        return self.burst / self.rate
+
+
+class MemoryBackend:
+    """Buckets in this process, least recently used dropped past max_keys"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()    # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: Limit, cost: float = 1.0):
+        """Return (allowed, retry_after_seconds)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (limit.burst, now))
+            tokens = min(limit.burst, tokens + (now - updated_at) * limit.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / limit.rate
+
+    async def acquire(self, key: str, limit: Limit):
+        return self.take(key, limit)
+
+    def stats(self):
+        with self._lock:
+            return {"buckets": len(self._buckets)}
+
+
+class DatabaseBackend:
+    """
+    Buckets in the rate_limit_buckets table on the primary.
+
+    Refill and take are one INSERT ... ON CONFLICT DO UPDATE ... WHERE
+    statement, so concurrent workers never both spend the last token.
+    Buckets idle long enough to be full again are pruned now and then.
+    """
+
+    def __init__(self):
+        self._takes = Counter()
+
+    def _upsert(self, engine):
+        if engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        return insert
+
+    def take(self, key: str, limit: Limit, cost: float = 1.0):
+        from sqlalchemy import case, delete, select
+        from db import engine
+        from models import RateLimitBucket
+
+        table = RateLimitBucket.__table__
+        now = time.time()
+        refilled = table.c.tokens + (now - table.c.updated_at) * limit.rate
+        refilled = case((refilled > limit.burst, limit.burst), else_=refilled)
+        insert = self._upsert(engine)(table).values(bucket_key=key, tokens=limit.burst - cost, updated_at=now)
+        statement = insert.on_conflict_do_update(
+            index_elements=[table.c.bucket_key],
+            set_={"tokens": refilled - cost, "updated_at": now},
+            where=refilled >= cost,
+        ).returning(table.c.tokens)
+
+        with engine.begin() as conn:
+            allowed = conn.execute(statement).first() is not None
+            if not allowed:
+                tokens, updated_at = conn.execute(
+                    select(table.c.tokens, table.c.updated_at).where(table.c.bucket_key == key)
+                ).one()
+            self._takes[limit.name] += 1
+            if self._takes[limit.name] % RATE_LIMIT_PRUNE_EVERY == 0:
+                conn.execute(delete(table).where(
+                    table.c.bucket_key.startswith(f"{limit.name}:"),
+                    table.c.updated_at < now - limit.refill_seconds,
+                ))
+        if allowed:
+            return True, 0.0
+        tokens = min(limit.burst, tokens + (now - updated_at) * limit.rate)
+        return False, max(cost - tokens, 0.0) / limit.rate
+
+    async def acquire(self, key: str, limit: Limit):
+        return await run_in_threadpool(self.take, key, limit)
+
+    def stats(self):
+        return {}
+
+
+BACKENDS = {"memory": MemoryBackend, "database": DatabaseBackend}
+
+
+class RateLimiter:
+    def __init__(self, backend, enabled: bool = RATE_LIMIT_ENABLED):
+        self.backend = backend
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.allowed = Counter()
+        self.denied = Counter()
+        self.errors = 0
+
+    async def hit(self, limit: Limit, key) -> float:
+        """Take a token for key; returns 0 if allowed, else seconds until a retry can succeed"""
+        if not self.enabled or not limit.enabled:
+            return 0.0
+        try:
+            allowed, retry_after = await self.backend.acquire(f"{limit.name}:{key}", limit)
+        except Exception as e:
+            # A broken shared backend must not take logins and bookings down with it
+            logger.warning("Rate limit backend failed, allowing request: %s", e)
+            with self._lock:
+                self.errors += 1
+            return 0.0
+        with self._lock:
+            (self.allowed if allowed else self.denied)[limit.name] += 1
+        return 0.0 if allowed else max(retry_after, 0.001)
+
+    def stats(self):
+        with self._lock:
+            limits = sorted(set(self.allowed) | set(self.denied))
+            return {
+                "limits": {name: {"allowed": self.allowed[name], "denied": self.denied[name]} for name in limits},
+                "errors": self.errors,
+                **self.backend.stats(),
+            }
+
+
+def create_rate_limiter():
+    if RATE_LIMIT_BACKEND not in BACKENDS:
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {RATE_LIMIT_BACKEND}")
+    return RateLimiter(BACKENDS[RATE_LIMIT_BACKEND]())
+
+
+rate_limiter = create_rate_limiter()
+
+LOGIN_PER_IP = Limit.parse("login_ip", os.getenv("LOGIN_RATE_LIMIT_PER_IP", "30/60"))
+LOGIN_PER_ACCOUNT = Limit.parse("login_account", os.getenv("LOGIN_RATE_LIMIT_PER_ACCOUNT", "10/60"))
+BOOKING_PER_IP = Limit.parse("booking_ip", os.getenv("BOOKING_RATE_LIMIT_PER_IP", "60/60"))
+BOOKING_PER_USER = Limit.parse("booking_user", os.getenv("BOOKING_RATE_LIMIT_PER_USER", "20/60"))
+
+
+def client_ip(request: Request) -> str:
+    """Peer address; serve.py trusts X-Forwarded-For from --forwarded-allow-ips"""
+    return request.client.host if request.client else "unknown"
+
+
+async def enforce(limit: Limit, key):
+    """Raise 429 when key is over limit"""
+    retry_after = await rate_limiter.hit(limit, key)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please retry later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+def busy_exception():
+    """503 for requests shed by admission control"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+
+# ========================================
+# Admission control
+# ========================================
+class AdmissionLimiter:
+    """
+    `async with limiter:` runs the block once one of max_concurrent turns is
+    free. Raises Overloaded when max_queue callers are already waiting or no
+    turn frees up within timeout. Counters are per event loop (per worker).
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent) if max_concurrent > 0 else None
+        self.running = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    async def __aenter__(self):
+        if self._semaphore is None:
+            return self
+        if not self._semaphore.locked():
+            # A free turn is taken without suspending
+            await self._semaphore.acquire()
+        elif self.queued >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(f"{self.name} queue full")
+        else:
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise Overloaded(f"{self.name} queue wait over {self.timeout}s")
+            finally:
+                self.queued -= 1
+        self.running += 1
+        self.admitted += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._semaphore is not None:
+            self.running -= 1
+            self._semaphore.release()
+
+    def stats(self):
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+
+booking_admission = AdmissionLimiter(
+    "booking", BOOKING_MAX_CONCURRENCY, BOOKING_MAX_QUEUE, BOOKING_QUEUE_TIMEOUT_SECONDS
+)
@@ -0,0 +1,40 @@
+"""
+Per-request counters filled in by the code being measured.
+
+profiling.py (PROFILING_ENABLED=true) sets a RequestStats for every request.
+Without it nothing is set and record_hashing() / note_thread() do nothing,
+so code on the request path calls them without importing the profiler.
+"""
+from contextvars import ContextVar
+import os
+import threading
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+class RequestStats:
+    __slots__ = ("sql_statements", "sql_seconds", "hash_seconds", "threads")
+
+    def __init__(self):
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.hash_seconds = 0.0
+        self.threads = None      # idents of the threads working for a profiled request
+
+
+# Set per request by the middleware. Threadpool and run_sync workers run in a
+# copy of the request context, so they update the same RequestStats object.
+current_stats = ContextVar("request_stats", default=None)
+
+
+def record_hashing(seconds: float):
+    stats = current_stats.get()
+    if stats is not None:
+        stats.hash_seconds += seconds
+
+
+def note_thread():
+    """Mark the calling thread as working for the current request if it is being profiled"""
+    stats = current_stats.get()
+    if stats is not None and stats.threads is not None:
+        stats.threads.add(threading.get_ident())
@@ -0,0 +1,283 @@
+"""
+Production launcher: N pre-forked uvicorn workers sharing one socket.
+
+    PUBSUB_BACKEND=postgres python serve.py --workers 4 --port 8000
+
+The app is imported once here and the workers are forked from it, so they
+share its memory pages and boot without re-importing. Each worker drops
+the inherited database pools (db.reset_after_fork) and runs its own event
+loop, lifespan and caches. With --no-preload every worker imports the app
+itself, so a rolling restart also picks up new code.
+
+Signals to the launcher:
+
+    SIGTERM, SIGINT   graceful stop; workers finish in-flight requests
+                      for up to --graceful-timeout seconds
+    SIGHUP            rolling restart: start a new worker, wait until it
+                      is serving, then stop an old one, until all are new
+    SIGTTIN, SIGTTOU  one more / one fewer worker
+
+Workers whose heartbeat stops for --timeout seconds are killed and
+replaced. GET /health/workers on any worker lists all of them.
+
+Each worker caches slots and the doctor directory in its own memory and
+tells the others about changes through the pub/sub broker
+(doctors/invalidation.py). Only PUBSUB_BACKEND=postgres reaches other
+processes, so without it the launcher refuses to run more than one
+worker, and a worker whose LISTEN connection fails does not start.
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+
+import env  # noqa: F401  (.env before any module reads its settings)
+import workers
+
+TICK_SECONDS = 0.2
+# Give up if this many workers in a row die before serving (bad config, import error)
+MAX_BOOT_FAILURES = 5
+
+
+def caches_shared() -> bool:
+    """Whether cache invalidations reach every worker (see pubsub.py)"""
+    return os.getenv("PUBSUB_BACKEND", "memory").lower() == "postgres"
+
+
+def default_workers() -> int:
+    return int(os.getenv("WEB_CONCURRENCY", (os.cpu_count() or 1) if caches_shared() else 1))
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Worker:
+    def __init__(self, pid: int, slot: int, generation: int):
+        self.pid = pid
+        self.slot = slot
+        self.generation = generation
+        self.spawned_at = time.monotonic()
+        self.stop_deadline = None    # set once asked to stop
+
+    @property
+    def stopping(self) -> bool:
+        return self.stop_deadline is not None
+
+    @property
+    def ready(self) -> bool:
+        return workers.heartbeat_age(self.slot) is not None
+
+
+class Arbiter:
+    def __init__(self, app, sock, args):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.target = args.workers
+        self.generation = 0
+        self.workers = {}
+        self.shutting_down = False
+        self.boot_failures = 0
+        self._signals = []
+
+    # ---------- signals ----------
+    def install_signals(self):
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(sig, lambda signum, frame: self._signals.append(signum))
+
+    def handle_signals(self):
+        while self._signals:
+            sig = self._signals.pop(0)
+            if sig in (signal.SIGTERM, signal.SIGINT) and not self.shutting_down:
+                print(f"🛑 Stopping {len(self.workers)} workers")
+                self.shutting_down = True
+                for worker in list(self.workers.values()):
+                    self.stop(worker)
+            elif sig == signal.SIGHUP and not self.shutting_down:
+                self.generation += 1
+                print(f"🔄 Rolling restart to generation {self.generation}")
+            elif sig == signal.SIGTTIN and not caches_shared():
+                print("⚠️ More than one worker needs PUBSUB_BACKEND=postgres; not scaling")
+            elif sig == signal.SIGTTIN:
+                self.target += 1
+                print(f"➕ Scaling to {self.target} workers")
+            elif sig == signal.SIGTTOU and self.target > 1:
+                self.target -= 1
+                print(f"➖ Scaling to {self.target} workers")
+
+    # ---------- workers ----------
+    def spawn(self):
+        slot = workers.free_slot()
+        # Reserve the slot before forking so the next spawn cannot pick it
+        workers.reserve(slot)
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self.run_worker(slot)
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except BaseException as e:
+                print(f"❌ Worker {os.getpid()} failed: {e!r}", file=sys.stderr)
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = Worker(pid, slot, self.generation)
+
+    def run_worker(self, slot: int):
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(sig, signal.SIG_DFL)
+        workers.claim(slot, self.generation)
+
+        import uvicorn
+        import db
+
+        db.reset_after_fork()
+        config = uvicorn.Config(
+            self.app or "main:app",
+            log_level=self.args.log_level,
+            timeout_graceful_shutdown=self.args.graceful_timeout,
+            proxy_headers=True,
+            forwarded_allow_ips=self.args.forwarded_allow_ips,
+        )
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def stop(self, worker: Worker, sig=signal.SIGTERM):
+        if worker.stopping and sig == signal.SIGTERM:
+            return
+        worker.stop_deadline = time.monotonic() + self.args.graceful_timeout
+        try:
+            os.kill(worker.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            workers.release(worker.slot)
+            if worker.stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if worker.ready:
+                self.boot_failures = 0
+                print(f"💥 Worker {pid} exited unexpectedly ({code}); replacing it")
+            else:
+                self.boot_failures += 1
+                print(f"💥 Worker {pid} exited before serving ({code})")
+
+    def check_health(self):
+        now = time.monotonic()
+        for worker in list(self.workers.values()):
+            if worker.stopping:
+                if now > worker.stop_deadline:
+                    print(f"⏱️ Worker {worker.pid} did not stop in time; killing it")
+                    os.kill(worker.pid, signal.SIGKILL)
+                    worker.stop_deadline = float("inf")
+                continue
+            age = workers.heartbeat_age(worker.slot)
+            stuck = age > self.args.timeout if age is not None else now - worker.spawned_at > self.args.timeout
+            if stuck:
+                print(f"⚠️ Worker {worker.pid} missed its heartbeat; killing it")
+                self.stop(worker, signal.SIGKILL)
+            elif age is not None:
+                self.boot_failures = 0
+
+    def maintain(self):
+        """Converge on `target` ready workers of the current generation"""
+        active = [w for w in self.workers.values() if not w.stopping]
+        current = [w for w in active if w.generation == self.generation]
+        old = [w for w in active if w.generation != self.generation]
+
+        if old:
+            # Rolling restart: one new worker at a time, each replacing an old one once it serves
+            starting = [w for w in current if not w.ready]
+            ready = [w for w in current if w.ready]
+            if len(ready) + len(old) > self.target:
+                self.stop(min(old, key=lambda w: w.spawned_at))
+            elif not starting and len(current) < self.target:
+                self.spawn()
+            return
+
+        for _ in range(self.target - len(current)):
+            self.spawn()
+        for worker in sorted(current, key=lambda w: w.spawned_at)[self.target:]:
+            self.stop(worker)
+
+    def run(self):
+        self.install_signals()
+        print(f"🚀 Serving on {self.args.host}:{self.args.port} with {self.target} workers (pid {os.getpid()})")
+        while True:
+            self.handle_signals()
+            self.reap()
+            if self.shutting_down:
+                if not self.workers:
+                    print("✅ All workers stopped")
+                    return 0
+            else:
+                if self.boot_failures >= MAX_BOOT_FAILURES:
+                    print(f"❌ {MAX_BOOT_FAILURES} workers in a row failed to start; giving up")
+                    self._signals.append(signal.SIGTERM)
+                    self.handle_signals()
+                    continue
+                self.maintain()
+            self.check_health()
+            time.sleep(TICK_SECONDS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=default_workers(), help="default: WEB_CONCURRENCY, else CPU count (1 without PUBSUB_BACKEND=postgres)")
+    parser.add_argument("--no-preload", dest="preload", action="store_false",
+                        help="import the app in each worker instead of once before forking")
+    parser.add_argument("--graceful-timeout", type=int, default=30)
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds without a heartbeat before a worker is killed")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--forwarded-allow-ips", default=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"))
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    if args.workers > 1 and not caches_shared():
+        parser.error("--workers > 1 needs PUBSUB_BACKEND=postgres so every worker's caches see each change")
+    # Launcher messages should show up promptly under process managers
+    sys.stdout.reconfigure(line_buffering=True)
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+    workers.create_table()
+
+    # Create the schema once here rather than in every worker's lifespan
+    if os.getenv("DB_CREATE_SCHEMA", "false").lower() in ("1", "true", "yes"):
+        import db
+        import migrations
+
+        migrations.create_schema(db.engine)
+        db.engine.dispose()
+        os.environ["DB_CREATE_SCHEMA"] = "false"
+
+    app = None
+    if args.preload:
+        import main as application
+        application.DB_CREATE_SCHEMA = False
+        app = application.app
+
+    sys.exit(Arbiter(app, sock, args).run())
+
+
+if __name__ == "__main__":
+    main()
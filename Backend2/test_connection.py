@@ -1,8 +1,10 @@
 from db import engine
+from db_pool import pool_status
 
 try:
     conn = engine.connect()
-    print("✅ Connected to MySQL!")
+    print(f"✅ Connected to {engine.dialect.name}!")
     conn.close()
+    print("Pool:", pool_status(engine))
 except Exception as e:
     print("❌ Connection failed:", e)
@@ -0,0 +1,74 @@
+"""
+Shared fixtures.
+
+db.py and the other modules read their configuration from the environment
+when they are imported, so it is set here first: a throwaway SQLite file
+with the schema created by the app's lifespan, and no rate limits.
+"""
+import os
+import sys
+import tempfile
+from datetime import date, time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEST_DIR = tempfile.mkdtemp(prefix="healthtrack-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DIR}/app.db"
+os.environ["DB_CREATE_SCHEMA"] = "true"
+os.environ["DB_ASYNC"] = "false"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+def login(client, email: str, role: str = "PATIENT") -> dict:
+    """Register (if needed) and log in; returns Authorization headers"""
+    client.post("/auth/register", json={"name": email.split("@")[0], "email": email, "password": "pw", "role": role})
+    response = client.post("/auth/login", data={"username": email, "password": "pw"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    return login(client, "admin@example.com", "ADMIN")
+
+
+@pytest.fixture
+def db_session(client):
+    from db import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def add_doctor(db, name: str, **fields):
+    from models import Doctor
+
+    doctor = Doctor(name=name, email=f"{name.lower().replace(' ', '.')}@example.com",
+                    specialty=fields.pop("specialty", "General"), duration_minutes=30, **fields)
+    db.add(doctor)
+    db.commit()
+    return doctor
+
+
+def add_appointment(db, doctor_id: int, patient_id: int, day: date, clock: time, status: str = "PENDING"):
+    from models import Appointment
+
+    appointment = Appointment(doctor_id=doctor_id, patient_id=patient_id, date=day, time=clock, status=status)
+    db.add(appointment)
+    db.commit()
+    return appointment
@@ -0,0 +1,73 @@
+"""The appointment listings must issue the same number of statements for 1 or N rows"""
+from contextlib import contextmanager
+from datetime import date, time, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from conftest import add_appointment, add_doctor, login
+import db
+from models import User
+
+EXTRA_APPOINTMENTS = 25
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+
+def statements_for(client, url, headers):
+    # Warm the principal cache so only the listing itself is measured
+    assert client.get(url, headers=headers).status_code == 200
+    with count_statements() as statements:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.text
+    return len(statements), len(response.json())
+
+
+@pytest.fixture
+def patient(client, db_session):
+    headers = login(client, "listing.patient@example.com")
+    user = db_session.query(User).filter(User.email == "listing.patient@example.com").one()
+    return user.id, headers
+
+
+def test_listing_statement_count_does_not_grow_with_rows(client, db_session, admin_headers, patient):
+    patient_id, patient_headers = patient
+    first_doctor = add_doctor(db_session, "Listing Doctor")
+    day = date.today() + timedelta(days=3)
+    add_appointment(db_session, first_doctor.id, patient_id, day, time(9, 0))
+
+    urls = [
+        ("/appointments/me", patient_headers),
+        (f"/appointments/doctor/{first_doctor.id}", {}),
+        ("/appointments/all", admin_headers),
+    ]
+    before = {url: statements_for(client, url, headers) for url, headers in urls}
+    assert all(count >= 1 for count, _ in before.values())
+
+    # Every extra appointment has its own doctor and patient, so lazy loading would show
+    for i in range(EXTRA_APPOINTMENTS):
+        doctor = add_doctor(db_session, f"Listing Doctor {i}")
+        other = User(name=f"Listing Patient {i}", email=f"listing.{i}@example.com")
+        db_session.add(other)
+        db_session.commit()
+        slot = time(10 + i // 4, (i % 4) * 15)
+        add_appointment(db_session, doctor.id, other.id, day, slot)
+        add_appointment(db_session, doctor.id, patient_id, day + timedelta(days=1), slot)
+        add_appointment(db_session, first_doctor.id, other.id, day + timedelta(days=2), slot)
+
+    for url, headers in urls:
+        count, rows = statements_for(client, url, headers)
+        assert rows > before[url][1], url
+        assert count == before[url][0], f"{url}: {before[url][0]} statements for 1 row, {count} for {rows}"
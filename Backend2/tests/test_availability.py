@@ -0,0 +1,46 @@
+"""Materialising availability on a read cannot race a schedule change into stale rows"""
+import threading
+import time as clock
+from datetime import date, time, timedelta
+
+from conftest import add_doctor
+from doctors import availability
+from models import DoctorSchedule
+
+
+def test_schedule_change_during_materialisation_wins(db_session, monkeypatch):
+    from db import SessionLocal
+
+    doctor = add_doctor(db_session, "Racing Build")
+    day = date.today() + timedelta(days=3)
+    weekday = availability.WEEKDAYS[day.weekday()]
+    db_session.add(DoctorSchedule(doctor_id=doctor.id, day=weekday, start_time=time(9), end_time=time(10)))
+    db_session.commit()
+
+    def change_schedule():
+        with SessionLocal() as admin:
+            schedule = admin.query(DoctorSchedule).filter(DoctorSchedule.doctor_id == doctor.id).one()
+            schedule.end_time = time(12)
+            admin.flush()
+            availability.refresh_weekday(admin, doctor.id, weekday)
+            admin.commit()
+
+    # The admin's change lands after the reader read the weekly schedule
+    # and before it wrote the rows built from it
+    chunks = availability._chunks
+    admin = threading.Thread(target=change_schedule)
+
+    def chunks_then_change(*args, **kwargs):
+        if not admin.is_alive() and admin.ident is None:
+            admin.start()
+            clock.sleep(0.3)
+        return chunks(*args, **kwargs)
+
+    monkeypatch.setattr(availability, "_chunks", chunks_then_change)
+    with SessionLocal() as reader:
+        availability.ensure_materialised(reader, doctor.id, day, day)
+    admin.join(10)
+    monkeypatch.setattr(availability, "_chunks", chunks)
+
+    with SessionLocal() as session:
+        assert availability.load_intervals(session, doctor.id, day, day) == {day: [(time(9), time(12))]}
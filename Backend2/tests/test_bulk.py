@@ -0,0 +1,77 @@
+"""Bulk import: JSON arrays are decoded element by element; constraint races give a 409 report"""
+import io
+import json
+
+import pytest
+
+from doctors import bulk
+
+
+def doctor_record(i: int, **fields):
+    return {"name": f"Bulk {i}", "email": f"bulk{i}@example.com", "specialty": "General", **fields}
+
+
+def test_json_array_is_read_in_chunks(monkeypatch):
+    monkeypatch.setattr(bulk, "JSON_CHUNK_SIZE", 7)
+    records = [doctor_record(i, bio="x" * i) for i in range(30)] + [[], 5, "s"]
+    stream = io.StringIO(" [\n" + ",\n".join(json.dumps(r) for r in records) + "\n] \n")
+    assert list(bulk.iter_json_array(stream)) == records
+    assert list(bulk.iter_json_array(io.StringIO("[ ]"))) == []
+
+
+@pytest.mark.parametrize("body, message", [
+    ('{"name": "x"}', "must be an array"),
+    ('[{"name": "x"} {"name": "y"}]', "expected ','"),
+    ('[{"name": "x"},]', "Invalid JSON"),
+    ('[{"name": "x"}', "unexpected end"),
+    ('[{"name": "x"}] []', "extra data"),
+    ('[{"name": "x', "Invalid JSON"),
+])
+def test_malformed_json_is_rejected(body, message):
+    with pytest.raises(bulk.BulkImportError, match=message):
+        list(bulk.iter_json_array(io.StringIO(body)))
+
+
+def test_oversized_json_element_is_rejected(monkeypatch):
+    monkeypatch.setattr(bulk, "MAX_JSON_RECORD_SIZE", 100)
+    with pytest.raises(bulk.BulkImportError, match="under 100 characters"):
+        list(bulk.iter_json_array(io.StringIO(json.dumps([{"bio": "x" * 200 * 1024}]))))
+
+
+def test_rows_written_meanwhile_give_a_conflict_report(client, admin_headers, monkeypatch):
+    from db import SessionLocal
+    from models import Doctor
+
+    insert = bulk.insert
+
+    def insert_after_a_racing_writer(model):
+        # Another request commits the same email between the check and the insert
+        with SessionLocal() as other:
+            other.add(Doctor(**doctor_record(1001)))
+            other.commit()
+        return insert(model)
+
+    monkeypatch.setattr(bulk, "insert", insert_after_a_racing_writer)
+    response = client.post(
+        "/doctors/bulk", headers={**admin_headers, "Content-Type": "application/json"},
+        content=json.dumps([doctor_record(1000), doctor_record(1001)])
+    )
+    assert response.status_code == 409, response.text
+    report = response.json()["detail"]
+    assert report["committed"] is False and report["inserted"] == 0
+    assert report["errors"][0]["row"] == 1
+
+    with SessionLocal() as session:
+        assert session.query(Doctor).filter(Doctor.email == "bulk1000@example.com").count() == 0
+
+
+def test_json_import_reports_each_row(client, admin_headers, monkeypatch):
+    monkeypatch.setattr(bulk, "JSON_CHUNK_SIZE", 16)
+    response = client.post(
+        "/doctors/bulk", headers={**admin_headers, "Content-Type": "application/json"},
+        content=json.dumps([doctor_record(2000), {"name": "no email"}, doctor_record(2001)])
+    )
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert (report["rows"], report["inserted"], report["failed"]) == (3, 2, 1)
+    assert report["errors"][0]["row"] == 2
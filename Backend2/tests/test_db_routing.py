@@ -0,0 +1,130 @@
+"""Read replica routing against separate primary and replica SQLite files"""
+from datetime import date, time, timedelta
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+import db
+from db_routing import routing_session_class
+from models import Appointment, DayOfWeek, Doctor, DoctorSchedule, User
+
+
+@pytest.fixture
+def engines(tmp_path):
+    """Primary and two replicas, each holding a doctor named after its database"""
+    created = {}
+    for name in ("primary", "replica_a", "replica_b"):
+        engine = db.make_engine(f"sqlite:///{tmp_path}/{name}.db")
+        db.Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(Doctor.__table__.insert(), {"id": 1, "name": name, "email": f"{name}@example.com"})
+        created[name] = engine
+    yield created
+    for engine in created.values():
+        engine.dispose()
+
+
+@pytest.fixture
+def make_session(engines):
+    return sessionmaker(
+        class_=routing_session_class(engines["primary"], [engines["replica_a"]]),
+        autoflush=False, expire_on_commit=False
+    )
+
+
+def doctor_names(session):
+    return sorted(name for (name,) in session.query(Doctor.name))
+
+
+def test_reads_go_to_the_replica(make_session):
+    with make_session() as session:
+        assert doctor_names(session) == ["replica_a"]
+        assert session.execute(text("SELECT name FROM doctors")).scalar() == "replica_a"
+        assert not session.pinned
+
+
+def test_writes_and_later_reads_go_to_the_primary(make_session, engines):
+    with make_session() as session:
+        assert doctor_names(session) == ["replica_a"]
+        session.add(Doctor(name="new", email="new@example.com"))
+        session.commit()
+        assert session.pinned
+        # Read-your-writes: the rest of the session reads the primary
+        assert doctor_names(session) == ["new", "primary"]
+
+    with engines["replica_a"].connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM doctors")).scalar() == 1
+
+
+def test_pin_ends_with_the_session(make_session):
+    with make_session() as session:
+        session.execute(text("UPDATE doctors SET bio = 'x'"))
+        session.commit()
+        assert doctor_names(session) == ["primary"]
+
+    # The pin lasts for one session (one request); the next one reads the replica again
+    with make_session() as session:
+        assert not session.pinned
+        assert doctor_names(session) == ["replica_a"]
+
+
+def test_locking_reads_and_use_primary_go_to_the_primary(make_session):
+    with make_session() as session:
+        assert session.query(Doctor.name).with_for_update().scalar() == "primary"
+        assert session.pinned
+
+    with make_session() as session:
+        session.use_primary()
+        assert doctor_names(session) == ["primary"]
+
+
+def test_round_robin_spreads_sessions_over_replicas(engines):
+    make_session = sessionmaker(class_=routing_session_class(
+        engines["primary"], [engines["replica_a"], engines["replica_b"]], policy="round_robin"
+    ))
+    seen = []
+    for _ in range(4):
+        with make_session() as session:
+            seen.append(doctor_names(session)[0])
+    assert seen == ["replica_a", "replica_b", "replica_a", "replica_b"]
+
+
+def test_unknown_policy_is_rejected(engines):
+    with pytest.raises(ValueError):
+        routing_session_class(engines["primary"], [engines["replica_a"]], policy="nearest")
+
+
+def test_cache_fills_read_the_primary_when_the_replica_lags(make_session, engines):
+    """A replica that missed a booking, a rename and a new user must not end up in the caches"""
+    from auth.utils import load_user
+    from doctors.router import list_doctors
+    from doctors.availability import ensure_materialised
+    from doctors.slots import SlotIndex
+
+    day = date.today() + timedelta(days=7)
+    for name in ("primary", "replica_a"):
+        with engines[name].begin() as conn:
+            conn.execute(DoctorSchedule.__table__.insert(), {
+                "doctor_id": 1, "day": list(DayOfWeek)[day.weekday()],
+                "start_time": time(9), "end_time": time(11),
+            })
+        # Materialised on both sides, so loading slots needs no write that would pin
+        with sessionmaker(bind=engines[name])() as session:
+            ensure_materialised(session, 1, day, day)
+    with engines["primary"].begin() as conn:
+        conn.execute(User.__table__.insert(), {"id": 7, "name": "new", "email": "new@example.com"})
+        conn.execute(Appointment.__table__.insert(), {
+            "doctor_id": 1, "patient_id": 7, "date": day, "time": time(9), "status": "PENDING",
+        })
+
+    with make_session() as session:
+        doctor = session.get(Doctor, 1)
+        assert doctor.name == "replica_a"
+        assert SlotIndex().get_free_slots(session, doctor, day, day) == [(day, time(10))]
+
+    with make_session() as session:
+        assert [d["name"] for d in list_doctors(session)] == ["primary"]
+
+    with make_session() as session:
+        assert load_user(session, 7).email == "new@example.com"
@@ -0,0 +1,29 @@
+"""Settings in .env reach modules that read them at import time"""
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SETTINGS = ("DATABASE_URL", "DATABASE_REPLICA_URLS", "DB_POOL_SIZE", "DB_REPLICA_POLICY")
+
+
+def test_env_file_configures_pool_and_replica_policy(tmp_path):
+    env_file = tmp_path / ".env"
+    env_file.write_text(
+        f"DATABASE_URL=sqlite:///{tmp_path}/primary.db\n"
+        f"DATABASE_REPLICA_URLS=sqlite:///{tmp_path}/replica.db\n"
+        "DB_POOL_SIZE=17\n"
+        "DB_REPLICA_POLICY=random\n"
+    )
+    environ = {name: value for name, value in os.environ.items() if name not in SETTINGS}
+    environ["ENV_FILE"] = str(env_file)
+
+    # A fresh interpreter, since this one imported db with the test settings
+    script = (
+        "import db, db_routing; "
+        "print(db.engine.pool.size(), type(db.SessionLocal.class_.choose_replica).__name__)"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=BACKEND, env=environ,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["17", "Random"]
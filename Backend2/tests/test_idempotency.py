@@ -0,0 +1,57 @@
+"""Concurrent retries of one booking with the same Idempotency-Key book it once"""
+import asyncio
+from datetime import date, time, timedelta
+
+import httpx
+
+from conftest import add_doctor, login
+from appointments.idempotency import idempotency_store
+import main
+from models import Appointment
+
+RETRIES = 10
+
+
+def post_concurrently(requests):
+    async def send_all():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as http:
+            return await asyncio.gather(*(
+                http.post("/appointments/", json=body, headers=headers) for body, headers in requests
+            ))
+    return asyncio.run(send_all())
+
+
+def test_concurrent_retries_book_once(client, db_session):
+    headers = {**login(client, "idempotent.patient@example.com"), "Idempotency-Key": "retry-1"}
+    doctor = add_doctor(db_session, "Idempotent Doctor")
+    day = date.today() + timedelta(days=5)
+    body = {"doctor_id": doctor.id, "date": day.isoformat(), "time": "09:00"}
+
+    misses = idempotency_store.misses
+    responses = post_concurrently([(body, headers)] * RETRIES)
+    # Exactly one request ran the booking; the rest joined it or replayed its outcome
+    assert idempotency_store.misses == misses + 1
+
+    assert [r.status_code for r in responses] == [200] * RETRIES
+    assert len({r.content for r in responses}) == 1
+    replayed = [r.headers.get("Idempotent-Replayed") for r in responses]
+    assert replayed.count(None) == 1
+    assert replayed.count("true") == RETRIES - 1
+
+    rows = db_session.query(Appointment).filter(
+        Appointment.doctor_id == doctor.id, Appointment.date == day, Appointment.time == time(9, 0)
+    ).all()
+    assert len(rows) == 1
+    assert responses[0].json()["id"] == rows[0].id
+
+    # A later retry is answered from the store
+    again = client.post("/appointments/", json=body, headers=headers)
+    assert again.status_code == 200
+    assert again.headers.get("Idempotent-Replayed") == "true"
+    assert again.content == responses[0].content
+
+    # The same key with a different body is refused and books nothing
+    other = client.post("/appointments/", json={**body, "time": "10:00"}, headers=headers)
+    assert other.status_code == 422
+    assert db_session.query(Appointment).filter(Appointment.doctor_id == doctor.id).count() == 1
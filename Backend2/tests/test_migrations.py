@@ -0,0 +1,89 @@
+"""Migrations on a fresh database create the hot-path indexes, and SQLite's planner uses them"""
+from contextlib import contextmanager
+from datetime import date, time
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from db import Base
+import migrations
+from appointments.queries import list_appointments_page, list_doctor_appointments, list_patient_appointments
+from models import Appointment, DayOfWeek, DoctorSchedule
+
+DAY = date(2030, 1, 7)
+
+
+@pytest.fixture
+def fresh_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/fresh.db")
+    yield engine
+    engine.dispose()
+
+
+def migrate(engine):
+    Base.metadata.create_all(bind=engine)
+    return migrations.upgrade(engine)
+
+
+@contextmanager
+def captured(engine):
+    """Collect (statement, parameters) of everything run on engine"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def query_plan(engine, fn):
+    """EXPLAIN QUERY PLAN of the single statement fn(session) runs"""
+    with Session(engine) as session, captured(engine) as statements:
+        fn(session)
+    assert len(statements) == 1, statements
+    statement, parameters = statements[0]
+    with engine.connect() as conn:
+        return " | ".join(row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters))
+
+
+def booking_conflict_check(session):
+    # book_appointment's check for an active booking in the slot
+    return session.query(Appointment).filter(
+        Appointment.doctor_id == 1,
+        Appointment.date == DAY,
+        Appointment.time == time(9, 0),
+        Appointment.status != "CANCELLED"
+    ).first()
+
+
+def schedule_day_lookup(session):
+    # add_schedule's check for an existing window on the day
+    return session.query(DoctorSchedule).filter(
+        DoctorSchedule.doctor_id == 1,
+        DoctorSchedule.day == DayOfWeek.MONDAY
+    ).first()
+
+
+def test_migrations_apply_in_order(fresh_engine):
+    applied = migrate(fresh_engine)
+    assert [m.VERSION for m in applied] == sorted(m.VERSION for m in migrations.load_migrations())
+    # A second run has nothing left to do
+    assert migrate(fresh_engine) == []
+
+
+@pytest.mark.parametrize("fn, index", [
+    (booking_conflict_check, "uq_appointments_active_slot"),
+    (lambda session: list_doctor_appointments(session, 1), "uq_appointments_active_slot"),
+    (lambda session: list_patient_appointments(session, 2), "ix_appointments_patient_date_time"),
+    (lambda session: list_appointments_page(session, 100), "ix_appointments_date_time_id"),
+    (schedule_day_lookup, "ix_doctor_schedules_doctor_day"),
+])
+def test_hot_paths_use_new_indexes(fresh_engine, fn, index):
+    migrate(fresh_engine)
+    plan = query_plan(fresh_engine, fn)
+    assert f"USING INDEX {index}" in plan, plan
@@ -0,0 +1,33 @@
+"""Cached principals do not outlive a change to the user, in this worker or another"""
+from auth.principals import PRINCIPAL_CHANNEL, Principal, principal_cache
+from conftest import login
+from models import User, UserRole
+from pubsub import broker
+
+
+def test_load_that_raced_a_change_is_not_stored():
+    generation = principal_cache.generation(4242)
+    # The user is changed while their old row is being loaded
+    principal_cache.invalidate(4242)
+    principal_cache.store(4242, generation, Principal(4242, "old", "old@example.com", UserRole.ADMIN))
+    assert principal_cache.get(4242) is None
+
+
+def test_role_change_is_published_to_other_workers(client, db_session):
+    headers = login(client, "demoted@example.com", "ADMIN")
+    assert client.get("/admin/hashing", headers=headers).status_code == 200
+    user = db_session.query(User).filter(User.email == "demoted@example.com").one()
+    assert principal_cache.get(user.id).role == UserRole.ADMIN
+
+    with broker.subscribe(PRINCIPAL_CHANNEL) as subscription:
+        user.role = UserRole.PATIENT
+        db_session.commit()
+        message = client.portal.call(subscription.get, 2)
+    assert message["user_id"] == user.id
+    assert principal_cache.get(user.id) is None
+    assert client.get("/admin/hashing", headers=headers).status_code == 403
+
+    # Another worker's change reaches this worker's cache the same way
+    assert principal_cache.get(user.id) is not None
+    broker._deliver(PRINCIPAL_CHANNEL, {"user_id": user.id, "origin": -1})
+    assert principal_cache.get(user.id) is None
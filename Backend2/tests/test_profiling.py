@@ -0,0 +1,30 @@
+"""The request profiler samples only the threads working for the profiled request"""
+import threading
+import time
+
+from profiling import SamplingProfiler
+
+
+def spin(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profiler_samples_only_the_given_threads():
+    stop = threading.Event()
+    mine = threading.Thread(target=spin, args=(stop,), name="request-work")
+    other = threading.Thread(target=spin, args=(stop,), name="other-request")
+    mine.start()
+    other.start()
+    try:
+        profiler = SamplingProfiler(interval=0.001, threads={mine.ident})
+        profiler.start()
+        time.sleep(0.1)
+        stacks = profiler.stop()
+    finally:
+        stop.set()
+        mine.join()
+        other.join()
+
+    roots = {line.split(";")[0] for line in stacks.splitlines()}
+    assert roots == {"request-work"}
@@ -0,0 +1,114 @@
+"""PostgresBroker survives a lost LISTEN connection (no PostgreSQL needed: the connection is faked)"""
+import asyncio
+
+import pytest
+
+import pubsub
+
+
+class FakeConnection:
+    """The part of asyncpg.Connection the broker uses; NOTIFY echoes to our own LISTEN"""
+
+    def __init__(self):
+        self.closed = False
+        self.broken = False
+        self.listeners = {}
+        self.termination_listeners = []
+
+    async def add_listener(self, channel, callback):
+        self.listeners[channel] = callback
+
+    def add_termination_listener(self, callback):
+        self.termination_listeners.append(callback)
+
+    def is_closed(self):
+        return self.closed
+
+    async def execute(self, sql, channel, payload, timeout=None):
+        if self.closed or self.broken:
+            raise ConnectionError("connection is closed")
+        self.listeners[channel](self, 1, channel, payload)
+
+    async def close(self):
+        self.closed = True
+
+    def terminate(self):
+        self.closed = True
+
+    def drop(self):
+        """The server went away without us closing the connection"""
+        self.closed = True
+        for callback in self.termination_listeners:
+            callback(self)
+
+
+class FakeBroker(pubsub.PostgresBroker):
+    def __init__(self, connections):
+        super().__init__("postgresql://unused")
+        self.connections = list(connections)
+
+    async def _open(self):
+        connection = self.connections.pop(0)
+        if isinstance(connection, Exception):
+            raise connection
+        return connection
+
+
+@pytest.fixture(autouse=True)
+def fast_reconnect(monkeypatch):
+    monkeypatch.setattr(pubsub, "PUBSUB_RECONNECT_MIN_SECONDS", 0.01)
+
+
+async def wait_for(condition, timeout=2):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+def test_publish_on_a_dropped_connection_delivers_locally_and_reconnects():
+    async def scenario():
+        first, second = FakeConnection(), FakeConnection()
+        broker = FakeBroker([first, OSError("refused"), second])
+        received, resyncs = [], []
+        broker.on("cache", received.append)
+        broker.on_resync(lambda: resyncs.append(True))
+        await broker.start()
+        subscription = broker.subscribe("slots")
+
+        await broker.publish("cache", {"n": 1})
+        assert received == [{"n": 1}] and broker.shared
+
+        first.broken = True   # the socket died but asyncpg has not noticed yet
+        await broker.publish("cache", {"n": 2})
+        assert received == [{"n": 1}, {"n": 2}]
+        assert broker.publish_failures == 1
+
+        # Reconnects after one refused attempt, then resynchronises
+        await wait_for(lambda: broker.reconnects == 1)
+        assert broker.shared and resyncs == [True] and subscription.overflowed
+        await broker.publish("cache", {"n": 3})
+        assert received[-1] == {"n": 3}
+
+        second.drop()
+        broker.connections.append(FakeConnection())
+        await wait_for(lambda: broker.reconnects == 2)
+        assert resyncs == [True, True]
+
+        subscription.close()
+        await broker.stop()
+        assert not broker.shared
+
+    asyncio.run(scenario())
+
+
+def test_start_without_database_keeps_retrying():
+    async def scenario():
+        broker = FakeBroker([OSError("refused"), OSError("refused"), FakeConnection()])
+        await broker.start()
+        assert not broker.shared
+        await broker.publish("cache", {"n": 1})   # local only, no error
+        await wait_for(lambda: broker.shared)
+        await broker.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,22 @@
+"""Importing the app leaves the opt-in modules unimported"""
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OPT_IN = ("profiling", "migrations", "workers", "passlib", "doctors.bulk")
+
+
+def imported_after_main(tmp_path, **settings):
+    environ = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path}/app.db", "DB_CREATE_SCHEMA": "false",
+               "PROFILING_ENABLED": "false", **settings}
+    script = f"import sys, main; print(' '.join(m for m in {OPT_IN!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", script], cwd=BACKEND, env=environ,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.split()
+
+
+def test_opt_in_modules_load_only_when_enabled(tmp_path):
+    assert imported_after_main(tmp_path) == []
+    assert imported_after_main(tmp_path, PROFILING_ENABLED="true") == ["profiling"]
@@ -0,0 +1,128 @@
+"""
+Per-worker health shared between the processes started by serve.py.
+
+The launcher allocates a table of slots in shared memory before forking and
+gives each worker one slot. A worker writes only its own slot: a heartbeat
+every WORKER_HEARTBEAT_SECONDS, requests served and requests in flight. Any
+worker can therefore answer GET /health/workers for all of them, and the
+launcher restarts workers whose heartbeat stops.
+
+Without the launcher (plain `uvicorn main:app`) there is no table and
+status() returns an empty list.
+"""
+from multiprocessing.sharedctypes import RawArray
+import asyncio
+import ctypes
+import os
+import time
+
+WORKER_HEARTBEAT_SECONDS = float(os.getenv("WORKER_HEARTBEAT_SECONDS", 1))
+MAX_WORKER_SLOTS = 256
+
+
+class WorkerSlot(ctypes.Structure):
+    _fields_ = [
+        ("pid", ctypes.c_int),
+        ("generation", ctypes.c_int),
+        ("started_at", ctypes.c_double),
+        ("heartbeat_at", ctypes.c_double),
+        ("requests", ctypes.c_long),
+        ("in_flight", ctypes.c_int),
+    ]
+
+
+_table = None
+_slot = None
+
+
+def create_table():
+    """Allocate the shared slot table (launcher, before forking)"""
+    global _table
+    _table = RawArray(WorkerSlot, MAX_WORKER_SLOTS)
+    return _table
+
+
+def free_slot():
+    for index in range(MAX_WORKER_SLOTS):
+        if _table[index].pid == 0:
+            return index
+    raise RuntimeError("No free worker slot")
+
+
+def reserve(index: int):
+    """Hold slot index for a worker about to be forked (launcher)"""
+    _table[index].pid = -1
+    _table[index].heartbeat_at = 0.0
+
+
+def claim(index: int, generation: int):
+    """Take slot index for this process (worker, right after fork)"""
+    global _slot
+    _slot = _table[index]
+    _slot.pid = os.getpid()
+    _slot.generation = generation
+    _slot.started_at = time.time()
+    _slot.heartbeat_at = 0.0
+    _slot.requests = 0
+    _slot.in_flight = 0
+
+
+def release(index: int):
+    """Mark a slot free once its worker has exited (launcher)"""
+    _table[index].pid = 0
+
+
+def heartbeat_age(index: int):
+    """Seconds since the worker in slot index last beat, or None before its first beat"""
+    beat = _table[index].heartbeat_at
+    return time.time() - beat if beat else None
+
+
+async def heartbeat():
+    """Beat until cancelled; the first beat means the worker is serving"""
+    while True:
+        _slot.heartbeat_at = time.time()
+        await asyncio.sleep(WORKER_HEARTBEAT_SECONDS)
+
+
+def status():
+    if _table is None:
+        return []
+    now = time.time()
+    return [
+        {
+            "pid": slot.pid,
+            "generation": slot.generation,
+            "uptime_seconds": round(now - slot.started_at, 1),
+            "heartbeat_age_seconds": round(now - slot.heartbeat_at, 2) if slot.heartbeat_at else None,
+            "ready": bool(slot.heartbeat_at),
+            "requests": slot.requests,
+            "in_flight": slot.in_flight,
+            "current": slot.pid == os.getpid(),
+        }
+        for slot in _table
+        if slot.pid > 0
+    ]
+
+
+def enabled() -> bool:
+    return _slot is not None
+
+
+class RequestCounterMiddleware:
+    """Counts this worker's served and in-flight requests in its slot"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _slot is None:
+            await self.app(scope, receive, send)
+            return
+        # Single writer per slot, so plain increments are safe
+        _slot.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _slot.in_flight -= 1
+            _slot.requests += 1